@@ -156,3 +156,45 @@ def generate_like_comment(username: str, media_caption: str) -> str:
     import random
     from agent.prompts import LIKE_COMMENT_TEMPLATES
     return random.choice(LIKE_COMMENT_TEMPLATES)
+
+
+def generate_comment_reply(username: str, comment_text: str, media_caption: str = "") -> str:
+    """Use the agent to generate a reply to a comment left on one of our posts."""
+    try:
+        agent = get_action_agent()
+        caption_info = f" na postagem com a legenda: '{media_caption}'" if media_caption else ""
+        response = agent.run(
+            f"@{username} comentou{caption_info}: '{comment_text}'. "
+            f"Gere uma resposta curta, amigavel e contextual para esse comentario. "
+            f"Maximo 2 frases, em portugues brasileiro. Sem hashtags. Apenas retorne a resposta."
+        )
+        if response and response.content:
+            return response.content.strip()
+    except Exception as e:
+        logger.error(f"Error generating comment reply: {e}")
+
+    # Fallback to template
+    import random
+    from agent.prompts import COMMENT_REPLY_TEMPLATES
+    return random.choice(COMMENT_REPLY_TEMPLATES)
+
+
+def generate_message_reply(username: str, message_text: str) -> str:
+    """Use the agent to generate a reply to a direct message."""
+    try:
+        agent = get_action_agent()
+        sender = f"@{username}" if username else "Um seguidor"
+        response = agent.run(
+            f"{sender} enviou a seguinte mensagem direta: '{message_text}'. "
+            f"Gere uma resposta curta, amigavel e util. "
+            f"Maximo 3 frases, em portugues brasileiro. Sem hashtags. Apenas retorne a resposta."
+        )
+        if response and response.content:
+            return response.content.strip()
+    except Exception as e:
+        logger.error(f"Error generating message reply: {e}")
+
+    # Fallback to template
+    import random
+    from agent.prompts import MESSAGE_REPLY_TEMPLATES
+    return random.choice(MESSAGE_REPLY_TEMPLATES)
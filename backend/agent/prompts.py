@@ -53,3 +53,14 @@ LIKE_COMMENT_TEMPLATES = [
     "Legal que gostou! Fique de olho nas proximas postagens! 🙌",
     "Valeu pela curtida! Tem muito mais vindo por ai! 🎉",
 ]
+
+COMMENT_REPLY_TEMPLATES = [
+    "Obrigado pelo comentario! 😊",
+    "Que bom ter voce por aqui! Valeu pelo comentario! ✨",
+    "Muito obrigado pelo carinho! 💛",
+]
+
+MESSAGE_REPLY_TEMPLATES = [
+    "Oi! Obrigado pela mensagem! Ja ja respondemos com mais detalhes. 😊",
+    "Ola! Recebemos sua mensagem e logo retornamos! ✨",
+]
@@ -2,14 +2,15 @@ from agno.tools import Toolkit
 
 
 class InstagramToolkit(Toolkit):
-    def __init__(self):
+    def __init__(self, user_id: str):
         super().__init__(name="instagram_tools")
+        self.user_id = user_id
         self.register(self.send_dm)
         self.register(self.post_comment)
         self.register(self.get_media_info)
         self.register(self.get_recent_followers)
 
-    def send_dm(self, user_id: str, message: str) -> str:
+    async def send_dm(self, user_id: str, message: str) -> str:
         """Send a direct message to an Instagram user.
 
         Args:
@@ -20,9 +21,9 @@ class InstagramToolkit(Toolkit):
             Result of the DM send operation.
         """
         from instagram.actions import send_direct_message
-        return send_direct_message(user_id, message)
+        return await send_direct_message(self.user_id, user_id, message)
 
-    def post_comment(self, media_id: str, comment_text: str) -> str:
+    async def post_comment(self, media_id: str, comment_text: str) -> str:
         """Post a comment on an Instagram media post.
 
         Args:
@@ -33,9 +34,9 @@ class InstagramToolkit(Toolkit):
             Result of the comment operation.
         """
         from instagram.actions import post_comment_on_media
-        return post_comment_on_media(media_id, comment_text)
+        return await post_comment_on_media(self.user_id, media_id, comment_text)
 
-    def get_media_info(self, media_id: str) -> str:
+    async def get_media_info(self, media_id: str) -> str:
         """Get information about a specific Instagram media post including caption and like count.
 
         Args:
@@ -45,13 +46,13 @@ class InstagramToolkit(Toolkit):
             String with media details.
         """
         from instagram.actions import get_media_details
-        return get_media_details(media_id)
+        return await get_media_details(self.user_id, media_id)
 
-    def get_recent_followers(self) -> str:
+    async def get_recent_followers(self) -> str:
         """Get list of recent followers of the monitored Instagram account.
 
         Returns:
             String with recent followers list.
         """
         from instagram.actions import get_followers_list
-        return get_followers_list()
+        return await get_followers_list(self.user_id)
@@ -1,8 +1,10 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Query, Response
 from pydantic import BaseModel
 from auth import get_current_user
-from services.user_service import list_users, get_user, create_user
-from services.conversation_service import get_activity_log
+from config import settings
+from services.user_service import list_users, get_user, get_principal, create_user_async
+from services.conversation_service import get_activity_page
 from services.config_service import get_global_config, update_global_config
 
 router = APIRouter()
@@ -15,16 +17,21 @@ class CreateUserRequest(BaseModel):
 
 
 def require_admin(user=Depends(get_current_user)):
-    if not user.get("is_admin"):
+    # Checked against the (cached) user row, so a demoted or disabled admin loses
+    # access without waiting for the token to expire
+    principal = get_principal(user["user_id"])
+    if not principal or not principal["is_active"] or not principal["is_admin"]:
         raise HTTPException(status_code=403, detail="Admin access required")
     return user
 
 
 @router.post("/users")
-def admin_create_user(data: CreateUserRequest, user=Depends(require_admin)):
+async def admin_create_user(data: CreateUserRequest, user=Depends(require_admin)):
     try:
-        new_user = create_user(data.email, data.password, data.name)
+        new_user = await create_user_async(data.email, data.password, data.name)
         return {"status": "ok", "user": new_user}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
@@ -43,8 +50,41 @@ def admin_get_user(user_id: str, user=Depends(require_admin)):
 
 
 @router.get("/users/{user_id}/activity")
-def admin_user_activity(user_id: str, limit: int = Query(50, ge=1, le=200), user=Depends(require_admin)):
-    return get_activity_log(user_id=user_id, limit=limit)
+def admin_user_activity(
+    user_id: str,
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user=Depends(require_admin),
+):
+    try:
+        page = get_activity_page(user_id=user_id, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
+
+
+@router.post("/user-stats/backfill")
+def admin_backfill_user_stats(user=Depends(require_admin)):
+    """Recount the user_stats rollup from the conversations history."""
+    from services.conversation_service import backfill_user_stats
+    if settings.conversations_retention_days > 0:
+        # Dropped partitions are gone from the recount, so lifetime totals would shrink
+        raise HTTPException(
+            status_code=409,
+            detail="Backfill is disabled while CONVERSATIONS_RETENTION_DAYS is set: "
+                   "it would reset lifetime totals to the retained history",
+        )
+    return {"status": "ok", "users": backfill_user_stats()}
+
+
+@router.post("/like-compaction")
+def admin_run_like_compaction(user=Depends(require_admin)):
+    """Compact known_media_likes now; reports media, rows and approximate bytes reclaimed."""
+    from services.like_compaction_service import run_like_compaction
+    return run_like_compaction()
 
 
 @router.get("/monitors")
@@ -53,6 +93,32 @@ def admin_all_monitors(user=Depends(require_admin)):
     return monitor_manager.get_all_statuses()
 
 
+@router.get("/db-pools")
+def admin_db_pools(user=Depends(require_admin)):
+    """Connection pool usage and checkout wait times per workload."""
+    from database import pool_metrics_snapshot
+    return pool_metrics_snapshot()
+
+
+@router.get("/runtime-stats")
+def admin_runtime_stats(user=Depends(require_admin)):
+    """This process's activity log buffer, live event streams and rate limiter counters."""
+    from services.activity_log_buffer import activity_log_buffer
+    from services.live_events import live_events
+    from services.rate_limit_service import rate_limiter
+    return {
+        "activity_log": activity_log_buffer.stats(),
+        "live_events": live_events.stats(),
+        "rate_limits": rate_limiter.stats(),
+    }
+
+
+@router.get("/graph-usage")
+def admin_graph_usage(user=Depends(require_admin)):
+    from instagram.graph_usage import usage_tracker
+    return usage_tracker.snapshot()
+
+
 @router.get("/global-config")
 def admin_get_global_config(user=Depends(require_admin)):
     config = get_global_config()
@@ -1,7 +1,7 @@
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from auth import create_token, get_current_user
-from services.user_service import authenticate, get_user
+from services.user_service import authenticate_async, get_principal
 
 router = APIRouter()
 
@@ -12,8 +12,8 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/login")
-def login(data: LoginRequest):
-    user = authenticate(data.email, data.password)
+async def login(data: LoginRequest):
+    user = await authenticate_async(data.email, data.password)
     if not user:
         raise HTTPException(status_code=401, detail="Email ou senha incorretos")
 
@@ -31,12 +31,13 @@ def login(data: LoginRequest):
 
 @router.get("/me")
 def me(user=Depends(get_current_user)):
-    user_data = get_user(user["user_id"])
-    if not user_data:
-        raise HTTPException(status_code=404, detail="User not found")
+    # Served from the cached principal
+    principal = get_principal(user["user_id"])
+    if not principal or not principal["is_active"]:
+        raise HTTPException(status_code=401, detail="Account not found or disabled")
     return {
-        "id": user_data["id"],
-        "email": user_data["email"],
-        "name": user_data["name"],
-        "is_admin": user_data["is_admin"],
+        "id": principal["id"],
+        "email": principal["email"],
+        "name": principal["name"],
+        "is_admin": principal["is_admin"],
     }
@@ -4,6 +4,7 @@ from services.conversation_service import (
     get_conversations,
     get_conversation_by_id,
     get_stats,
+    search_conversations,
 )
 from auth import get_current_user
 
@@ -15,9 +16,38 @@ def list_conversations(
     page: int = Query(1, ge=1),
     limit: int = Query(20, ge=1, le=100),
     event_type: Optional[str] = None,
+    cursor: Optional[str] = None,
+    total: Optional[str] = Query(None, pattern="^(exact|estimate|none)$"),
     user=Depends(get_current_user),
 ):
-    return get_conversations(user_id=user["user_id"], page=page, limit=limit, event_type=event_type)
+    """Page with ``page`` (OFFSET) or, for constant-time deep pages, with the previous ``next_cursor``."""
+    try:
+        return get_conversations(
+            user_id=user["user_id"], page=page, limit=limit, event_type=event_type,
+            cursor=cursor, total_mode=total,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/search")
+def search(
+    q: Optional[str] = Query(None, max_length=200),
+    username: Optional[str] = Query(None, max_length=100),
+    event_type: Optional[str] = None,
+    sort: str = Query("rank", pattern="^(rank|recent)$"),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+):
+    """Search by message text (``q``) and/or username prefix; page with ``next_cursor``."""
+    try:
+        return search_conversations(
+            user_id=user["user_id"], q=q, username=username, event_type=event_type,
+            sort=sort, limit=limit, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/stats")
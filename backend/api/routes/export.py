@@ -0,0 +1,53 @@
+from datetime import datetime
+from itertools import chain
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Depends
+from fastapi.responses import StreamingResponse
+from services.export_service import export_rows, export_slots
+from auth import get_current_user
+
+router = APIRouter()
+
+_MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _guarded(chunks):
+    """Release the export slot when the stream ends or the client goes away."""
+    try:
+        yield from chunks
+    finally:
+        export_slots.release()
+
+
+@router.get("/{kind}")
+def export(
+    kind: str,
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    since: Optional[datetime] = None,
+    until: Optional[datetime] = None,
+    gzip: bool = False,
+    user=Depends(get_current_user),
+):
+    """Download all of the tenant's ``conversations`` or ``activity`` rows, oldest first.
+
+    ``since`` / ``until`` bound ``created_at`` (until is exclusive).
+    """
+    table = {"conversations": "conversations", "activity": "activity_log"}.get(kind)
+    if table is None:
+        raise HTTPException(status_code=404, detail="Unknown export")
+    if not export_slots.acquire(blocking=False):
+        raise HTTPException(status_code=429, detail="Too many exports running, try again shortly")
+    stream = _guarded(export_rows(table, user["user_id"], format, since, until, gzip))
+    try:
+        # Runs the query now, so failures become a proper error response
+        first = next(stream, b"")
+    except Exception as e:
+        stream.close()
+        raise HTTPException(status_code=500, detail=str(e))
+
+    filename = f"{kind}-{datetime.utcnow():%Y%m%d}.{format}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        chain([first], stream),
+        media_type="application/gzip" if gzip else _MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
@@ -6,7 +6,8 @@ router = APIRouter()
 
 @router.get("/health")
 def health_check():
+    # Unauthenticated: liveness only; internal counters are at GET /api/admin/runtime-stats
     return {
         "status": "ok",
-        "active_monitors": len([s for s in monitor_manager._monitors.values() if s.is_running]),
+        "active_monitors": monitor_manager.count_running(),
     }
@@ -1,7 +1,12 @@
-from fastapi import APIRouter, Query, Depends
+import asyncio
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+from config import settings
 from instagram.monitor import monitor_manager
-from services.conversation_service import get_activity_log
-from auth import get_current_user
+from services.conversation_service import get_activity_page
+from services.live_events import format_sse, live_events
+from auth import get_current_user, get_stream_user
 
 router = APIRouter()
 
@@ -24,5 +29,58 @@ async def stop_monitor(user=Depends(get_current_user)):
 
 
 @router.get("/activity-log")
-def activity_log(limit: int = Query(50, ge=1, le=200), user=Depends(get_current_user)):
-    return get_activity_log(user_id=user["user_id"], limit=limit)
+def activity_log(
+    response: Response,
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    user=Depends(get_current_user),
+):
+    """Newest entries first; pass the X-Next-Cursor header back as ``cursor`` for older ones."""
+    try:
+        page = get_activity_page(user_id=user["user_id"], limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if page["next_cursor"]:
+        response.headers["X-Next-Cursor"] = page["next_cursor"]
+    return page["items"]
+
+
+@router.get("/stream")
+async def monitor_stream(request: Request, user=Depends(get_stream_user)):
+    """Server-sent events: the current ``status`` first, then ``status`` and ``activity`` as they happen.
+
+    A ``lagged`` event means this stream fell behind and events were dropped;
+    the client should reload the activity log once.
+    """
+    user_id = user["user_id"]
+    sub = live_events.subscribe(user_id)
+    if sub is None:
+        raise HTTPException(status_code=429, detail="Too many open streams")
+    try:
+        status = await asyncio.to_thread(monitor_manager.get_status, user_id)
+    except Exception:
+        live_events.unsubscribe(sub)
+        raise
+
+    async def events():
+        reported = 0
+        try:
+            yield format_sse("status", status)
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(sub.queue.get(), settings.live_events_keepalive_seconds)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if sub.dropped > reported:
+                    yield format_sse("lagged", {"dropped": sub.dropped - reported})
+                    reported = sub.dropped
+                yield format_sse(event["type"], event["data"], event["id"])
+        finally:
+            live_events.unsubscribe(sub)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -1,7 +1,8 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel
 from models.schemas import SettingsUpdate, SettingsResponse
-from services.config_service import get_config_masked, update_config, get_config
+from services.config_service import get_config_masked, update_config, get_config_async, get_credentials_async
 from auth import get_current_user
 
 router = APIRouter()
@@ -31,6 +32,7 @@ def update_settings(data: SettingsUpdate, user=Depends(get_current_user)):
             "media_posts_per_check": (1, 10),
             "delay_randomization_max": (0, 120),
             "polling_interval_seconds": (30, 300),
+            "like_compaction_after_days": (1, 365),
         }
         for field, (lo, hi) in clamp_rules.items():
             if field in updates and isinstance(updates[field], (int, float)):
@@ -47,28 +49,34 @@ def update_settings(data: SettingsUpdate, user=Depends(get_current_user)):
 
 
 @router.post("/test-connection")
-def test_connection(user=Depends(get_current_user)):
-    config = get_config(user["user_id"])
+async def test_connection(user=Depends(get_current_user)):
+    config = await get_config_async(user["user_id"])
     api_mode = config.get("api_mode", "instagrapi")
+    credentials = await get_credentials_async(user["user_id"]) if api_mode != "fake" else {}
 
     try:
         if api_mode == "instagrapi":
             username = config.get("ig_username", "")
-            password = config.get("ig_password", "")
-            session_data = config.get("ig_session", "")
+            password = credentials["ig_password"]
+            session_data = credentials["ig_session"]
             if not username or (not password and not session_data):
                 return {"success": False, "error": "Instagram username/password not configured. Use the local login script to generate a session."}
             from instagram.instagrapi_client import test_connection
-            return test_connection(user["user_id"], username, password, session_data)
+            return await asyncio.to_thread(test_connection, user["user_id"], username, password, session_data)
+        elif api_mode == "fake":
+            from instagram.fake_client import get_fake_client
+            from instagram.instagrapi_client import get_account_info
+            client = get_fake_client(user["user_id"])
+            return {"success": True, "account": await asyncio.to_thread(get_account_info, client)}
         else:
-            token = config.get("access_token", "")
+            token = credentials["access_token"]
             ig_id = config.get("instagram_business_account_id", "")
             page_id = config.get("page_id", "")
             if not token:
                 return {"success": False, "error": "Access token not configured"}
             from instagram.graph_api import InstagramGraphAPI
-            client = InstagramGraphAPI(token, ig_id, page_id)
-            return client.test_connection()
+            client = InstagramGraphAPI(token, ig_id, page_id, config.get("app_id", ""))
+            return await client.test_connection()
     except Exception as e:
         return {"success": False, "error": str(e)}
 
@@ -0,0 +1,53 @@
+import asyncio
+import json
+import logging
+from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+from config import settings
+from instagram.webhooks import enqueue, signature_secrets, store_payload, verify_signature
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+
+@router.get("/instagram", response_class=PlainTextResponse)
+def verify_subscription(
+    hub_mode: str = Query("", alias="hub.mode"),
+    hub_verify_token: str = Query("", alias="hub.verify_token"),
+    hub_challenge: str = Query("", alias="hub.challenge"),
+):
+    """Meta subscription handshake."""
+    if (
+        hub_mode == "subscribe"
+        and settings.instagram_webhook_verify_token
+        and hub_verify_token == settings.instagram_webhook_verify_token
+    ):
+        return hub_challenge
+    raise HTTPException(status_code=403, detail="Webhook verification failed")
+
+
+@router.post("/instagram")
+async def receive_webhook(request: Request):
+    """Validate the signature, store the events and hand them to the background consumers."""
+    body = await request.body()
+    try:
+        payload = json.loads(body)
+    except json.JSONDecodeError:
+        raise HTTPException(status_code=400, detail="Invalid JSON payload")
+
+    signature = request.headers.get("X-Hub-Signature-256", "")
+    secrets = await asyncio.to_thread(signature_secrets, payload)
+    if not any(verify_signature(body, signature, secret) for secret in secrets):
+        raise HTTPException(status_code=401, detail="Invalid signature")
+
+    # Stored before answering, so an acknowledged event survives a restart
+    try:
+        stored = await asyncio.to_thread(store_payload, payload)
+    except Exception as e:
+        logger.error(f"Webhook events could not be stored: {e}")
+        # Meta retries deliveries that do not get a 200
+        raise HTTPException(status_code=503, detail="Could not store webhook events")
+    for user_id, event_key in stored:
+        enqueue(user_id, event_key)
+    return {"status": "ok"}
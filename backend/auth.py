@@ -1,8 +1,13 @@
+import asyncio
 import bcrypt
 import jwt
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta, timezone
+from typing import Optional
 from fastapi import Request, HTTPException
+from config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -12,13 +17,61 @@ TOKEN_EXPIRY_DAYS = 7
 
 
 def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode(), bcrypt.gensalt()).decode()
+    return bcrypt.hashpw(password.encode(), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode()
 
 
 def verify_password(password: str, password_hash: str) -> bool:
     return bcrypt.checkpw(password.encode(), password_hash.encode())
 
 
+def password_needs_rehash(password_hash: str) -> bool:
+    """Whether a bcrypt hash ("$2b$<cost>$...") was made with a different cost than configured."""
+    try:
+        return int(password_hash.split("$")[2]) != settings.bcrypt_rounds
+    except (IndexError, ValueError):
+        return False
+
+
+# bcrypt runs in worker processes, so a login storm neither blocks the event
+# loop nor ties up the request threadpool
+_bcrypt_pool: Optional[ProcessPoolExecutor] = None
+_bcrypt_pending = 0
+
+
+async def _run_bcrypt(fn, *args):
+    global _bcrypt_pool, _bcrypt_pending
+    if _bcrypt_pending >= settings.bcrypt_max_pending:
+        raise HTTPException(
+            status_code=503, detail="Too many logins in progress, try again shortly", headers={"Retry-After": "1"}
+        )
+    if _bcrypt_pool is None:
+        # spawn: forking a process that already runs threads is unsafe
+        _bcrypt_pool = ProcessPoolExecutor(
+            max_workers=settings.bcrypt_pool_size, mp_context=multiprocessing.get_context("spawn")
+        )
+    _bcrypt_pending += 1
+    try:
+        return await asyncio.wrap_future(_bcrypt_pool.submit(fn, *args))
+    finally:
+        _bcrypt_pending -= 1
+
+
+async def hash_password_async(password: str) -> str:
+    hashed = await _run_bcrypt(bcrypt.hashpw, password.encode(), bcrypt.gensalt(rounds=settings.bcrypt_rounds))
+    return hashed.decode()
+
+
+async def verify_password_async(password: str, password_hash: str) -> bool:
+    return await _run_bcrypt(bcrypt.checkpw, password.encode(), password_hash.encode())
+
+
+def shutdown_password_pool():
+    global _bcrypt_pool
+    if _bcrypt_pool is not None:
+        _bcrypt_pool.shutdown(cancel_futures=True)
+        _bcrypt_pool = None
+
+
 def create_token(user_id: str, is_admin: bool = False) -> str:
     payload = {
         "user_id": user_id,
@@ -39,15 +92,40 @@ def decode_token(token: str) -> dict:
         raise HTTPException(status_code=401, detail="Invalid token")
 
 
-def get_current_user(request: Request) -> dict:
-    auth_header = request.headers.get("Authorization", "")
-    if not auth_header.startswith("Bearer "):
-        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
-
-    token = auth_header[7:]
+def _user_from_token(token: str) -> dict:
+    # Resolved from the token alone, so ordinary requests never query the database;
+    # /api/auth/me and the admin routes check the (cached) user row
     payload = decode_token(token)
 
     return {
         "user_id": payload["user_id"],
         "is_admin": payload.get("is_admin", False),
     }
+
+
+def token_user_id(request: Request) -> Optional[str]:
+    """user_id of a valid bearer token, without touching the database (None otherwise)."""
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+    try:
+        return decode_token(auth_header[7:]).get("user_id")
+    except HTTPException:
+        return None
+
+
+def get_current_user(request: Request) -> dict:
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        raise HTTPException(status_code=401, detail="Missing or invalid authorization header")
+    return _user_from_token(auth_header[7:])
+
+
+def get_stream_user(request: Request) -> dict:
+    """Like get_current_user, but also accepts ``?token=`` (EventSource cannot send headers)."""
+    if request.headers.get("Authorization", "").startswith("Bearer "):
+        return get_current_user(request)
+    token = request.query_params.get("token")
+    if not token:
+        raise HTTPException(status_code=401, detail="Missing token")
+    return _user_from_token(token)
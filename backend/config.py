@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 
@@ -12,6 +13,105 @@ class Settings(BaseSettings):
     frontend_url: str = "http://localhost:3000"
     app_name: str = "Instagram AI Agent"
     debug: bool = False
+    # Connection pools: API requests, background jobs, and the async (asyncpg)
+    # engine used by the monitor and async routes
+    db_api_pool_size: int = 5
+    db_api_max_overflow: int = 10
+    db_jobs_pool_size: int = 3
+    db_jobs_max_overflow: int = 2
+    db_pool_timeout_seconds: float = 30.0
+    db_async_pool_size: int = 10
+    db_async_max_overflow: int = 10
+    # Set to 0 behind a transaction-mode pooler (pgbouncer / Supabase :6543)
+    db_async_statement_cache_size: int = 100
+    # Monitor placement: "inline" runs monitors in the web process,
+    # "worker" delegates them to `python -m instagram.worker`
+    monitor_mode: str = "inline"
+    monitor_command_timeout_seconds: float = 15.0
+    # Monitor ownership lease; renewed (and status published) every third of it
+    monitor_lease_seconds: int = 30
+    # Startup resume of accounts with monitor_enabled = true
+    monitor_resume_on_startup: bool = True
+    monitor_resume_window_seconds: int = 120
+    monitor_max_concurrent_logins: int = 3
+    # Thread pools, sized per process
+    web_thread_pool_size: int = 40
+    worker_thread_pool_size: int = 32
+    # Shared Graph API HTTP pool
+    graph_api_max_connections: int = 100
+    graph_api_max_keepalive_connections: int = 20
+    # Calls that arrive while others are in flight are collected for this window and sent
+    # as one Graph API batch request; a lone call goes out immediately (0 disables)
+    graph_api_batch_window_ms: int = 10
+    # Instagram webhooks (Graph API mode)
+    instagram_webhook_verify_token: str = ""
+    # App secret used to sign webhooks; falls back to each tenant's app_secret
+    instagram_app_secret: str = ""
+    webhook_queue_size: int = 1000
+    webhook_workers: int = 4
+    # Failed events are retried up to max attempts, backing off by interval * attempts^2;
+    # handled events are kept this many days for deduplication
+    webhook_max_attempts: int = 5
+    webhook_retry_interval_seconds: int = 60
+    webhook_events_retention_days: int = 7
+    # Media metadata cache (memory + media_cache table)
+    media_cache_ttl_seconds: int = 900
+    media_cache_max_items: int = 5000
+    # Write-behind activity log: rows are flushed every interval or once a batch is full
+    activity_log_buffered: bool = True
+    activity_log_flush_interval_ms: int = 500
+    activity_log_batch_size: int = 200
+    activity_log_queue_size: int = 10000
+    # Live event stream (GET /api/monitor/stream); events cross processes via NOTIFY when relayed.
+    # Unset relays only with MONITOR_MODE=worker; set true for several web replicas
+    live_events_relay: Optional[bool] = None
+    live_events_relay_interval_ms: int = 200
+    live_events_queue_size: int = 200
+    live_events_max_streams_per_user: int = 5
+    live_events_keepalive_seconds: int = 15
+    # Streaming exports (GET /api/export/...): rows per server-side cursor fetch, concurrent exports per process
+    export_batch_size: int = 1000
+    export_max_concurrent: int = 2
+    # known_media_likes compaction (per-tenant switch and age live in instagram_config); 0 disables the loop
+    like_compaction_interval_seconds: int = 86400
+    like_compaction_batch_media: int = 500
+    # Per-tenant limits on expensive routes: requests per minute (bucket holds a
+    # minute's worth) and requests in flight; 0 disables either. "postgres" shares
+    # the buckets between replicas through the rate_limit_buckets table.
+    rate_limit_enabled: bool = True
+    rate_limit_backend: str = "memory"
+    rate_limit_agent_chat_per_minute: int = 20
+    rate_limit_agent_chat_concurrent: int = 2
+    rate_limit_test_connection_per_minute: int = 6
+    rate_limit_test_connection_concurrent: int = 1
+    rate_limit_monitor_start_per_minute: int = 6
+    rate_limit_monitor_start_concurrent: int = 1
+    # Password hashing: bcrypt cost (existing hashes are upgraded on login) and the
+    # process pool that runs it off the request threads
+    bcrypt_rounds: int = 12
+    bcrypt_pool_size: int = 2
+    bcrypt_max_pending: int = 32
+    # User row (active/admin flags) checked by /api/auth/me and the admin routes, cached per process
+    principal_cache_ttl_seconds: int = 30
+    principal_cache_max_items: int = 10000
+    # Retention (days) for the monthly partitions of activity_log / conversations; 0 keeps everything
+    activity_log_retention_days: int = 0
+    conversations_retention_days: int = 0
+    partition_months_ahead: int = 2
+    partition_maintenance_interval_seconds: int = 21600
+    # Adaptive throttling from Graph API usage headers (percent of quota)
+    graph_api_throttle_start_pct: int = 75
+    graph_api_shed_pct: int = 95
+    graph_api_throttle_max_delay_seconds: float = 10.0
+    # Fake Instagram backend (api_mode = 'fake') for offline monitor runs
+    fake_ig_media_count: int = 5
+    fake_ig_initial_followers: int = 0
+    fake_ig_new_followers_per_poll: int = 1
+    fake_ig_new_likes_per_poll: int = 1
+    fake_ig_latency_ms: int = 0
+    fake_ig_latency_jitter_ms: int = 0
+    fake_ig_error_rate: float = 0.0
+    fake_ig_seed: Optional[int] = None
 
     class Config:
         env_file = ".env"
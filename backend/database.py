@@ -1,15 +1,120 @@
 import logging
-from sqlalchemy import create_engine, text
-from sqlalchemy.engine import URL
+import threading
+import time
+from collections import deque
+from typing import Dict, Optional
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import URL, make_url
+from sqlalchemy.exc import ProgrammingError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from config import settings
 
 logger = logging.getLogger(__name__)
 
 
-def _build_engine():
+# ========== POOL METRICS ==========
+
+class PoolMetrics:
+    """Checkout counters and wait times for one connection pool."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self._lock = threading.Lock()
+        self._recent_waits = deque(maxlen=1000)
+        self.checkouts = 0
+        self.connects = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record_wait(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            self._recent_waits.append(seconds)
+            self.total_wait += seconds
+            self.max_wait = max(self.max_wait, seconds)
+            if timed_out:
+                self.timeouts += 1
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            waits = sorted(self._recent_waits)
+            data = {
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.total_wait / self.checkouts * 1000, 2) if self.checkouts else 0.0,
+                "wait_ms_max": round(self.max_wait * 1000, 2),
+                "wait_ms_p95_recent": round(waits[int(len(waits) * 0.95)] * 1000, 2) if waits else 0.0,
+            }
+        if self.pool is not None:
+            data.update({
+                "size": self.pool.size(),
+                "in_use": self.pool.checkedout(),
+                "idle": self.pool.checkedin(),
+                "overflow": max(0, self.pool.overflow()),
+            })
+        return data
+
+
+_pool_metrics: Dict[str, PoolMetrics] = {}
+
+
+class _TimedCheckout:
+    """Mixin timing how long a checkout waits for a free connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        metrics = _pool_metrics.get(self._orig_logging_name)
+        try:
+            conn = super()._do_get()
+        except PoolTimeoutError:
+            if metrics:
+                metrics.record_wait(time.perf_counter() - start, timed_out=True)
+            raise
+        if metrics:
+            metrics.record_wait(time.perf_counter() - start)
+        return conn
+
+
+class InstrumentedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class InstrumentedAsyncPool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def _instrument(engine, name: str):
+    metrics = _pool_metrics.setdefault(name, PoolMetrics(name))
+    metrics.pool = engine.pool
+
+    @event.listens_for(engine, "checkout")
+    def _on_checkout(dbapi_conn, record, proxy):
+        with metrics._lock:
+            metrics.checkouts += 1
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, record):
+        with metrics._lock:
+            metrics.connects += 1
+
+    @event.listens_for(engine, "engine_disposed")
+    def _on_dispose(_engine):
+        metrics.pool = _engine.pool
+
+
+def pool_metrics_snapshot() -> Dict[str, Dict]:
+    """Per-pool counters, wait times and live in-use / overflow counts."""
+    return {name: metrics.snapshot() for name, metrics in _pool_metrics.items()}
+
+
+def _database_url() -> URL:
     if settings.db_password and settings.db_host:
-        url = URL.create(
+        return URL.create(
             drivername="postgresql",
             username=settings.db_user,
             password=settings.db_password,
@@ -17,15 +122,70 @@ def _build_engine():
             port=int(settings.db_port),
             database=settings.db_name,
         )
-        logger.info(f"Connecting to DB host: {settings.db_host}:{settings.db_port}")
-    else:
-        url = settings.database_url
-        logger.info("Connecting to DB from DATABASE_URL")
-    return create_engine(url, pool_pre_ping=True, pool_size=5, max_overflow=10)
+    return make_url(settings.database_url)
+
+
+def _build_engine(name: str, pool_size: int, max_overflow: int):
+    engine = create_engine(
+        _database_url(),
+        pool_pre_ping=True,
+        poolclass=InstrumentedQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.db_pool_timeout_seconds,
+        pool_logging_name=name,
+    )
+    _instrument(engine, name)
+    return engine
+
+
+if settings.db_password and settings.db_host:
+    logger.info(f"Connecting to DB host: {settings.db_host}:{settings.db_port}")
+else:
+    logger.info("Connecting to DB from DATABASE_URL")
+
+# API requests (sync routes and services)
+engine = _build_engine("api", settings.db_api_pool_size, settings.db_api_max_overflow)
+# Background jobs: monitor leases/status/commands, activity log writer, partition
+# maintenance, webhook bookkeeping, streaming exports - kept off the API pool so
+# long or bursty work and requests never queue behind each other
+jobs_engine = _build_engine("jobs", settings.db_jobs_pool_size, settings.db_jobs_max_overflow)
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+_async_engine: Optional[AsyncEngine] = None
+
+
+def get_async_engine() -> AsyncEngine:
+    """Process-wide asyncpg engine, created on first use (connections bind to the running loop)."""
+    global _async_engine
+    if _async_engine is None:
+        url = _database_url()
+        # asyncpg takes ``ssl`` instead of libpq's ``sslmode``
+        sslmode = url.query.get("sslmode")
+        url = url.difference_update_query(["sslmode"]).set(drivername="postgresql+asyncpg")
+        connect_args = {"statement_cache_size": settings.db_async_statement_cache_size}
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        # Monitor polls and async routes
+        _async_engine = create_async_engine(
+            url,
+            pool_pre_ping=True,
+            poolclass=InstrumentedAsyncPool,
+            pool_size=settings.db_async_pool_size,
+            max_overflow=settings.db_async_max_overflow,
+            pool_timeout=settings.db_pool_timeout_seconds,
+            pool_logging_name="monitor",
+            connect_args=connect_args,
+        )
+        _instrument(_async_engine.sync_engine, "monitor")
+    return _async_engine
 
-engine = _build_engine()
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+async def dispose_async_engine():
+    global _async_engine
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
 
 
 def get_db():
@@ -36,240 +196,54 @@ def get_db():
         db.close()
 
 
-def init_db():
-    """Create custom application tables if they don't exist."""
-    with engine.connect() as conn:
-        # Enable uuid generation
-        conn.execute(text("CREATE EXTENSION IF NOT EXISTS pgcrypto"))
-
-        # ========== USERS TABLE ==========
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS users (
-                id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
-                email TEXT UNIQUE NOT NULL,
-                password_hash TEXT NOT NULL,
-                name TEXT DEFAULT '',
-                is_admin BOOLEAN DEFAULT false,
-                is_active BOOLEAN DEFAULT true,
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-
-        # ========== GLOBAL CONFIG TABLE (shared LLM settings) ==========
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS global_config (
-                id SERIAL PRIMARY KEY,
-                llm_provider TEXT DEFAULT 'groq',
-                llm_api_key TEXT DEFAULT '',
-                llm_model TEXT DEFAULT 'llama-3.3-70b-versatile',
-                updated_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-
-        # Insert default global config if none exists
-        result = conn.execute(text("SELECT COUNT(*) FROM global_config"))
-        if result.scalar() == 0:
-            conn.execute(text(
-                "INSERT INTO global_config (llm_provider, llm_api_key, llm_model) "
-                "VALUES ('groq', '', 'llama-3.3-70b-versatile')"
-            ))
-
-        # ========== INSTAGRAM CONFIG (per-user) ==========
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS instagram_config (
-                id SERIAL PRIMARY KEY,
-                app_id TEXT DEFAULT '',
-                app_secret TEXT DEFAULT '',
-                access_token TEXT DEFAULT '',
-                page_id TEXT DEFAULT '',
-                instagram_business_account_id TEXT DEFAULT '',
-                ig_username TEXT DEFAULT '',
-                ig_password TEXT DEFAULT '',
-                api_mode TEXT DEFAULT 'instagrapi',
-                llm_provider TEXT DEFAULT 'groq',
-                llm_api_key TEXT DEFAULT '',
-                llm_model TEXT DEFAULT 'llama-3.3-70b-versatile',
-                polling_interval_seconds INTEGER DEFAULT 60,
-                monitor_enabled BOOLEAN DEFAULT false,
-                created_at TIMESTAMPTZ DEFAULT NOW(),
-                updated_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS conversations (
-                id SERIAL PRIMARY KEY,
-                instagram_user_id TEXT NOT NULL,
-                instagram_username TEXT DEFAULT '',
-                event_type TEXT NOT NULL,
-                trigger_media_id TEXT DEFAULT '',
-                trigger_media_caption TEXT DEFAULT '',
-                agent_action TEXT NOT NULL,
-                agent_message TEXT NOT NULL,
-                session_id TEXT DEFAULT '',
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS known_followers (
-                id SERIAL PRIMARY KEY,
-                instagram_user_id TEXT UNIQUE NOT NULL,
-                instagram_username TEXT DEFAULT '',
-                first_seen_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS known_media_likes (
-                id SERIAL PRIMARY KEY,
-                media_id TEXT NOT NULL,
-                instagram_user_id TEXT NOT NULL,
-                instagram_username TEXT DEFAULT '',
-                first_seen_at TIMESTAMPTZ DEFAULT NOW(),
-                UNIQUE(media_id, instagram_user_id)
-            )
-        """))
-
-        conn.execute(text("""
-            CREATE TABLE IF NOT EXISTS activity_log (
-                id SERIAL PRIMARY KEY,
-                level TEXT DEFAULT 'info',
-                message TEXT NOT NULL,
-                details TEXT DEFAULT '',
-                created_at TIMESTAMPTZ DEFAULT NOW()
-            )
-        """))
-
-        # ========== MIGRATIONS ==========
-
-        # Add ig_session column if it doesn't exist
-        conn.execute(text("""
-            DO $$ BEGIN
-                ALTER TABLE instagram_config ADD COLUMN IF NOT EXISTS ig_session TEXT DEFAULT '';
-            EXCEPTION WHEN duplicate_column THEN NULL;
-            END $$;
-        """))
-
-        # Bot control settings migration
-        bot_control_columns = [
-            ("welcome_dm_enabled", "BOOLEAN DEFAULT true"),
-            ("auto_comment_enabled", "BOOLEAN DEFAULT true"),
-            ("max_dms_per_day", "INTEGER DEFAULT 20"),
-            ("max_comments_per_day", "INTEGER DEFAULT 20"),
-            ("delay_between_dms", "INTEGER DEFAULT 45"),
-            ("delay_between_comments", "INTEGER DEFAULT 60"),
-            ("delay_between_media_checks", "INTEGER DEFAULT 5"),
-            ("followers_per_check", "INTEGER DEFAULT 20"),
-            ("media_posts_per_check", "INTEGER DEFAULT 3"),
-            ("delay_randomization_max", "INTEGER DEFAULT 30"),
-            ("dms_sent_today", "INTEGER DEFAULT 0"),
-            ("comments_posted_today", "INTEGER DEFAULT 0"),
-            ("daily_counters_reset_at", "TIMESTAMPTZ DEFAULT NOW()"),
-        ]
-        for col_name, col_def in bot_control_columns:
-            conn.execute(text(f"""
-                DO $$ BEGIN
-                    ALTER TABLE instagram_config ADD COLUMN IF NOT EXISTS {col_name} {col_def};
-                EXCEPTION WHEN duplicate_column THEN NULL;
-                END $$;
-            """))
+# Session advisory lock serializing migrations across processes booting together
+_MIGRATION_LOCK_KEY = 7_311_040
 
-        # ========== MULTI-TENANT MIGRATION ==========
-        # Add user_id to all tables
-        multi_tenant_migrations = [
-            ("instagram_config", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
-            ("conversations", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
-            ("known_followers", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
-            ("known_media_likes", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
-            ("activity_log", "user_id", "UUID REFERENCES users(id)"),
-        ]
-        for table, col, col_def in multi_tenant_migrations:
-            conn.execute(text(f"""
-                DO $$ BEGIN
-                    ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {col_def};
-                EXCEPTION WHEN duplicate_column THEN NULL;
-                END $$;
-            """))
 
-        # Add unique constraint on instagram_config(user_id) if not exists
-        conn.execute(text("""
-            DO $$ BEGIN
-                ALTER TABLE instagram_config ADD CONSTRAINT uq_config_user UNIQUE (user_id);
-            EXCEPTION WHEN duplicate_object THEN NULL;
-            END $$;
-        """))
-
-        # Drop old unique constraint on known_followers(instagram_user_id) and add (user_id, instagram_user_id)
-        conn.execute(text("""
-            DO $$ BEGIN
-                ALTER TABLE known_followers DROP CONSTRAINT IF EXISTS known_followers_instagram_user_id_key;
-            EXCEPTION WHEN undefined_object THEN NULL;
-            END $$;
-        """))
-        conn.execute(text("""
-            DO $$ BEGIN
-                CREATE UNIQUE INDEX IF NOT EXISTS uq_known_followers_user
-                ON known_followers (user_id, instagram_user_id);
-            EXCEPTION WHEN duplicate_table THEN NULL;
-            END $$;
-        """))
-
-        # Unique index on known_media_likes per user
-        conn.execute(text("""
-            DO $$ BEGIN
-                CREATE UNIQUE INDEX IF NOT EXISTS uq_known_media_likes_user
-                ON known_media_likes (user_id, media_id, instagram_user_id);
-            EXCEPTION WHEN duplicate_table THEN NULL;
-            END $$;
-        """))
-
-        # ========== MIGRATE EXISTING DATA ==========
-        # If there's existing config data without user_id, create an admin user and assign
-        result = conn.execute(text(
-            "SELECT COUNT(*) FROM instagram_config WHERE user_id IS NULL AND ig_username != ''"
-        ))
-        orphan_count = result.scalar()
-
-        if orphan_count > 0:
-            # Check if admin already exists
-            admin_result = conn.execute(text(
-                "SELECT id FROM users WHERE is_admin = true LIMIT 1"
-            ))
-            admin_row = admin_result.first()
-
-            if admin_row:
-                admin_id = str(admin_row[0])
-            else:
-                # Create admin user with default credentials
-                import bcrypt
-                default_hash = bcrypt.hashpw("admin123".encode(), bcrypt.gensalt()).decode()
-                insert_result = conn.execute(
-                    text(
-                        "INSERT INTO users (email, password_hash, name, is_admin) "
-                        "VALUES ('admin@agenteinsta.com', :pw, 'Admin', true) "
-                        "ON CONFLICT (email) DO UPDATE SET is_admin = true "
-                        "RETURNING id"
-                    ),
-                    {"pw": default_hash},
-                )
-                admin_id = str(insert_result.first()[0])
-                logger.info("Created admin user: admin@agenteinsta.com (change password!)")
+def get_schema_version() -> int:
+    """Highest applied migration (0 before the first versioned boot)."""
+    with engine.connect() as conn:
+        try:
+            return conn.execute(text("SELECT MAX(version) FROM schema_version")).scalar() or 0
+        except ProgrammingError:
+            return 0
 
-            # Migrate LLM config to global_config from existing instagram_config
-            conn.execute(text("""
-                UPDATE global_config SET
-                    llm_provider = COALESCE((SELECT llm_provider FROM instagram_config WHERE user_id IS NULL LIMIT 1), llm_provider),
-                    llm_api_key = COALESCE((SELECT llm_api_key FROM instagram_config WHERE user_id IS NULL LIMIT 1), llm_api_key),
-                    llm_model = COALESCE((SELECT llm_model FROM instagram_config WHERE user_id IS NULL LIMIT 1), llm_model),
-                    updated_at = NOW()
-                WHERE id = (SELECT id FROM global_config ORDER BY id LIMIT 1)
-            """))
 
-            # Assign all orphan data to admin
-            for table in ["instagram_config", "conversations", "known_followers", "known_media_likes", "activity_log"]:
-                conn.execute(text(f"UPDATE {table} SET user_id = :uid WHERE user_id IS NULL"), {"uid": admin_id})
+def init_db():
+    """Apply pending schema migrations. A single version query when the schema is current."""
+    from migrations import MIGRATIONS
 
-            logger.info(f"Migrated existing data to admin user {admin_id}")
+    latest = MIGRATIONS[-1][0]
+    if get_schema_version() >= latest:
+        return
 
+    with engine.connect() as conn:
+        conn.execute(text("SELECT pg_advisory_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
         conn.commit()
+        try:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_version (
+                    version INTEGER PRIMARY KEY,
+                    name TEXT NOT NULL,
+                    applied_at TIMESTAMPTZ DEFAULT NOW()
+                )
+            """))
+            conn.commit()
+            # Another process may have migrated while we waited for the lock
+            current = conn.execute(text("SELECT COALESCE(MAX(version), 0) FROM schema_version")).scalar()
+            for version, name, step in MIGRATIONS:
+                if version <= current:
+                    continue
+                logger.info(f"Applying migration {version}: {name}")
+                step(conn)
+                conn.execute(
+                    text("INSERT INTO schema_version (version, name) VALUES (:v, :n)"),
+                    {"v": version, "n": name},
+                )
+                conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+            conn.commit()
@@ -1,71 +1,82 @@
 """Action executor that delegates to the active Instagram client (instagrapi or Graph API)."""
+import asyncio
 import logging
-from typing import Dict, List
-from services.config_service import get_config
+from typing import Dict, List, Optional
+from services.config_service import get_config_async, get_credentials, get_credentials_async
+from services.media_cache_service import get_cached_media, upsert_media
+from instagram.fake_client import FAKE_API_MODE
 
 logger = logging.getLogger(__name__)
 
 
-def _get_instagrapi_client():
-    """Get configured instagrapi client."""
-    from instagram.instagrapi_client import get_client
-    config = get_config()
+def _get_instagrapi_client(user_id: str, config: dict):
+    """Get configured instagrapi client (or the fake client in fake mode)."""
+    if config.get("api_mode") == FAKE_API_MODE:
+        from instagram.fake_client import get_fake_client
+        return get_fake_client(user_id)
+    from instagram.instagrapi_client import get_client, has_client
     username = config.get("ig_username", "")
-    password = config.get("ig_password", "")
-    session_data = config.get("ig_session", "")
+    if has_client(user_id):
+        return get_client(user_id, username, "", "")
+    credentials = get_credentials(user_id)
+    password = credentials["ig_password"]
+    session_data = credentials["ig_session"]
     if not username or (not password and not session_data):
         raise ValueError("Instagram credentials not configured. Use the local login script to generate a session.")
-    return get_client(username, password, session_data)
+    return get_client(user_id, username, password, session_data)
 
 
-def _get_graph_api_client():
-    """Get configured Graph API client."""
+async def _get_graph_api_client(user_id: str, config: dict):
+    """Get configured Graph API client (shares the process-wide HTTP pool)."""
     from instagram.graph_api import InstagramGraphAPI
-    config = get_config()
-    token = config.get("access_token", "")
+    token = (await get_credentials_async(user_id))["access_token"]
     ig_id = config.get("instagram_business_account_id", "")
     page_id = config.get("page_id", "")
     if not token:
         raise ValueError("Instagram access token not configured")
-    return InstagramGraphAPI(token, ig_id, page_id)
+    return InstagramGraphAPI(token, ig_id, page_id, config.get("app_id", ""))
 
 
-def send_direct_message(user_id: str, message: str) -> str:
-    """Send a DM to a user. Returns status string."""
-    config = get_config()
-    api_mode = config.get("api_mode", "instagrapi")
+def _uses_instagrapi(config: dict) -> bool:
+    return config.get("api_mode", "instagrapi") in ("instagrapi", FAKE_API_MODE)
+
+
+async def send_direct_message(user_id: str, instagram_user_id: str, message: str) -> str:
+    """Send a DM to an Instagram user on behalf of a tenant. Returns status string."""
+    config = await get_config_async(user_id)
 
     try:
-        if api_mode == "instagrapi":
-            client = _get_instagrapi_client()
+        if _uses_instagrapi(config):
+            client = await asyncio.to_thread(_get_instagrapi_client, user_id, config)
             from instagram.instagrapi_client import send_dm
-            success = send_dm(client, [user_id], message)
-            return f"DM sent successfully to user {user_id}" if success else f"Failed to send DM to user {user_id}"
+            success = await asyncio.to_thread(send_dm, client, [instagram_user_id], message)
+            if success:
+                return f"DM sent successfully to user {instagram_user_id}"
+            return f"Failed to send DM to user {instagram_user_id}"
         else:
-            client = _get_graph_api_client()
-            result = client.send_message(user_id, message)
+            client = await _get_graph_api_client(user_id, config)
+            result = await client.send_message(instagram_user_id, message)
             if "error" in result:
                 return f"Failed to send DM: {result['error']}"
-            return f"DM sent successfully to user {user_id}"
+            return f"DM sent successfully to user {instagram_user_id}"
     except Exception as e:
         logger.error(f"send_direct_message error: {e}")
         return f"Error sending DM: {str(e)}"
 
 
-def post_comment_on_media(media_id: str, comment_text: str) -> str:
+async def post_comment_on_media(user_id: str, media_id: str, comment_text: str) -> str:
     """Post a comment on a media post. Returns status string."""
-    config = get_config()
-    api_mode = config.get("api_mode", "instagrapi")
+    config = await get_config_async(user_id)
 
     try:
-        if api_mode == "instagrapi":
-            client = _get_instagrapi_client()
+        if _uses_instagrapi(config):
+            client = await asyncio.to_thread(_get_instagrapi_client, user_id, config)
             from instagram.instagrapi_client import post_comment
-            success = post_comment(client, media_id, comment_text)
+            success = await asyncio.to_thread(post_comment, client, media_id, comment_text)
             return f"Comment posted on media {media_id}" if success else f"Failed to comment on media {media_id}"
         else:
-            client = _get_graph_api_client()
-            result = client.post_comment(media_id, comment_text)
+            client = await _get_graph_api_client(user_id, config)
+            result = await client.post_comment(media_id, comment_text)
             if "error" in result:
                 return f"Failed to comment: {result['error']}"
             return f"Comment posted on media {media_id}"
@@ -74,39 +85,69 @@ def post_comment_on_media(media_id: str, comment_text: str) -> str:
         return f"Error posting comment: {str(e)}"
 
 
-def get_media_details(media_id: str) -> str:
-    """Get info about a media post."""
-    config = get_config()
+def _format_media(media: dict) -> str:
+    return f"Media: caption='{media['caption']}', likes={media['like_count']}, type={media['media_type']}"
+
+
+async def get_media(user_id: str, media_id: str) -> Optional[Dict]:
+    """Media metadata from the media cache, else from Instagram (and cached). None if not found."""
+    cached = await asyncio.to_thread(get_cached_media, user_id, media_id)
+    if cached:
+        return cached
+
+    config = await get_config_async(user_id)
+    if _uses_instagrapi(config):
+        client = await asyncio.to_thread(_get_instagrapi_client, user_id, config)
+        info = await asyncio.to_thread(client.media_info, media_id)
+        media = {
+            "media_id": media_id,
+            "caption": info.caption_text or "",
+            "media_type": str(info.media_type),
+            "like_count": info.like_count,
+            "taken_at": str(info.taken_at),
+        }
+    else:
+        client = await _get_graph_api_client(user_id, config)
+        info = await client.get_media(media_id)
+        if "error" in info:
+            return None
+        media = {
+            "media_id": media_id,
+            "caption": info.get("caption", ""),
+            "media_type": info.get("media_type", ""),
+            "like_count": info.get("like_count", 0),
+            "taken_at": info.get("timestamp", ""),
+            "permalink": info.get("permalink", ""),
+        }
+    await asyncio.to_thread(upsert_media, user_id, [media])
+    return media
+
+
+async def get_media_details(user_id: str, media_id: str) -> str:
+    """Get info about a media post, from the media cache when possible."""
     try:
-        if config.get("api_mode") == "instagrapi":
-            client = _get_instagrapi_client()
-            info = client.media_info(media_id)
-            return f"Media: caption='{info.caption_text}', likes={info.like_count}, type={info.media_type}"
-        else:
-            client = _get_graph_api_client()
-            media_list = client.get_media_list(limit=50)
-            for m in media_list:
-                if m.get("id") == media_id:
-                    return f"Media: caption='{m.get('caption', '')}', likes={m.get('like_count', 0)}"
+        media = await get_media(user_id, media_id)
+        if not media:
             return f"Media {media_id} not found"
+        return _format_media(media)
     except Exception as e:
         return f"Error getting media details: {str(e)}"
 
 
-def get_followers_list() -> str:
+async def get_followers_list(user_id: str) -> str:
     """Get recent followers list."""
-    config = get_config()
+    config = await get_config_async(user_id)
     try:
-        if config.get("api_mode") == "instagrapi":
-            client = _get_instagrapi_client()
+        if _uses_instagrapi(config):
+            client = await asyncio.to_thread(_get_instagrapi_client, user_id, config)
             from instagram.instagrapi_client import get_account_info, get_followers
-            info = get_account_info(client)
-            followers = get_followers(client, info["user_id"], amount=20)
+            info = await asyncio.to_thread(get_account_info, client)
+            followers = await asyncio.to_thread(get_followers, client, info["user_id"], 20)
             follower_names = [f"@{f['username']}" for f in followers]
             return f"Recent followers ({len(followers)}): {', '.join(follower_names)}"
         else:
-            client = _get_graph_api_client()
-            info = client.get_account_info()
+            client = await _get_graph_api_client(user_id, config)
+            info = await client.get_account_info()
             count = info.get("followers_count", 0)
             return f"Total followers: {count} (Graph API doesn't provide individual follower list)"
     except Exception as e:
@@ -0,0 +1,270 @@
+"""In-memory fake Instagram client for offline monitor runs and benchmarks.
+
+Implements the subset of the instagrapi ``Client`` surface used by
+``instagram.instagrapi_client`` so the monitor can run end to end without a
+real account. Select it by setting ``api_mode = 'fake'`` on a user's config.
+"""
+import logging
+import random
+import threading
+import time
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+FAKE_API_MODE = "fake"
+
+# Per-user fake clients keyed by user_id, so state survives between polls
+_fake_clients: Dict[str, "FakeInstagramClient"] = {}
+_fake_clients_lock = threading.Lock()
+
+
+class FakeInstagramError(Exception):
+    """Error raised by the fake client when an injected failure fires."""
+
+
+class FakeInstagramClient:
+    """Scriptable stand-in for ``instagrapi.Client``.
+
+    New followers and likers are produced as event streams: every
+    ``user_followers`` call releases queued followers plus
+    ``new_followers_per_poll`` generated ones, and every ``media_likers`` call
+    does the same for that media. Each call sleeps for the configured latency
+    and may raise ``FakeInstagramError`` according to ``error_rate`` or a
+    failure queued with ``fail_next``.
+    """
+
+    def __init__(
+        self,
+        username: str = "fake_account",
+        media_count: int = 5,
+        initial_followers: int = 0,
+        new_followers_per_poll: int = 1,
+        new_likes_per_poll: int = 1,
+        latency_ms: int = 0,
+        latency_jitter_ms: int = 0,
+        error_rate: float = 0.0,
+        seed: Optional[int] = None,
+    ):
+        self.delay_range = [0, 0]
+        self.new_followers_per_poll = new_followers_per_poll
+        self.new_likes_per_poll = new_likes_per_poll
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.error_rate = error_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._next_pk = 1_000_000
+
+        self.account = self._new_user(username)
+        self.followers: Dict[int, SimpleNamespace] = {}
+        self.medias: List[SimpleNamespace] = []
+        self.likers: Dict[str, List[SimpleNamespace]] = {}
+        self.sent_dms: List[Dict] = []
+        self.posted_comments: List[Dict] = []
+        self.call_counts: Dict[str, int] = {}
+
+        self._pending_followers: List[str] = []
+        self._pending_likes: Dict[str, List[str]] = {}
+        self._pending_errors: Dict[str, List[Exception]] = {}
+
+        for _ in range(initial_followers):
+            user = self._new_user()
+            self.followers[user.pk] = user
+        for i in range(media_count):
+            self.add_media(caption=f"Fake post #{i + 1}")
+
+    # ---------- scripting ----------
+
+    def add_media(self, caption: str = "", media_type: int = 1) -> str:
+        """Publish a new post (newest first) and return its media id."""
+        with self._lock:
+            pk = self._alloc_pk()
+            media = SimpleNamespace(
+                pk=pk,
+                id=f"{pk}_{self.account.pk}",
+                caption_text=caption,
+                media_type=media_type,
+                taken_at=datetime.now(timezone.utc),
+                like_count=0,
+            )
+            self.medias.insert(0, media)
+            self.likers[str(pk)] = []
+            return str(pk)
+
+    def queue_followers(self, usernames: List[str]):
+        """Queue followers to appear on the next ``user_followers`` call."""
+        with self._lock:
+            self._pending_followers.extend(usernames)
+
+    def queue_likes(self, media_id: str, usernames: List[str]):
+        """Queue likers to appear on the next ``media_likers`` call for a media."""
+        with self._lock:
+            self._pending_likes.setdefault(str(media_id), []).extend(usernames)
+
+    def fail_next(self, method: str, error: Optional[Exception] = None):
+        """Make the next call to ``method`` raise ``error``."""
+        with self._lock:
+            self._pending_errors.setdefault(method, []).append(
+                error or FakeInstagramError(f"Injected failure in {method}")
+            )
+
+    # ---------- instagrapi surface ----------
+
+    def login(self, username: str = "", password: str = "") -> bool:
+        self._call("login")
+        return True
+
+    def set_settings(self, settings_data: dict):
+        return True
+
+    def get_settings(self) -> dict:
+        return {"fake": True, "username": self.account.username}
+
+    def account_info(self) -> SimpleNamespace:
+        self._call("account_info")
+        return self.account
+
+    def user_info(self, user_id) -> SimpleNamespace:
+        self._call("user_info")
+        with self._lock:
+            if int(user_id) == self.account.pk:
+                self.account.follower_count = len(self.followers)
+                self.account.media_count = len(self.medias)
+                return self.account
+            follower = self.followers.get(int(user_id))
+        if follower is None:
+            raise FakeInstagramError(f"User {user_id} not found")
+        return follower
+
+    def user_followers(self, user_id, amount: int = 0) -> Dict[int, SimpleNamespace]:
+        self._call("user_followers")
+        with self._lock:
+            usernames = self._pending_followers
+            self._pending_followers = []
+            usernames += [None] * self.new_followers_per_poll
+            # Newest followers first, like the real endpoint
+            new_users = {u.pk: u for u in (self._new_user(name) for name in usernames)}
+            self.followers = {**new_users, **self.followers}
+            items = list(self.followers.items())
+        if amount:
+            items = items[:amount]
+        return dict(items)
+
+    def user_medias(self, user_id, amount: int = 20) -> List[SimpleNamespace]:
+        self._call("user_medias")
+        with self._lock:
+            return list(self.medias[:amount] if amount else self.medias)
+
+    def media_info(self, media_id) -> SimpleNamespace:
+        self._call("media_info")
+        with self._lock:
+            media = self._find_media(media_id)
+        if media is None:
+            raise FakeInstagramError(f"Media {media_id} not found")
+        return media
+
+    def media_likers(self, media_id) -> List[SimpleNamespace]:
+        self._call("media_likers")
+        key = str(media_id)
+        with self._lock:
+            if key not in self.likers:
+                raise FakeInstagramError(f"Media {media_id} not found")
+            usernames = self._pending_likes.pop(key, [])
+            usernames += [None] * self.new_likes_per_poll
+            new_likers = [self._new_user(name) for name in usernames]
+            self.likers[key] = new_likers + self.likers[key]
+            media = self._find_media(key)
+            if media is not None:
+                media.like_count = len(self.likers[key])
+            return list(self.likers[key])
+
+    def direct_send(self, text: str, user_ids: List[int] = None, thread_ids: List[int] = None):
+        self._call("direct_send")
+        with self._lock:
+            message = {"text": text, "user_ids": list(user_ids or []), "sent_at": time.time()}
+            self.sent_dms.append(message)
+            return SimpleNamespace(id=str(len(self.sent_dms)), **message)
+
+    def media_comment(self, media_id, text: str):
+        self._call("media_comment")
+        with self._lock:
+            comment = {"media_id": str(media_id), "text": text, "posted_at": time.time()}
+            self.posted_comments.append(comment)
+            return SimpleNamespace(pk=str(len(self.posted_comments)), **comment)
+
+    # ---------- internals ----------
+
+    def _call(self, method: str):
+        """Count the call, apply simulated latency and fire injected errors."""
+        with self._lock:
+            self.call_counts[method] = self.call_counts.get(method, 0) + 1
+            queued = self._pending_errors.get(method)
+            error = queued.pop(0) if queued else None
+            jitter = self._random.randint(0, self.latency_jitter_ms) if self.latency_jitter_ms else 0
+            random_failure = self.error_rate > 0 and self._random.random() < self.error_rate
+
+        latency = self.latency_ms + jitter
+        if latency > 0:
+            time.sleep(latency / 1000)
+        if error is not None:
+            raise error
+        if random_failure:
+            raise FakeInstagramError(f"Random failure in {method}")
+
+    def _alloc_pk(self) -> int:
+        self._next_pk += 1
+        return self._next_pk
+
+    def _new_user(self, username: Optional[str] = None) -> SimpleNamespace:
+        pk = self._alloc_pk()
+        username = username or f"fake_user_{pk}"
+        return SimpleNamespace(
+            pk=pk,
+            username=username,
+            full_name=username.replace("_", " ").title(),
+            follower_count=0,
+            media_count=0,
+        )
+
+    def _find_media(self, media_id) -> Optional[SimpleNamespace]:
+        key = str(media_id).split("_")[0]
+        for media in self.medias:
+            if str(media.pk) == key:
+                return media
+        return None
+
+
+def get_fake_client(user_id: str) -> FakeInstagramClient:
+    """Get or create the fake client for a user, configured from settings."""
+    with _fake_clients_lock:
+        if user_id not in _fake_clients:
+            _fake_clients[user_id] = FakeInstagramClient(
+                username=f"fake_{user_id[:8]}",
+                media_count=settings.fake_ig_media_count,
+                initial_followers=settings.fake_ig_initial_followers,
+                new_followers_per_poll=settings.fake_ig_new_followers_per_poll,
+                new_likes_per_poll=settings.fake_ig_new_likes_per_poll,
+                latency_ms=settings.fake_ig_latency_ms,
+                latency_jitter_ms=settings.fake_ig_latency_jitter_ms,
+                error_rate=settings.fake_ig_error_rate,
+                seed=settings.fake_ig_seed,
+            )
+            logger.info(f"[{user_id}] Created fake Instagram client")
+        return _fake_clients[user_id]
+
+
+def set_fake_client(user_id: str, client: FakeInstagramClient):
+    """Install a pre-scripted fake client for a user (benchmarks, tests)."""
+    with _fake_clients_lock:
+        _fake_clients[user_id] = client
+
+
+def reset_fake_client(user_id: str):
+    """Drop a user's fake client so the next call starts from a fresh account."""
+    with _fake_clients_lock:
+        _fake_clients.pop(user_id, None)
@@ -1,79 +1,272 @@
+import asyncio
 import httpx
+import json
 import logging
-from typing import List, Dict, Optional
+import time
+from typing import List, Dict, Optional, Tuple
+from urllib.parse import urlencode
+from config import settings
+from instagram.graph_usage import usage_tracker
 
 logger = logging.getLogger(__name__)
 
 GRAPH_API_BASE = "https://graph.facebook.com/v19.0"
+GRAPH_BATCH_MAX_SIZE = 50
+# Batchers unused for this long are dropped (rotated or expired tokens)
+_BATCHER_IDLE_SECONDS = 300
+
+# Process-wide HTTP client shared by every tenant (keep-alive + HTTP/2)
+_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Get the shared Graph API HTTP client, creating it on first use."""
+    global _http_client
+    if _http_client is None or _http_client.is_closed:
+        _http_client = httpx.AsyncClient(
+            http2=True,
+            timeout=30,
+            limits=httpx.Limits(
+                max_connections=settings.graph_api_max_connections,
+                max_keepalive_connections=settings.graph_api_max_keepalive_connections,
+                keepalive_expiry=60,
+            ),
+        )
+    return _http_client
+
+
+async def close_http_client():
+    """Close the shared HTTP client (called on shutdown)."""
+    global _http_client
+    if _http_client is not None:
+        await _http_client.aclose()
+        _http_client = None
+
+
+class GraphBatcher:
+    """Coalesces concurrent Graph API calls made with one access token.
+
+    An operation submitted while nothing else is pending or in flight is sent
+    right away, so serial callers pay no delay. Operations arriving while
+    others are in flight (e.g. webhook consumers handling one tenant's
+    events concurrently) are collected for ``graph_api_batch_window_ms`` and
+    sent as a single ``batch`` request (up to 50 per request); the per-item
+    responses are handed back to each caller. A window holding a single
+    operation is sent as a plain request.
+    """
+
+    def __init__(self, access_token: str):
+        self.access_token = access_token
+        self._pending: List[Tuple[Dict, asyncio.Future]] = []
+        self._timer: Optional[asyncio.Task] = None
+        self._inflight = set()
+        self.last_used = time.monotonic()
+
+    @property
+    def idle(self) -> bool:
+        return not self._pending and not self._inflight and self._timer is None
+
+    async def submit(self, op: Dict) -> Dict:
+        self.last_used = time.monotonic()
+        future = asyncio.get_running_loop().create_future()
+        busy = not self.idle
+        self._pending.append((op, future))
+        if not busy or len(self._pending) >= GRAPH_BATCH_MAX_SIZE:
+            self._flush_chunk()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+        return await future
+
+    async def _flush_later(self):
+        try:
+            await asyncio.sleep(settings.graph_api_batch_window_ms / 1000)
+        finally:
+            self._timer = None
+        while self._pending:
+            self._flush_chunk()
+
+    def _flush_chunk(self):
+        chunk = self._pending[:GRAPH_BATCH_MAX_SIZE]
+        self._pending = self._pending[GRAPH_BATCH_MAX_SIZE:]
+        task = asyncio.create_task(self._send(chunk))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._inflight.add(task)
+        task.add_done_callback(self._inflight.discard)
+
+    async def _send(self, chunk: List[Tuple[Dict, asyncio.Future]]):
+        try:
+            if len(chunk) == 1:
+                results = [await _send_single(self.access_token, chunk[0][0])]
+            else:
+                results = await _send_batch(self.access_token, [op for op, _ in chunk])
+            # No longer in flight once answered, so a caller's next call goes out right away
+            self._inflight.discard(asyncio.current_task())
+            for (_, future), result in zip(chunk, results):
+                if not future.done():
+                    future.set_result(result)
+        except Exception as e:
+            self._inflight.discard(asyncio.current_task())
+            for _, future in chunk:
+                if not future.done():
+                    future.set_exception(e)
+
+
+_batchers: Dict[str, GraphBatcher] = {}
+_batchers_swept_at = 0.0
+
+
+def get_batcher(access_token: str) -> GraphBatcher:
+    global _batchers_swept_at
+    now = time.monotonic()
+    if now - _batchers_swept_at > _BATCHER_IDLE_SECONDS:
+        _batchers_swept_at = now
+        for token, batcher in list(_batchers.items()):
+            if batcher.idle and now - batcher.last_used > _BATCHER_IDLE_SECONDS:
+                del _batchers[token]
+    if access_token not in _batchers:
+        _batchers[access_token] = GraphBatcher(access_token)
+    return _batchers[access_token]
+
+
+async def _send_single(access_token: str, op: Dict) -> Dict:
+    url = f"{GRAPH_API_BASE}/{op['path']}"
+    params = {**op.get("params", {}), "access_token": access_token}
+    client = get_http_client()
+    if op["method"] == "GET":
+        resp = await client.get(url, params=params)
+    elif op.get("json"):
+        resp = await client.post(url, json=params)
+    else:
+        resp = await client.post(url, data=params)
+    usage_tracker.record(op.get("app_key", ""), resp.headers)
+    return resp.json()
+
+
+def _batch_item(op: Dict) -> Dict:
+    # Nested values (e.g. Messaging API recipient/message) are sent as JSON strings
+    params = {
+        k: json.dumps(v) if isinstance(v, (dict, list)) else v
+        for k, v in op.get("params", {}).items()
+    }
+    if op["method"] == "GET":
+        relative_url = op["path"] + (f"?{urlencode(params)}" if params else "")
+        return {"method": "GET", "relative_url": relative_url}
+    return {"method": op["method"], "relative_url": op["path"], "body": urlencode(params)}
+
+
+async def _send_batch(access_token: str, ops: List[Dict]) -> List[Dict]:
+    """POST / with ``batch=[...]`` and split the responses back per operation."""
+    resp = await get_http_client().post(
+        f"{GRAPH_API_BASE}/",
+        data={"access_token": access_token, "batch": json.dumps([_batch_item(op) for op in ops])},
+    )
+    app_key = ops[0].get("app_key", "")
+    usage_tracker.record(app_key, resp.headers)
+    data = resp.json()
+    if isinstance(data, dict):
+        # The whole batch was rejected (bad token, malformed request...)
+        return [data] * len(ops)
+
+    results = []
+    for item in data:
+        if item is None:
+            results.append({"error": "Batch operation was not processed"})
+            continue
+        # Batch items carry their own usage headers as [{"name": ..., "value": ...}]
+        item_headers = {h["name"].lower(): h["value"] for h in item.get("headers") or [] if "name" in h}
+        usage_tracker.record(app_key, item_headers)
+        try:
+            results.append(json.loads(item.get("body") or "{}"))
+        except json.JSONDecodeError:
+            results.append({"error": f"Invalid batch response (HTTP {item.get('code')})"})
+    return results
 
 
 class InstagramGraphAPI:
-    def __init__(self, access_token: str, ig_account_id: str, page_id: str):
+    def __init__(self, access_token: str, ig_account_id: str, page_id: str, app_id: str = ""):
         self.access_token = access_token
         self.ig_account_id = ig_account_id
         self.page_id = page_id
-        self.client = httpx.Client(timeout=30)
+        # Usage is tracked per app; tenants without an app id share the default bucket
+        self.app_key = app_id or "default"
+        self.client = get_http_client()
+
+    async def _call(
+        self, method: str, path: str, params: Dict = None, json_body: bool = False, urgent: bool = False
+    ) -> Dict:
+        """Run one Graph API operation, through the batcher when batching is enabled.
 
-    def get_media_list(self, limit: int = 25) -> List[Dict]:
+        Raises GraphThrottled when usage is too close to the quota for this call.
+        """
+        await usage_tracker.throttle(self.app_key, (self.ig_account_id, self.page_id), urgent=urgent)
+        op = {"method": method, "path": path, "params": params or {}, "json": json_body, "app_key": self.app_key}
+        if settings.graph_api_batch_window_ms > 0:
+            return await get_batcher(self.access_token).submit(op)
+        return await _send_single(self.access_token, op)
+
+    async def get_media_list(self, limit: int = 25) -> List[Dict]:
         """GET /{ig-user-id}/media"""
         try:
-            url = f"{GRAPH_API_BASE}/{self.ig_account_id}/media"
             params = {
                 "fields": "id,caption,media_type,media_url,timestamp,like_count",
                 "limit": limit,
-                "access_token": self.access_token,
             }
-            resp = self.client.get(url, params=params)
-            data = resp.json()
+            data = await self._call("GET", f"{self.ig_account_id}/media", params)
             return data.get("data", [])
         except Exception as e:
             logger.error(f"Graph API error (get_media_list): {e}")
             return []
 
-    def post_comment(self, media_id: str, message: str) -> Dict:
+    async def get_media(self, media_id: str) -> Dict:
+        """GET /{media-id}?fields=..."""
+        try:
+            params = {"fields": "id,caption,media_type,timestamp,like_count,permalink"}
+            return await self._call("GET", media_id, params)
+        except Exception as e:
+            logger.error(f"Graph API error (get_media): {e}")
+            return {"error": str(e)}
+
+    async def post_comment(self, media_id: str, message: str) -> Dict:
         """POST /{media-id}/comments"""
         try:
-            url = f"{GRAPH_API_BASE}/{media_id}/comments"
-            data = {"message": message, "access_token": self.access_token}
-            resp = self.client.post(url, data=data)
-            return resp.json()
+            return await self._call("POST", f"{media_id}/comments", {"message": message}, urgent=True)
         except Exception as e:
             logger.error(f"Graph API error (post_comment): {e}")
             return {"error": str(e)}
 
-    def send_message(self, recipient_id: str, message: str) -> Dict:
+    async def reply_to_comment(self, comment_id: str, message: str) -> Dict:
+        """POST /{comment-id}/replies"""
+        try:
+            return await self._call("POST", f"{comment_id}/replies", {"message": message}, urgent=True)
+        except Exception as e:
+            logger.error(f"Graph API error (reply_to_comment): {e}")
+            return {"error": str(e)}
+
+    async def send_message(self, recipient_id: str, message: str) -> Dict:
         """Send DM via Instagram Messaging API."""
         try:
-            url = f"{GRAPH_API_BASE}/{self.page_id}/messages"
-            data = {
+            params = {
                 "recipient": {"id": recipient_id},
                 "message": {"text": message},
-                "access_token": self.access_token,
             }
-            resp = self.client.post(url, json=data)
-            return resp.json()
+            return await self._call("POST", f"{self.page_id}/messages", params, json_body=True, urgent=True)
         except Exception as e:
             logger.error(f"Graph API error (send_message): {e}")
             return {"error": str(e)}
 
-    def get_account_info(self) -> Dict:
+    async def get_account_info(self) -> Dict:
         """GET /{ig-user-id}?fields=..."""
         try:
-            url = f"{GRAPH_API_BASE}/{self.ig_account_id}"
-            params = {
-                "fields": "id,username,name,followers_count,media_count",
-                "access_token": self.access_token,
-            }
-            resp = self.client.get(url, params=params)
-            return resp.json()
+            params = {"fields": "id,username,name,followers_count,media_count"}
+            return await self._call("GET", self.ig_account_id, params)
         except Exception as e:
             logger.error(f"Graph API error (get_account_info): {e}")
             return {"error": str(e)}
 
-    def test_connection(self) -> Dict:
+    async def test_connection(self) -> Dict:
         """Test the API connection."""
         try:
-            info = self.get_account_info()
+            info = await self.get_account_info()
             if "error" in info:
                 return {"success": False, "error": info["error"]}
             return {"success": True, "account": info}
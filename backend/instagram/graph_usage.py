@@ -0,0 +1,147 @@
+"""Graph API rate-limit usage tracking and adaptive throttling.
+
+Meta reports quota usage on every response through ``X-App-Usage``,
+``X-Business-Use-Case-Usage`` and ``X-Ad-Account-Usage``. The tracker keeps
+the latest reading per app and per business account, decays it over Meta's
+rolling one-hour window and uses it to delay or shed non-urgent calls before
+the quota runs out.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from typing import Dict, Iterable, Mapping, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+# Meta computes usage over a rolling one-hour window
+USAGE_WINDOW_SECONDS = 3600
+
+
+class GraphThrottled(Exception):
+    """Raised when a call is shed because the quota is (nearly) exhausted."""
+
+
+def _max_pct(values: Mapping) -> float:
+    pcts = [float(v) for k, v in values.items() if isinstance(v, (int, float)) and k != "estimated_time_to_regain_access"]
+    return max(pcts, default=0.0)
+
+
+class GraphUsageTracker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        # key -> {"pct", "details", "reported_at", "blocked_until"}
+        self._apps: Dict[str, Dict] = {}
+        self._businesses: Dict[str, Dict] = {}
+        self._ad_accounts: Dict[str, Dict] = {}
+
+    # ---------- recording ----------
+
+    def record(self, app_key: str, headers: Mapping[str, str]):
+        """Update usage from the headers of a Graph API response."""
+        now = time.time()
+        try:
+            app_usage = headers.get("x-app-usage")
+            if app_usage:
+                details = json.loads(app_usage)
+                self._store(self._apps, app_key, _max_pct(details), details, now)
+
+            buc_usage = headers.get("x-business-use-case-usage")
+            if buc_usage:
+                for business_id, entries in json.loads(buc_usage).items():
+                    # One entry per use case type; the busiest one governs
+                    pct = max((_max_pct(e) for e in entries), default=0.0)
+                    regain = max((e.get("estimated_time_to_regain_access", 0) or 0 for e in entries), default=0)
+                    self._store(
+                        self._businesses, str(business_id), pct, entries, now,
+                        blocked_until=now + regain * 60 if regain else 0,
+                    )
+
+            ad_usage = headers.get("x-ad-account-usage")
+            if ad_usage:
+                details = json.loads(ad_usage)
+                self._store(self._ad_accounts, app_key, float(details.get("acc_id_util_pct", 0)), details, now)
+        except (ValueError, TypeError, AttributeError) as e:
+            logger.debug(f"Unparseable Graph API usage header: {e}")
+
+    def _store(self, table: Dict, key: str, pct: float, details: Dict, now: float, blocked_until: float = 0):
+        with self._lock:
+            table[key] = {"pct": pct, "details": details, "reported_at": now, "blocked_until": blocked_until}
+
+    # ---------- estimates ----------
+
+    @staticmethod
+    def _estimate(entry: Optional[Dict], now: float) -> float:
+        """Reported usage decayed linearly over the rolling window since it was reported."""
+        if not entry:
+            return 0.0
+        age = now - entry["reported_at"]
+        return entry["pct"] * max(0.0, 1 - age / USAGE_WINDOW_SECONDS)
+
+    def usage(self, app_key: str, business_ids: Iterable[str] = ()) -> float:
+        """Highest estimated usage (percent) among the app and the given business accounts."""
+        now = time.time()
+        with self._lock:
+            entries = [self._apps.get(app_key), self._ad_accounts.get(app_key)]
+            entries += [self._businesses.get(str(b)) for b in business_ids if b]
+        return max(self._estimate(e, now) for e in entries)
+
+    def _blocked_for(self, business_ids: Iterable[str]) -> float:
+        now = time.time()
+        with self._lock:
+            until = max((self._businesses.get(str(b), {}).get("blocked_until", 0) for b in business_ids if b), default=0)
+        return max(0.0, until - now)
+
+    async def throttle(self, app_key: str, business_ids: Iterable[str] = (), urgent: bool = False):
+        """Delay or shed a call according to the current usage estimate.
+
+        Non-urgent calls are delayed progressively once usage passes
+        ``graph_api_throttle_start_pct`` and shed above ``graph_api_shed_pct``.
+        Urgent calls only stop when Meta reports the account as blocked or
+        usage reaches 100%.
+        """
+        business_ids = list(business_ids)
+        blocked_for = self._blocked_for(business_ids)
+        if blocked_for > 0:
+            raise GraphThrottled(f"Graph API access blocked for another {int(blocked_for)}s")
+
+        pct = self.usage(app_key, business_ids)
+        if pct >= 100 or (not urgent and pct >= settings.graph_api_shed_pct):
+            raise GraphThrottled(f"Graph API usage at {pct:.0f}% - call shed")
+
+        start = settings.graph_api_throttle_start_pct
+        if not urgent and pct > start:
+            ratio = (pct - start) / max(1, settings.graph_api_shed_pct - start)
+            await asyncio.sleep(ratio * settings.graph_api_throttle_max_delay_seconds)
+
+    def snapshot(self) -> Dict:
+        """Current usage estimates (admin endpoint)."""
+        now = time.time()
+
+        def _view(table: Dict) -> Dict:
+            return {
+                key: {
+                    "reported_pct": entry["pct"],
+                    "estimated_pct": round(self._estimate(entry, now), 1),
+                    "reported_seconds_ago": int(now - entry["reported_at"]),
+                    "blocked_for_seconds": int(max(0, entry["blocked_until"] - now)),
+                    "details": entry["details"],
+                }
+                for key, entry in table.items()
+            }
+
+        with self._lock:
+            return {
+                "apps": _view(self._apps),
+                "business_accounts": _view(self._businesses),
+                "ad_accounts": _view(self._ad_accounts),
+                "throttle_start_pct": settings.graph_api_throttle_start_pct,
+                "shed_pct": settings.graph_api_shed_pct,
+            }
+
+
+# Process-wide tracker shared by every tenant
+usage_tracker = GraphUsageTracker()
@@ -71,6 +71,11 @@ def get_client(user_id: str, username: str, password: str, session_data: str = "
     return client
 
 
+def has_client(user_id: str) -> bool:
+    """Whether a logged-in client is already cached for this user."""
+    return user_id in _clients and bool(_logged_in.get(user_id))
+
+
 def export_session(client: InstaClient) -> str:
     """Export current session as JSON string for reuse."""
     return json.dumps(client.get_settings())
@@ -85,7 +90,7 @@ def reset_client(user_id: str):
 def get_account_info(client: InstaClient) -> Dict:
     """Get info about the logged-in account."""
     account = client.account_info()
-    user_id = str(account.pk)
+    user_id = int(account.pk)
     try:
         user = client.user_info(account.pk)
         return {
@@ -105,13 +110,13 @@ def get_account_info(client: InstaClient) -> Dict:
         }
 
 
-def get_followers(client: InstaClient, user_id: str, amount: int = 50) -> List[Dict]:
+def get_followers(client: InstaClient, user_id: int, amount: int = 50) -> List[Dict]:
     """Get list of followers."""
     try:
         followers = client.user_followers(int(user_id), amount=amount)
         return [
             {
-                "user_id": str(uid),
+                "user_id": int(uid),
                 "username": user.username,
                 "full_name": user.full_name,
             }
@@ -122,17 +127,18 @@ def get_followers(client: InstaClient, user_id: str, amount: int = 50) -> List[D
         return []
 
 
-def get_user_medias(client: InstaClient, user_id: str, amount: int = 10) -> List[Dict]:
+def get_user_medias(client: InstaClient, user_id: int, amount: int = 10) -> List[Dict]:
     """Get recent media posts for the account."""
     try:
         medias = client.user_medias(int(user_id), amount=amount)
         return [
             {
-                "media_id": str(m.pk),
+                "media_id": int(m.pk),
                 "caption": m.caption_text or "",
                 "media_type": str(m.media_type),
                 "taken_at": str(m.taken_at),
                 "like_count": m.like_count,
+                "permalink": f"https://www.instagram.com/p/{m.code}/" if getattr(m, "code", "") else "",
             }
             for m in medias
         ]
@@ -141,13 +147,13 @@ def get_user_medias(client: InstaClient, user_id: str, amount: int = 10) -> List
         return []
 
 
-def get_media_likers(client: InstaClient, media_id: str) -> List[Dict]:
+def get_media_likers(client: InstaClient, media_id: int) -> List[Dict]:
     """Get list of users who liked a specific media."""
     try:
-        likers = client.media_likers(media_id)
+        likers = client.media_likers(str(media_id))
         return [
             {
-                "user_id": str(u.pk),
+                "user_id": int(u.pk),
                 "username": u.username,
             }
             for u in likers
@@ -157,7 +163,7 @@ def get_media_likers(client: InstaClient, media_id: str) -> List[Dict]:
         return []
 
 
-def send_dm(client: InstaClient, user_ids: List[str], message: str) -> bool:
+def send_dm(client: InstaClient, user_ids: List[int], message: str) -> bool:
     """Send a direct message to one or more users."""
     try:
         result = client.direct_send(message, user_ids=[int(uid) for uid in user_ids])
@@ -167,10 +173,10 @@ def send_dm(client: InstaClient, user_ids: List[str], message: str) -> bool:
         return False
 
 
-def post_comment(client: InstaClient, media_id: str, text: str) -> bool:
+def post_comment(client: InstaClient, media_id: int, text: str) -> bool:
     """Post a comment on a media post."""
     try:
-        result = client.media_comment(media_id, text)
+        result = client.media_comment(str(media_id), text)
         return result is not None
     except Exception as e:
         logger.error(f"Error posting comment: {e}")
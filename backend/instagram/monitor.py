@@ -2,11 +2,39 @@ import asyncio
 import logging
 import random
 from datetime import datetime
-from typing import Optional, Dict
-
-from services.config_service import get_config, increment_daily_counter, reset_daily_counters_if_needed
-from services.conversation_service import log_conversation, log_activity
+import time
+from typing import Optional, Dict, List
+
+from config import settings
+from services.config_service import get_config_async, get_credentials_async, get_global_config_async
+from services.conversation_service import log_activity_async, log_conversation_async
+from services.known_service import add_known_follower, add_known_like, get_known_followers, get_known_likers
+from services.media_cache_service import upsert_media
+from services.live_events import live_events
+from services.quota_service import quota_limit, reserve_async
+from services.monitor_command_service import (
+    empty_monitor_status,
+    get_monitor_status,
+    list_monitor_statuses,
+    save_monitor_statuses,
+)
+from services.monitor_lease_service import (
+    INSTANCE_ID,
+    acquire_lease,
+    expire_leases,
+    get_orphaned_accounts,
+    get_resumable_accounts,
+    release_lease,
+    renew_leases,
+    set_monitor_enabled,
+)
 from agent.instagram_agent import generate_greeting, generate_like_comment
+from instagram.fake_client import FAKE_API_MODE, get_fake_client
+
+# api_mode values served by the instagrapi helpers (the fake client mimics instagrapi)
+INSTAGRAPI_MODES = ("instagrapi", FAKE_API_MODE)
+
+_login_semaphore = asyncio.Semaphore(settings.monitor_max_concurrent_logins)
 
 logger = logging.getLogger(__name__)
 
@@ -37,6 +65,9 @@ class InstagramMonitor:
             "errors": self.errors,
         }
 
+    def _publish_status(self):
+        live_events.publish(self.user_id, "status", self.get_status())
+
     async def _delay(self, base_seconds: int, randomization_max: int):
         """Sleep for base_seconds + random(0, randomization_max) seconds."""
         extra = random.randint(0, max(0, randomization_max))
@@ -47,27 +78,28 @@ class InstagramMonitor:
         if self._running:
             return {"status": "already_running"}
 
-        config = get_config(self.user_id)
+        config = await get_config_async(self.user_id)
         self.interval = config.get("polling_interval_seconds", 60)
 
         # Validate config
         api_mode = config.get("api_mode", "instagrapi")
+        credentials = await get_credentials_async(self.user_id) if api_mode != FAKE_API_MODE else {}
         if api_mode == "instagrapi":
-            if not config.get("ig_username") or (not config.get("ig_password") and not config.get("ig_session")):
+            if not config.get("ig_username") or (not credentials["ig_password"] and not credentials["ig_session"]):
                 return {"status": "error", "message": "Instagram credentials not configured. Use the local login script to import a session."}
-        else:
-            if not config.get("access_token"):
+        elif api_mode != FAKE_API_MODE:
+            if not credentials["access_token"]:
                 return {"status": "error", "message": "Instagram access token not configured"}
 
-        # LLM key comes from global config
-        from services.config_service import get_global_config
-        global_cfg = get_global_config()
-        if not global_cfg.get("llm_api_key"):
+        # LLM key comes from global config (fake mode falls back to templates without it)
+        global_cfg = await get_global_config_async()
+        if not global_cfg.get("llm_api_key") and api_mode != FAKE_API_MODE:
             return {"status": "error", "message": "LLM API key not configured (contact admin)"}
 
         self._running = True
         self._task = asyncio.create_task(self._poll_loop())
-        await asyncio.to_thread(log_activity, self.user_id, "info", "Monitor started", f"Polling every {self.interval}s")
+        self._publish_status()
+        await log_activity_async(self.user_id, "info", "Monitor started", f"Polling every {self.interval}s")
         return {"status": "started"}
 
     async def stop(self):
@@ -79,20 +111,34 @@ class InstagramMonitor:
             except asyncio.CancelledError:
                 pass
             self._task = None
-        await asyncio.to_thread(log_activity, self.user_id, "info", "Monitor stopped")
+        self._publish_status()
+        await log_activity_async(self.user_id, "info", "Monitor stopped")
         return {"status": "stopped"}
 
+    async def _get_client(self, config: dict):
+        """Get the instagrapi-compatible client for the configured api_mode."""
+        if config.get("api_mode") == FAKE_API_MODE:
+            return get_fake_client(self.user_id)
+        from instagram.instagrapi_client import get_client, has_client
+        if has_client(self.user_id):
+            return await asyncio.to_thread(get_client, self.user_id, config["ig_username"], "", "")
+        # Password and session are only read to log in
+        credentials = await get_credentials_async(self.user_id)
+        # Fresh logins are bounded process-wide to avoid login bursts
+        async with _login_semaphore:
+            return await asyncio.to_thread(
+                get_client, self.user_id, config["ig_username"],
+                credentials["ig_password"], credentials["ig_session"],
+            )
+
     async def _poll_loop(self):
         """Main polling loop."""
         while self._running:
             try:
-                # Reset daily counters if 24h have passed
-                await asyncio.to_thread(reset_daily_counters_if_needed, self.user_id)
-
                 self.last_poll = datetime.utcnow().isoformat()
                 self.total_polls += 1
 
-                config = get_config(self.user_id)
+                config = await get_config_async(self.user_id)
                 self.interval = config.get("polling_interval_seconds", 60)
 
                 # Alternate between checking followers and likes
@@ -100,43 +146,40 @@ class InstagramMonitor:
                     if config.get("welcome_dm_enabled", True):
                         await self._check_new_followers()
                     else:
-                        await asyncio.to_thread(
-                            log_activity, self.user_id, "info", "Follower check skipped - welcome DMs disabled"
+                        await log_activity_async(
+                            self.user_id, "info", "Follower check skipped - welcome DMs disabled"
                         )
                 else:
                     if config.get("auto_comment_enabled", True):
                         await self._check_media_likes()
                     else:
-                        await asyncio.to_thread(
-                            log_activity, self.user_id, "info", "Like check skipped - auto-comments disabled"
+                        await log_activity_async(
+                            self.user_id, "info", "Like check skipped - auto-comments disabled"
                         )
 
             except Exception as e:
                 self.errors += 1
                 logger.error(f"[{self.user_id}] Monitor poll error: {e}")
                 try:
-                    await asyncio.to_thread(log_activity, self.user_id, "error", f"Poll error: {str(e)}")
+                    await log_activity_async(self.user_id, "error", f"Poll error: {str(e)}")
                 except Exception:
                     pass
 
+            # Polls, detections and errors of this round
+            self._publish_status()
             await asyncio.sleep(self.interval)
 
     async def _check_new_followers(self):
         """Detect new followers and send greeting DMs."""
-        config = get_config(self.user_id)
-        if config.get("api_mode") != "instagrapi":
-            await asyncio.to_thread(log_activity, self.user_id, "info", "Follower check skipped - Graph API doesn't support follower list")
+        config = await get_config_async(self.user_id)
+        if config.get("api_mode") not in INSTAGRAPI_MODES:
+            await log_activity_async(self.user_id, "info", "Follower check skipped - Graph API doesn't support follower list")
             return
 
         try:
-            from instagram.instagrapi_client import get_client, get_account_info, get_followers, send_dm
-            from database import engine
-            from sqlalchemy import text
+            from instagram.instagrapi_client import get_account_info, get_followers, send_dm
 
-            session_data = config.get("ig_session", "")
-            client = await asyncio.to_thread(
-                get_client, self.user_id, config["ig_username"], config["ig_password"], session_data
-            )
+            client = await self._get_client(config)
             account_info = await asyncio.to_thread(get_account_info, client)
             ig_user_id = account_info["user_id"]
 
@@ -144,44 +187,30 @@ class InstagramMonitor:
             followers_limit = config.get("followers_per_check", 20)
             current_followers = await asyncio.to_thread(get_followers, client, ig_user_id, followers_limit)
 
-            def _db_get_known_followers():
-                with engine.connect() as conn:
-                    result = conn.execute(
-                        text("SELECT instagram_user_id FROM known_followers WHERE user_id = :uid"),
-                        {"uid": self.user_id},
-                    )
-                    return {row[0] for row in result.fetchall()}
-
-            known_ids = await asyncio.to_thread(_db_get_known_followers)
+            known_ids = await get_known_followers(self.user_id)
+            new_followers = [f for f in current_followers if f["user_id"] not in known_ids]
 
-            max_dms = config.get("max_dms_per_day", 20)
+            max_dms = quota_limit(config, "dm")
             delay_dms = config.get("delay_between_dms", 45)
             randomization = config.get("delay_randomization_max", 30)
 
+            # One DM slot per new follower, reserved up front and returned if unused
+            quota = await reserve_async(self.user_id, "dm", len(new_followers), max_dms)
             new_count = 0
-            for follower in current_followers:
-                fid = follower["user_id"]
-                if fid not in known_ids:
+            try:
+                for follower in new_followers:
+                    fid = follower["user_id"]
                     username = follower.get("username", "")
                     new_count += 1
                     self.new_followers_detected += 1
 
                     # Insert into known followers
-                    def _db_insert_follower(uid, uname):
-                        with engine.connect() as conn:
-                            conn.execute(
-                                text("INSERT INTO known_followers (user_id, instagram_user_id, instagram_username) VALUES (:owner, :uid, :uname) ON CONFLICT DO NOTHING"),
-                                {"owner": self.user_id, "uid": uid, "uname": uname},
-                            )
-                            conn.commit()
-
-                    await asyncio.to_thread(_db_insert_follower, fid, username)
+                    await add_known_follower(self.user_id, fid, username)
 
                     # Check daily DM limit
-                    current_count = config.get("dms_sent_today", 0)
-                    if current_count >= max_dms:
-                        await asyncio.to_thread(
-                            log_activity, self.user_id, "warning",
+                    if not quota.consume():
+                        await log_activity_async(
+                            self.user_id, "warning",
                             f"Daily DM limit reached ({max_dms}). Skipping DM to @{username}."
                         )
                         break
@@ -190,12 +219,11 @@ class InstagramMonitor:
                     greeting = await asyncio.to_thread(generate_greeting, username)
                     dm_success = await asyncio.to_thread(send_dm, client, [fid], greeting)
 
-                    if dm_success:
-                        await asyncio.to_thread(increment_daily_counter, self.user_id, "dms_sent_today")
+                    if not dm_success:
+                        quota.refund()
 
                     # Log the conversation
-                    await asyncio.to_thread(
-                        log_conversation,
+                    await log_conversation_async(
                         user_id=self.user_id,
                         instagram_user_id=fid,
                         instagram_username=username,
@@ -205,53 +233,50 @@ class InstagramMonitor:
                     )
 
                     status = "sent" if dm_success else "failed"
-                    await asyncio.to_thread(
-                        log_activity, self.user_id, "info", f"New follower @{username} - DM {status}", greeting
+                    await log_activity_async(
+                        self.user_id, "info", f"New follower @{username} - DM {status}", greeting
                     )
 
                     # Configurable delay with randomization
                     await self._delay(delay_dms, randomization)
-
-                    # Re-read config for updated counter
-                    config = get_config(self.user_id)
+            finally:
+                await quota.release_async()
 
             if new_count > 0:
-                await asyncio.to_thread(log_activity, self.user_id, "info", f"Detected {new_count} new followers")
+                await log_activity_async(self.user_id, "info", f"Detected {new_count} new followers")
             else:
-                await asyncio.to_thread(log_activity, self.user_id, "info", "Follower check complete - no new followers")
+                await log_activity_async(self.user_id, "info", "Follower check complete - no new followers")
 
         except Exception as e:
             self.errors += 1
             logger.error(f"[{self.user_id}] Follower check error: {e}")
-            await asyncio.to_thread(log_activity, self.user_id, "error", f"Follower check error: {str(e)}")
+            await log_activity_async(self.user_id, "error", f"Follower check error: {str(e)}")
 
     async def _check_media_likes(self):
         """Detect new likes on posts and post contextual comments."""
-        config = get_config(self.user_id)
-        if config.get("api_mode") != "instagrapi":
-            await asyncio.to_thread(log_activity, self.user_id, "info", "Like check skipped - Graph API doesn't support liker list")
+        config = await get_config_async(self.user_id)
+        if config.get("api_mode") not in INSTAGRAPI_MODES:
+            await log_activity_async(self.user_id, "info", "Like check skipped - Graph API doesn't support liker list")
             return
 
         try:
             from instagram.instagrapi_client import (
-                get_client, get_account_info, get_user_medias,
-                get_media_likers, post_comment,
+                get_account_info, get_user_medias, get_media_likers, post_comment,
             )
-            from database import engine
-            from sqlalchemy import text
 
-            session_data = config.get("ig_session", "")
-            client = await asyncio.to_thread(
-                get_client, self.user_id, config["ig_username"], config["ig_password"], session_data
-            )
+            client = await self._get_client(config)
             account_info = await asyncio.to_thread(get_account_info, client)
             ig_user_id = account_info["user_id"]
 
             # Use configurable limit
             media_limit = config.get("media_posts_per_check", 3)
             medias = await asyncio.to_thread(get_user_medias, client, ig_user_id, media_limit)
+            try:
+                await asyncio.to_thread(upsert_media, self.user_id, medias)
+            except Exception as e:
+                logger.warning(f"[{self.user_id}] Media cache refresh failed: {e}")
 
-            max_comments = config.get("max_comments_per_day", 20)
+            max_comments = quota_limit(config, "comment")
             delay_comments = config.get("delay_between_comments", 60)
             delay_media = config.get("delay_between_media_checks", 5)
             randomization = config.get("delay_randomization_max", 30)
@@ -270,42 +295,25 @@ class InstagramMonitor:
                 likers = await asyncio.to_thread(get_media_likers, client, media_id)
 
                 # Get known likers for this media
-                def _db_get_known_likers(mid):
-                    with engine.connect() as conn:
-                        result = conn.execute(
-                            text("SELECT instagram_user_id FROM known_media_likes WHERE user_id = :uid AND media_id = :mid"),
-                            {"uid": self.user_id, "mid": mid},
-                        )
-                        return {row[0] for row in result.fetchall()}
+                known_liker_ids = await get_known_likers(self.user_id, media_id)
+                new_likers = [liker for liker in likers if liker["user_id"] not in known_liker_ids]
 
-                known_liker_ids = await asyncio.to_thread(_db_get_known_likers, media_id)
-
-                for liker in likers:
-                    lid = liker["user_id"]
-                    if lid not in known_liker_ids:
+                # One comment slot per new liker, reserved up front and returned if unused
+                quota = await reserve_async(self.user_id, "comment", len(new_likers), max_comments)
+                try:
+                    for liker in new_likers:
+                        lid = liker["user_id"]
                         liker_username = liker.get("username", "")
                         total_new_likes += 1
                         self.new_likes_detected += 1
 
                         # Insert into known likes
-                        def _db_insert_like(mid, uid, uname):
-                            with engine.connect() as conn:
-                                conn.execute(
-                                    text(
-                                        "INSERT INTO known_media_likes (user_id, media_id, instagram_user_id, instagram_username) "
-                                        "VALUES (:owner, :mid, :uid, :uname) ON CONFLICT DO NOTHING"
-                                    ),
-                                    {"owner": self.user_id, "mid": mid, "uid": uid, "uname": uname},
-                                )
-                                conn.commit()
-
-                        await asyncio.to_thread(_db_insert_like, media_id, lid, liker_username)
+                        await add_known_like(self.user_id, media_id, lid, liker_username)
 
                         # Check daily comment limit
-                        current_config = get_config(self.user_id)
-                        if current_config.get("comments_posted_today", 0) >= max_comments:
-                            await asyncio.to_thread(
-                                log_activity, self.user_id, "warning",
+                        if not quota.consume():
+                            await log_activity_async(
+                                self.user_id, "warning",
                                 f"Daily comment limit reached ({max_comments}). Stopping comments."
                             )
                             daily_limit_hit = True
@@ -315,51 +323,67 @@ class InstagramMonitor:
                         comment_text = await asyncio.to_thread(generate_like_comment, liker_username, caption)
                         comment_success = await asyncio.to_thread(post_comment, client, media_id, comment_text)
 
-                        if comment_success:
-                            await asyncio.to_thread(increment_daily_counter, self.user_id, "comments_posted_today")
+                        if not comment_success:
+                            quota.refund()
 
                         # Log conversation
-                        await asyncio.to_thread(
-                            log_conversation,
+                        await log_conversation_async(
                             user_id=self.user_id,
                             instagram_user_id=lid,
                             instagram_username=liker_username,
                             event_type="photo_like",
                             agent_action="posted_comment",
                             agent_message=comment_text,
-                            trigger_media_id=media_id,
+                            trigger_media_id=str(media_id),
                             trigger_media_caption=caption[:200] if caption else "",
                         )
 
                         status = "posted" if comment_success else "failed"
-                        await asyncio.to_thread(
-                            log_activity, self.user_id, "info",
+                        await log_activity_async(
+                            self.user_id, "info",
                             f"@{liker_username} liked media - comment {status}",
                             comment_text,
                         )
 
                         # Configurable delay with randomization
                         await self._delay(delay_comments, randomization)
+                finally:
+                    await quota.release_async()
 
                 # Delay between media checks
                 await self._delay(delay_media, randomization)
 
             if total_new_likes > 0:
-                await asyncio.to_thread(log_activity, self.user_id, "info", f"Detected {total_new_likes} new likes across {len(medias)} posts")
+                await log_activity_async(self.user_id, "info", f"Detected {total_new_likes} new likes across {len(medias)} posts")
             else:
-                await asyncio.to_thread(log_activity, self.user_id, "info", "Like check complete - no new likes")
+                await log_activity_async(self.user_id, "info", "Like check complete - no new likes")
 
         except Exception as e:
             self.errors += 1
             logger.error(f"[{self.user_id}] Like check error: {e}")
-            await asyncio.to_thread(log_activity, self.user_id, "error", f"Like check error: {str(e)}")
+            await log_activity_async(self.user_id, "error", f"Like check error: {str(e)}")
 
 
 class MonitorManager:
-    """Manages per-user monitor instances."""
+    """Manages per-user monitor instances.
+
+    Each account is guarded by a lease in ``monitor_leases`` so that across
+    several replicas or workers it is monitored exactly once. A background
+    lease loop renews our leases, stops monitors whose lease was lost or whose
+    account was disabled, publishes status to ``monitor_status`` and adopts
+    accounts whose previous holder stopped heartbeating.
+    """
 
-    def __init__(self):
+    def __init__(self, instance_id: str = INSTANCE_ID):
         self._monitors: Dict[str, InstagramMonitor] = {}
+        self.instance_id = instance_id
+        self._lease_task: Optional[asyncio.Task] = None
+        self._resume_task: Optional[asyncio.Task] = None
+        self._last_renewal = time.monotonic()
+
+    @property
+    def lease_seconds(self) -> int:
+        return settings.monitor_lease_seconds
 
     def get_or_create(self, user_id: str) -> InstagramMonitor:
         if user_id not in self._monitors:
@@ -368,42 +392,208 @@ class MonitorManager:
 
     def get_status(self, user_id: str) -> dict:
         monitor = self._monitors.get(user_id)
-        if not monitor:
-            return {
-                "running": False,
-                "last_poll": None,
-                "total_polls": 0,
-                "new_followers_detected": 0,
-                "new_likes_detected": 0,
-                "errors": 0,
-            }
-        return monitor.get_status()
+        if monitor and monitor.is_running:
+            return monitor.get_status()
+        # Possibly owned by another instance
+        status = get_monitor_status(user_id, self.lease_seconds)
+        if status:
+            return status
+        if monitor:
+            return monitor.get_status()
+        return empty_monitor_status()
 
     async def start(self, user_id: str) -> dict:
+        # Desired state first, so lease renewal keeps the lease we are about to take
+        await asyncio.to_thread(set_monitor_enabled, user_id, True)
+        result = await self._start_owned(user_id)
+        if result.get("status") == "error":
+            await asyncio.to_thread(set_monitor_enabled, user_id, False)
+        return result
+
+    async def _start_owned(self, user_id: str) -> dict:
+        """Take the account's lease and start its monitor locally."""
+        monitor = self._monitors.get(user_id)
+        if monitor and monitor.is_running:
+            return {"status": "already_running"}
+
+        acquired = await asyncio.to_thread(acquire_lease, user_id, self.instance_id, self.lease_seconds)
+        if not acquired:
+            return {"status": "already_running", "message": "Monitor is running on another instance"}
+
         monitor = self.get_or_create(user_id)
-        return await monitor.start()
+        result = await monitor.start()
+        if result.get("status") != "started":
+            await asyncio.to_thread(release_lease, user_id, self.instance_id)
+            return result
+
+        self.start_lease_loop()
+        await self._publish_statuses([monitor])
+        return result
 
     async def stop(self, user_id: str) -> dict:
+        await asyncio.to_thread(set_monitor_enabled, user_id, False)
         monitor = self._monitors.get(user_id)
-        if not monitor:
-            return {"status": "not_running"}
-        return await monitor.stop()
+        if monitor and monitor.is_running:
+            result = await monitor.stop()
+            await self._publish_statuses([monitor])
+            await asyncio.to_thread(release_lease, user_id, self.instance_id)
+            return result
+
+        status = await asyncio.to_thread(get_monitor_status, user_id, self.lease_seconds)
+        if status and status["running"]:
+            # The owning instance drops the lease and stops at its next renewal
+            return {"status": "stopping", "message": "Monitor will stop on its owning instance shortly"}
+        return {"status": "not_running"}
+
+    def count_running(self) -> int:
+        return len([m for m in self._monitors.values() if m.is_running])
 
     async def stop_all(self):
-        """Stop all monitors (used on shutdown)."""
+        """Stop all monitors (used on shutdown) and hand their leases over."""
+        for task in (self._resume_task, self._lease_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._resume_task = None
+        self._lease_task = None
+
+        stopped = []
         for user_id, monitor in list(self._monitors.items()):
             if monitor.is_running:
                 await monitor.stop()
+                stopped.append(monitor)
+        try:
+            await self._publish_statuses(stopped)
+            # Accounts stay enabled; expiring the leases lets other instances adopt them immediately
+            await asyncio.to_thread(expire_leases, self.instance_id)
+        except Exception as e:
+            logger.error(f"Failed to hand over monitor leases: {e}")
 
     def get_all_statuses(self) -> list:
-        """Get status of all monitors (admin)."""
-        result = []
+        """Get status of all monitors across instances (admin)."""
+        statuses = {s["user_id"]: s for s in list_monitor_statuses(self.lease_seconds)}
         for user_id, monitor in self._monitors.items():
-            status = monitor.get_status()
-            status["user_id"] = user_id
-            result.append(status)
-        return result
+            if monitor.is_running or user_id not in statuses:
+                status = monitor.get_status()
+                status["user_id"] = user_id
+                statuses[user_id] = status
+        return list(statuses.values())
+
+    # ---------- startup resume ----------
+
+    def start_resume(self):
+        """Resume enabled monitors in the background (called on startup)."""
+        if self._resume_task is None or self._resume_task.done():
+            self._resume_task = asyncio.create_task(self._resume_enabled())
+
+    @property
+    def is_resuming(self) -> bool:
+        return self._resume_task is not None and not self._resume_task.done()
+
+    async def _resume_enabled(self):
+        """Start every enabled account nobody owns, spread over the resume window.
+
+        Fresh logins are additionally bounded by the login semaphore, so a
+        deploy does not turn into a burst of Instagram logins and LLM calls.
+        """
+        try:
+            user_ids = await asyncio.to_thread(get_resumable_accounts)
+        except Exception as e:
+            logger.error(f"Monitor resume failed: {e}")
+            return
+        if not user_ids:
+            return
+
+        step = settings.monitor_resume_window_seconds / len(user_ids)
+        logger.info(f"Resuming {len(user_ids)} monitors over {settings.monitor_resume_window_seconds}s")
+        resumed = 0
+        for i, user_id in enumerate(user_ids):
+            if i:
+                await asyncio.sleep(step)
+            try:
+                result = await self._start_owned(user_id)
+                if result.get("status") == "started":
+                    resumed += 1
+                else:
+                    logger.info(f"[{user_id}] Not resumed: {result.get('message', result.get('status'))}")
+            except Exception as e:
+                logger.error(f"[{user_id}] Monitor resume error: {e}")
+        logger.info(f"Resumed {resumed}/{len(user_ids)} monitors")
+
+    # ---------- leases ----------
+
+    def start_lease_loop(self):
+        """Start the background lease loop if it is not running yet."""
+        if self._lease_task is None or self._lease_task.done():
+            self._last_renewal = time.monotonic()
+            self._lease_task = asyncio.create_task(self._lease_loop())
+
+    async def _lease_loop(self):
+        while True:
+            await asyncio.sleep(self.lease_seconds / 3)
+            await self._lease_tick()
+
+    async def _lease_tick(self):
+        try:
+            await self._maintain_leases()
+        except Exception as e:
+            logger.error(f"Monitor lease maintenance error: {e}")
+            if time.monotonic() - self._last_renewal > self.lease_seconds:
+                # Our leases have expired by now and another instance may own the accounts
+                for user_id, monitor in list(self._monitors.items()):
+                    if monitor.is_running:
+                        logger.warning(f"[{user_id}] Lease could not be renewed - stopping monitor")
+                        await self._stop_local(user_id)
+
+    async def _stop_local(self, user_id: str):
+        """Stop a monitor the lease loop gave up on and drop its lease if we still hold it."""
+        monitor = self._monitors.pop(user_id, None)
+        if monitor and monitor.is_running:
+            await monitor.stop()
+        try:
+            await asyncio.to_thread(release_lease, user_id, self.instance_id)
+        except Exception as e:
+            # Not renewed any more, so it expires on its own
+            logger.warning(f"[{user_id}] Could not release monitor lease: {e}")
+
+    async def _maintain_leases(self):
+        running = [user_id for user_id, m in self._monitors.items() if m.is_running]
+        owned = await asyncio.to_thread(renew_leases, self.instance_id, self.lease_seconds, running)
+        self._last_renewal = time.monotonic()
+
+        for user_id in running:
+            if user_id not in owned:
+                # Lease taken over, expired, or account disabled from another instance
+                logger.info(f"[{user_id}] Monitor lease lost or disabled - stopping")
+                await self._stop_local(user_id)
+
+        await self._publish_statuses()
+
+        # Failover: adopt enabled accounts whose holder died (the startup resume covers them first)
+        if self.is_resuming:
+            return
+        for user_id in await asyncio.to_thread(get_orphaned_accounts):
+            result = await self._start_owned(user_id)
+            if result.get("status") == "started":
+                logger.info(f"[{user_id}] Adopted orphaned monitor")
+
+    async def _publish_statuses(self, monitors: Optional[List[InstagramMonitor]] = None):
+        """Persist status for the given monitors (default: all running ones)."""
+        if monitors is None:
+            monitors = [m for m in self._monitors.values() if m.is_running]
+        statuses = [{**m.get_status(), "user_id": m.user_id} for m in monitors]
+        await asyncio.to_thread(save_monitor_statuses, statuses, self.instance_id)
+
+
+def _create_manager():
+    if settings.monitor_mode == "worker":
+        from instagram.remote_monitor import RemoteMonitorManager
+        return RemoteMonitorManager()
+    return MonitorManager()
 
 
 # Singleton manager instance
-monitor_manager = MonitorManager()
+monitor_manager = _create_manager()
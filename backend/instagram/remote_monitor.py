@@ -0,0 +1,66 @@
+"""Web-side monitor manager that delegates to the monitor worker process.
+
+Used when ``MONITOR_MODE=worker``: start/stop are queued in the
+``monitor_commands`` table (plus NOTIFY) and executed by
+``python -m instagram.worker``; status is read from ``monitor_status``.
+"""
+import asyncio
+import logging
+import time
+
+from config import settings
+from services.monitor_command_service import (
+    empty_monitor_status,
+    enqueue_command,
+    get_command_result,
+    get_monitor_status,
+    list_monitor_statuses,
+)
+
+logger = logging.getLogger(__name__)
+
+COMMAND_POLL_INTERVAL = 0.2
+
+
+class RemoteMonitorManager:
+    """Same interface as MonitorManager, backed by Postgres instead of local tasks."""
+
+    @property
+    def _stale_after(self) -> int:
+        # Status outliving the owner's lease means the owner is gone
+        return settings.monitor_lease_seconds
+
+    def get_status(self, user_id: str) -> dict:
+        return get_monitor_status(user_id, self._stale_after) or empty_monitor_status()
+
+    async def _send(self, user_id: str, command: str) -> dict:
+        command_id = await asyncio.to_thread(enqueue_command, user_id, command)
+        deadline = time.monotonic() + settings.monitor_command_timeout_seconds
+        while time.monotonic() < deadline:
+            result = await asyncio.to_thread(get_command_result, command_id)
+            if result is not None:
+                return result
+            await asyncio.sleep(COMMAND_POLL_INTERVAL)
+        logger.warning(f"[{user_id}] Monitor worker did not answer '{command}' (command {command_id})")
+        return {"status": "queued", "message": "Monitor worker has not processed the request yet"}
+
+    async def start(self, user_id: str) -> dict:
+        return await self._send(user_id, "start")
+
+    async def stop(self, user_id: str) -> dict:
+        return await self._send(user_id, "stop")
+
+    async def stop_all(self):
+        """Monitors belong to the worker process; nothing to stop here."""
+
+    def start_lease_loop(self):
+        """Leases are held by the workers."""
+
+    def start_resume(self):
+        """Workers resume monitors on their own startup."""
+
+    def count_running(self) -> int:
+        return len([s for s in list_monitor_statuses(self._stale_after) if s["running"]])
+
+    def get_all_statuses(self) -> list:
+        return list_monitor_statuses(self._stale_after)
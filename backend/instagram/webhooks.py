@@ -0,0 +1,301 @@
+"""Instagram webhook ingestion for Graph API mode.
+
+The HTTP handler validates the signature, stores the payload's events as
+``pending`` rows of ``webhook_events`` (which also deduplicates Meta's
+redeliveries) and puts their keys on an in-process queue; background
+consumers claim them and let the agent react (reply to comments and DMs,
+log mentions). An event only counts as handled once its handler succeeds;
+a sweep picks up failed events (with backoff) and pending ones nobody
+claimed, e.g. because the process restarted.
+"""
+import asyncio
+import hashlib
+import hmac
+import logging
+from typing import Dict, List, Optional, Tuple
+
+from config import settings
+from services.config_service import get_config_async, get_credentials_async
+from services.conversation_service import log_activity_async, log_conversation_async
+from services.quota_service import quota_limit, reserve_async
+from services.webhook_service import (
+    claim_retryable_webhook_events,
+    claim_webhook_event,
+    find_accounts_by_ig_id,
+    finish_webhook_event,
+    store_webhook_events,
+)
+
+logger = logging.getLogger(__name__)
+
+_queue: Optional[asyncio.Queue] = None
+_consumers: List[asyncio.Task] = []
+_retry_task: Optional[asyncio.Task] = None
+
+
+def verify_signature(body: bytes, signature_header: str, app_secret: str) -> bool:
+    """Check an ``X-Hub-Signature-256: sha256=<hex>`` header against the raw body."""
+    if not app_secret or not signature_header.startswith("sha256="):
+        return False
+    expected = hmac.new(app_secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature_header[len("sha256="):])
+
+
+def signature_secrets(payload: dict) -> List[str]:
+    """App secrets that may have signed this payload (global app, else the tenants' own apps)."""
+    if settings.instagram_app_secret:
+        return [settings.instagram_app_secret]
+    ig_ids = {str(entry.get("id")) for entry in payload.get("entry", []) if entry.get("id")}
+    return [a["app_secret"] for a in find_accounts_by_ig_id(list(ig_ids)) if a.get("app_secret")]
+
+
+def _ig_id(value) -> int:
+    """Numeric Instagram id (IGSID) as stored in BIGINT columns; 0 when missing."""
+    value = str(value or "")
+    return int(value) if value.isdigit() else 0
+
+
+def parse_events(payload: dict) -> List[Dict]:
+    """Flatten a webhook payload into events with a stable deduplication key."""
+    events = []
+    for entry in payload.get("entry", []):
+        ig_account_id = str(entry.get("id", ""))
+
+        for change in entry.get("changes", []):
+            field = change.get("field")
+            value = change.get("value", {})
+            if field == "comments":
+                sender = value.get("from", {})
+                # Our own replies come back as comment events too
+                if str(sender.get("id", "")) == ig_account_id:
+                    continue
+                events.append({
+                    "type": "comment",
+                    "key": f"comment:{value.get('id')}",
+                    "ig_account_id": ig_account_id,
+                    "comment_id": value.get("id", ""),
+                    "text": value.get("text", ""),
+                    "instagram_user_id": _ig_id(sender.get("id")),
+                    "username": sender.get("username", ""),
+                    "media_id": str(value.get("media", {}).get("id", "")),
+                })
+            elif field == "mentions":
+                events.append({
+                    "type": "mention",
+                    "key": f"mention:{value.get('comment_id') or value.get('media_id')}",
+                    "ig_account_id": ig_account_id,
+                    "media_id": str(value.get("media_id", "")),
+                    "comment_id": str(value.get("comment_id", "")),
+                })
+
+        for messaging in entry.get("messaging", []):
+            message = messaging.get("message", {})
+            sender_id = str(messaging.get("sender", {}).get("id", ""))
+            if not message or message.get("is_echo") or sender_id == ig_account_id:
+                continue
+            events.append({
+                "type": "message",
+                "key": f"message:{message.get('mid')}",
+                "ig_account_id": ig_account_id,
+                "instagram_user_id": _ig_id(sender_id),
+                "username": "",
+                "text": message.get("text", ""),
+            })
+    return events
+
+
+def store_payload(payload: dict) -> List[Tuple[str, str]]:
+    """Persist a verified payload's events as pending. Returns the new ``(user_id, event_key)`` pairs."""
+    events = parse_events(payload)
+    if not events:
+        return []
+    accounts = find_accounts_by_ig_id(list({e["ig_account_id"] for e in events}))
+    owners = {a["instagram_business_account_id"]: a["user_id"] for a in accounts}
+    owned = []
+    for event in events:
+        user_id = owners.get(event["ig_account_id"])
+        if user_id:
+            owned.append((user_id, event))
+        else:
+            logger.info(f"Webhook for unknown Instagram account {event['ig_account_id']}")
+    return store_webhook_events(owned)
+
+
+def enqueue(user_id: str, event_key: str):
+    """Hand a stored event to the consumers; when the queue is full the sweep picks it up."""
+    if _queue is None:
+        return
+    try:
+        _queue.put_nowait((user_id, event_key))
+    except asyncio.QueueFull:
+        logger.warning(f"[{user_id}] Webhook queue full - {event_key} left for the retry sweep")
+
+
+def start_consumers():
+    """Start the background webhook consumers and the retry loop (called on startup)."""
+    global _queue, _retry_task
+    if _queue is None:
+        _queue = asyncio.Queue(maxsize=settings.webhook_queue_size)
+    while len(_consumers) < settings.webhook_workers:
+        _consumers.append(asyncio.create_task(_consume()))
+    if _retry_task is None or _retry_task.done():
+        _retry_task = asyncio.create_task(_retry_loop())
+
+
+async def stop_consumers():
+    global _retry_task
+    tasks = _consumers + ([_retry_task] if _retry_task else [])
+    for task in tasks:
+        task.cancel()
+    for task in tasks:
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    _consumers.clear()
+    _retry_task = None
+
+
+async def _consume():
+    while True:
+        user_id, event_key = await _queue.get()
+        try:
+            await process_event(user_id, event_key)
+        except Exception as e:
+            logger.error(f"Webhook processing error: {e}")
+        finally:
+            _queue.task_done()
+
+
+async def _retry_loop():
+    while True:
+        # Runs once right away to pick up events left pending by a restart
+        try:
+            for user_id, event in await asyncio.to_thread(claim_retryable_webhook_events):
+                await _run_event(user_id, event)
+        except Exception as e:
+            logger.error(f"Webhook retry error: {e}")
+        await asyncio.sleep(settings.webhook_retry_interval_seconds)
+
+
+async def process_event(user_id: str, event_key: str):
+    """Claim a stored pending event and handle it (a no-op if another consumer took it)."""
+    event = await asyncio.to_thread(claim_webhook_event, user_id, event_key)
+    if event:
+        await _run_event(user_id, event)
+
+
+async def process_payload(payload: dict):
+    """Store and handle every new event in a payload (used to replay recorded payloads)."""
+    for user_id, event_key in await asyncio.to_thread(store_payload, payload):
+        await process_event(user_id, event_key)
+
+
+async def _run_event(user_id: str, event: Dict):
+    """Handle a claimed event and record the outcome, so failures are retried."""
+    try:
+        await _handle_event(user_id, event)
+    except Exception as e:
+        logger.error(f"[{user_id}] Webhook {event['type']} error: {e}")
+        await log_activity_async(user_id, "error", f"Webhook {event['type']} error: {str(e)}")
+        await asyncio.to_thread(finish_webhook_event, user_id, event["key"], str(e) or type(e).__name__)
+        return
+    await asyncio.to_thread(finish_webhook_event, user_id, event["key"])
+
+
+async def _media_caption(user_id: str, media_id: str) -> str:
+    """Caption of the commented media (cache, else Graph API); empty if it cannot be fetched."""
+    from instagram.actions import get_media
+    if not media_id:
+        return ""
+    try:
+        media = await get_media(user_id, media_id)
+    except Exception as e:
+        logger.warning(f"[{user_id}] Media {media_id} lookup failed: {e}")
+        return ""
+    return media["caption"] if media else ""
+
+
+async def _handle_event(user_id: str, event: Dict):
+    from instagram.graph_api import InstagramGraphAPI
+    from agent.instagram_agent import generate_comment_reply, generate_message_reply
+
+    config = await get_config_async(user_id)
+    if config.get("api_mode") != "graph_api":
+        return
+    access_token = (await get_credentials_async(user_id))["access_token"]
+    if not access_token:
+        return
+    api = InstagramGraphAPI(
+        access_token,
+        config.get("instagram_business_account_id", ""),
+        config.get("page_id", ""),
+        config.get("app_id", ""),
+    )
+
+    if event["type"] == "mention":
+        await log_activity_async(
+            user_id, "info", f"Account mentioned on media {event['media_id']}", event["comment_id"]
+        )
+        return
+
+    if event["type"] == "comment":
+        if not config.get("auto_comment_enabled", True):
+            return
+        quota = await reserve_async(user_id, "comment", 1, quota_limit(config, "comment"))
+        if not quota.consume():
+            await log_activity_async(user_id, "warning", "Daily comment limit reached. Comment reply skipped.")
+            return
+        success = False
+        try:
+            caption = await _media_caption(user_id, event["media_id"])
+            reply = await asyncio.to_thread(generate_comment_reply, event["username"], event["text"], caption)
+            result = await api.reply_to_comment(event["comment_id"], reply)
+            success = "error" not in result
+        finally:
+            if not success:
+                quota.refund()
+            await quota.release_async()
+        if not success:
+            # Raised so the event is marked failed and retried
+            raise RuntimeError(f"Comment reply not posted: {result.get('error')}")
+        await log_conversation_async(
+            user_id=user_id,
+            instagram_user_id=event["instagram_user_id"],
+            instagram_username=event["username"],
+            event_type="comment",
+            agent_action="posted_comment",
+            agent_message=reply,
+            trigger_media_id=event["media_id"],
+            trigger_media_caption=caption[:200],
+        )
+        await log_activity_async(user_id, "info", f"@{event['username']} commented - reply posted", reply)
+        return
+
+    if event["type"] == "message":
+        if not config.get("auto_reply_dm_enabled", False):
+            return
+        quota = await reserve_async(user_id, "dm", 1, quota_limit(config, "dm"))
+        if not quota.consume():
+            await log_activity_async(user_id, "warning", "Daily DM limit reached. Message reply skipped.")
+            return
+        success = False
+        try:
+            reply = await asyncio.to_thread(generate_message_reply, event["username"], event["text"])
+            result = await api.send_message(str(event["instagram_user_id"]), reply)
+            success = "error" not in result
+        finally:
+            if not success:
+                quota.refund()
+            await quota.release_async()
+        if not success:
+            raise RuntimeError(f"DM reply not sent: {result.get('error')}")
+        await log_conversation_async(
+            user_id=user_id,
+            instagram_user_id=event["instagram_user_id"],
+            instagram_username=event["username"],
+            event_type="message",
+            agent_action="sent_dm",
+            agent_message=reply,
+        )
+        await log_activity_async(user_id, "info", "DM received - reply sent", reply)
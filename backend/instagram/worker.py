@@ -0,0 +1,175 @@
+"""Dedicated monitor worker process.
+
+Runs every Instagram monitor outside the uvicorn web process so blocking
+instagrapi and LLM calls do not compete with API requests for threads.
+
+Usage (from the backend directory):
+    python -m instagram.worker
+
+The web process (``MONITOR_MODE=worker``) queues start/stop commands in
+``monitor_commands`` and NOTIFYs ``monitor_commands``; this worker LISTENs,
+executes them and publishes monitor status to ``monitor_status``. It refuses
+to start unless ``MONITOR_MODE=worker``: in ``inline`` mode the web process
+runs monitors itself and both would compete for the leases.
+"""
+import asyncio
+import logging
+import signal
+from concurrent.futures import ThreadPoolExecutor
+
+from config import settings
+from database import dispose_async_engine, init_db, jobs_engine
+from instagram.graph_api import close_http_client
+from instagram.monitor import MonitorManager
+from services.activity_log_buffer import activity_log_buffer
+from services.live_events import live_events
+from services.monitor_command_service import (
+    MONITOR_COMMAND_CHANNEL,
+    claim_pending_commands,
+    complete_command,
+    purge_old_commands,
+)
+from services.monitor_lease_service import INSTANCE_ID
+
+logging.basicConfig(
+    level=logging.DEBUG if settings.debug else logging.INFO,
+    format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
+)
+logger = logging.getLogger(__name__)
+
+# Reconnect backoff for the LISTEN connection (seconds, doubled up to the max)
+_LISTEN_RETRY_SECONDS = 1
+_LISTEN_RETRY_MAX_SECONDS = 30
+
+
+class MonitorWorker:
+    def __init__(self):
+        self.manager = MonitorManager()
+        self._wakeup = asyncio.Event()
+        self._stopping = asyncio.Event()
+        self._listen_conn = None
+        self._listen_task = None
+
+    def _open_listener(self):
+        """Open a dedicated autocommit connection LISTENing for commands."""
+        raw = jobs_engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {MONITOR_COMMAND_CHANNEL}")
+        return conn
+
+    def _request_stop(self):
+        self._stopping.set()
+        self._wakeup.set()
+
+    def _on_notify(self):
+        try:
+            self._listen_conn.poll()
+        except Exception as e:
+            logger.warning(f"Command listener lost its connection, reconnecting: {e}")
+            self._close_listener()
+            self._listen_task = asyncio.get_running_loop().create_task(self._listen())
+            return
+        self._listen_conn.notifies.clear()
+        self._wakeup.set()
+
+    async def _listen(self):
+        """Open the LISTEN connection, retrying with backoff until the database is reachable."""
+        delay = _LISTEN_RETRY_SECONDS
+        while not self._stopping.is_set():
+            try:
+                self._listen_conn = await asyncio.to_thread(self._open_listener)
+                asyncio.get_running_loop().add_reader(self._listen_conn.fileno(), self._on_notify)
+                # Claim whatever was queued while no one was listening
+                self._wakeup.set()
+                return
+            except Exception as e:
+                logger.warning(f"Command listener unavailable, retrying in {delay}s: {e}")
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, _LISTEN_RETRY_MAX_SECONDS)
+
+    def _close_listener(self):
+        if self._listen_conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._listen_conn.fileno())
+            self._listen_conn.close()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    async def _process_commands(self):
+        commands = await asyncio.to_thread(claim_pending_commands)
+        for cmd in commands:
+            user_id = cmd["user_id"]
+            try:
+                if cmd["command"] == "start":
+                    result = await self.manager.start(user_id)
+                else:
+                    result = await self.manager.stop(user_id)
+                await asyncio.to_thread(complete_command, cmd["id"], result)
+            except Exception as e:
+                logger.error(f"[{user_id}] Command {cmd['command']} failed: {e}")
+                await asyncio.to_thread(
+                    complete_command, cmd["id"], {"status": "error", "message": str(e)}, "failed"
+                )
+
+    async def run(self):
+        if settings.monitor_mode != "worker":
+            logger.error(
+                f"MONITOR_MODE is '{settings.monitor_mode}': the web process runs the monitors itself. "
+                "Set MONITOR_MODE=worker for both the web process and the worker."
+            )
+            raise SystemExit(1)
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=settings.worker_thread_pool_size))
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, self._request_stop)
+
+        await asyncio.to_thread(init_db)
+        await self._listen()
+        # Renews leases, publishes status and adopts monitors orphaned by dead workers
+        self.manager.start_lease_loop()
+        # Nobody streams from the worker; it only relays events to the web processes
+        live_events.start(listen=False)
+        if settings.monitor_resume_on_startup:
+            self.manager.start_resume()
+        logger.info(f"Monitor worker {INSTANCE_ID} listening on '{MONITOR_COMMAND_CHANNEL}'")
+
+        purge_counter = 0
+        try:
+            while not self._stopping.is_set():
+                # Cleared before claiming so a NOTIFY that races the claim is not lost
+                self._wakeup.clear()
+                try:
+                    await self._process_commands()
+                except Exception as e:
+                    logger.error(f"Command processing error: {e}")
+
+                # Wake up on NOTIFY; the timeout is the fallback while the listener reconnects
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=settings.monitor_lease_seconds / 3)
+                except asyncio.TimeoutError:
+                    purge_counter += 1
+                    if purge_counter % 1000 == 0:
+                        await asyncio.to_thread(purge_old_commands)
+        finally:
+            if self._listen_task is not None:
+                self._listen_task.cancel()
+            self._close_listener()
+            await self.manager.stop_all()
+            await live_events.stop()
+            await close_http_client()
+            await dispose_async_engine()
+            await asyncio.to_thread(activity_log_buffer.stop)
+            logger.info(f"Monitor worker {INSTANCE_ID} stopped")
+
+
+def main():
+    asyncio.run(MonitorWorker().run())
+
+
+if __name__ == "__main__":
+    main()
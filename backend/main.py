@@ -1,11 +1,22 @@
 import logging
+import time
+import anyio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 
 from config import settings
-from database import init_db
+from auth import shutdown_password_pool, token_user_id
+from database import dispose_async_engine, init_db
 from instagram.monitor import monitor_manager
+from instagram.graph_api import close_http_client
+from services.activity_log_buffer import activity_log_buffer
+from services.live_events import live_events
+from services.rate_limit_service import rate_limiter
+from services.like_compaction_service import start_compaction_loop as start_like_compaction, stop_compaction_loop as stop_like_compaction
+from services.partition_service import start_maintenance_loop as start_partition_maintenance, stop_maintenance_loop as stop_partition_maintenance
+from instagram.webhooks import start_consumers as start_webhook_consumers, stop_consumers as stop_webhook_consumers
 
 logging.basicConfig(
     level=logging.DEBUG if settings.debug else logging.INFO,
@@ -14,6 +25,9 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 _db_initialized = False
+# Failed init is retried from requests at most this often
+DB_INIT_RETRY_SECONDS = 30
+_db_init_next_retry = 0.0
 
 
 @asynccontextmanager
@@ -21,15 +35,31 @@ async def lifespan(app: FastAPI):
     global _db_initialized
     # Startup
     logger.info("Starting Instagram AI Agent API...")
+    anyio.to_thread.current_default_thread_limiter().total_tokens = settings.web_thread_pool_size
     try:
         init_db()
         _db_initialized = True
         logger.info("Database initialized")
     except Exception as e:
         logger.error(f"Database init failed (will retry on first request): {e}")
+    monitor_manager.start_lease_loop()
+    start_webhook_consumers()
+    start_partition_maintenance()
+    start_like_compaction()
+    live_events.start()
+    if settings.monitor_resume_on_startup:
+        monitor_manager.start_resume()
     yield
     # Shutdown
     await monitor_manager.stop_all()
+    await stop_webhook_consumers()
+    await stop_partition_maintenance()
+    await stop_like_compaction()
+    await live_events.stop()
+    await close_http_client()
+    await dispose_async_engine()
+    await anyio.to_thread.run_sync(activity_log_buffer.stop)
+    shutdown_password_pool()
     logger.info("Shutting down")
 
 
@@ -42,10 +72,11 @@ app = FastAPI(
 
 @app.middleware("http")
 async def ensure_db_initialized(request: Request, call_next):
-    global _db_initialized
-    if not _db_initialized:
+    global _db_initialized, _db_init_next_retry
+    if not _db_initialized and time.monotonic() >= _db_init_next_retry:
+        _db_init_next_retry = time.monotonic() + DB_INIT_RETRY_SECONDS
         try:
-            init_db()
+            await anyio.to_thread.run_sync(init_db)
             _db_initialized = True
             logger.info("Database initialized on first request")
         except Exception as e:
@@ -53,6 +84,26 @@ async def ensure_db_initialized(request: Request, call_next):
     return await call_next(request)
 
 
+@app.middleware("http")
+async def rate_limit(request: Request, call_next):
+    policy = rate_limiter.policy_for(request.method, request.url.path) if settings.rate_limit_enabled else None
+    if policy is None:
+        return await call_next(request)
+    # Unauthenticated calls are keyed by address; the route itself rejects them
+    tenant = token_user_id(request) or f"ip:{request.client.host if request.client else 'unknown'}"
+    slot, retry_after = await rate_limiter.acquire(tenant, policy)
+    if slot is None:
+        return JSONResponse(
+            status_code=429,
+            content={"detail": "Too many requests, try again shortly"},
+            headers={"Retry-After": str(retry_after)},
+        )
+    try:
+        return await call_next(request)
+    finally:
+        rate_limiter.release(slot)
+
+
 # CORS
 app.add_middleware(
     CORSMiddleware,
@@ -70,6 +121,8 @@ app.add_middleware(
 from api.routes import health, agent, conversations, settings as settings_routes, monitor as monitor_routes
 from api.routes.auth import router as auth_router
 from api.routes.admin import router as admin_router
+from api.routes.webhooks import router as webhooks_router
+from api.routes.export import router as export_router
 
 app.include_router(health.router, prefix="/api", tags=["health"])
 app.include_router(auth_router, prefix="/api/auth", tags=["auth"])
@@ -78,6 +131,8 @@ app.include_router(agent.router, prefix="/api/agent", tags=["agent"])
 app.include_router(conversations.router, prefix="/api/conversations", tags=["conversations"])
 app.include_router(settings_routes.router, prefix="/api/settings", tags=["settings"])
 app.include_router(monitor_routes.router, prefix="/api/monitor", tags=["monitor"])
+app.include_router(webhooks_router, prefix="/api/webhooks", tags=["webhooks"])
+app.include_router(export_router, prefix="/api/export", tags=["export"])
 
 
 @app.get("/")
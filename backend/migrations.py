@@ -0,0 +1,686 @@
+"""Versioned schema migrations.
+
+Each step is applied once, in order, and recorded in ``schema_version``;
+``database.init_db`` only runs the steps newer than the recorded version.
+Steps stay idempotent (``IF NOT EXISTS`` etc.) because installs that predate
+versioning replay all of them once. Add new steps at the end - never edit or
+reorder applied ones.
+"""
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from services.partition_service import PARTITIONED_TABLES, ensure_partitions
+
+logger = logging.getLogger(__name__)
+
+
+# Tables range-partitioned by month on created_at (see services/partition_service.py).
+# The partition key must be part of the primary key.
+PARTITIONED_TABLE_COLUMNS = {
+    "conversations": """
+        id SERIAL,
+        user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+        instagram_user_id TEXT NOT NULL,
+        instagram_username TEXT DEFAULT '',
+        event_type TEXT NOT NULL,
+        trigger_media_id TEXT DEFAULT '',
+        trigger_media_caption TEXT DEFAULT '',
+        agent_action TEXT NOT NULL,
+        agent_message TEXT NOT NULL,
+        session_id TEXT DEFAULT '',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        CONSTRAINT conversations_part_pkey PRIMARY KEY (id, created_at)
+    """,
+    "activity_log": """
+        id SERIAL,
+        user_id UUID REFERENCES users(id),
+        level TEXT DEFAULT 'info',
+        message TEXT NOT NULL,
+        details TEXT DEFAULT '',
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        CONSTRAINT activity_log_part_pkey PRIMARY KEY (id, created_at)
+    """,
+}
+
+# Columns copied when converting a pre-partitioning table
+_PARTITIONED_COPY_COLUMNS = {
+    "conversations": [
+        "id", "user_id", "instagram_user_id", "instagram_username", "event_type", "trigger_media_id",
+        "trigger_media_caption", "agent_action", "agent_message", "session_id", "created_at",
+    ],
+    "activity_log": ["id", "user_id", "level", "message", "details", "created_at"],
+}
+
+
+def _relkind(conn, table: str):
+    return conn.execute(text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}).scalar()
+
+
+def _create_partitioned_table(conn, table: str):
+    # A plain table from before partitioning is left for _convert_to_partitioned
+    if _relkind(conn, table) == "r":
+        return
+    conn.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {table} ({PARTITIONED_TABLE_COLUMNS[table]}) PARTITION BY RANGE (created_at)"
+    ))
+    conn.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+
+def _convert_to_partitioned(conn, table: str):
+    """Move a plain (pre-partitioning) table's rows into a new partitioned table."""
+    if _relkind(conn, table) != "r":
+        return
+
+    legacy = f"{table}_legacy"
+    logger.info(f"Converting {table} to a monthly partitioned table...")
+    conn.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    # Index names are schema-wide; free the listing index names for the new table
+    conn.execute(text(f"DROP INDEX IF EXISTS idx_{table}_user_created"))
+    conn.execute(text(f"DROP INDEX IF EXISTS idx_{table}_user_event_created"))
+    _create_partitioned_table(conn, table)
+
+    oldest = conn.execute(text(f"SELECT MIN(created_at) FROM {legacy}")).scalar()
+    ensure_partitions(conn, table, since=oldest.date() if oldest else None)
+
+    columns = _PARTITIONED_COPY_COLUMNS[table]
+    select_list = ", ".join("COALESCE(created_at, NOW())" if c == "created_at" else c for c in columns)
+    result = conn.execute(text(f"INSERT INTO {table} ({', '.join(columns)}) SELECT {select_list} FROM {legacy}"))
+    conn.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE((SELECT MAX(id) FROM {table}), 0) + 1, false)"
+    ))
+    conn.execute(text(f"DROP TABLE {legacy}"))
+    logger.info(f"Converted {table}: {result.rowcount} rows moved into monthly partitions")
+
+
+def _base_tables(conn):
+    # Enable uuid generation
+    conn.execute(text("CREATE EXTENSION IF NOT EXISTS pgcrypto"))
+
+    # ========== USERS TABLE ==========
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS users (
+            id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+            email TEXT UNIQUE NOT NULL,
+            password_hash TEXT NOT NULL,
+            name TEXT DEFAULT '',
+            is_admin BOOLEAN DEFAULT false,
+            is_active BOOLEAN DEFAULT true,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+
+    # ========== GLOBAL CONFIG TABLE (shared LLM settings) ==========
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS global_config (
+            id SERIAL PRIMARY KEY,
+            llm_provider TEXT DEFAULT 'groq',
+            llm_api_key TEXT DEFAULT '',
+            llm_model TEXT DEFAULT 'llama-3.3-70b-versatile',
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+
+    # Insert default global config if none exists
+    result = conn.execute(text("SELECT COUNT(*) FROM global_config"))
+    if result.scalar() == 0:
+        conn.execute(text(
+            "INSERT INTO global_config (llm_provider, llm_api_key, llm_model) "
+            "VALUES ('groq', '', 'llama-3.3-70b-versatile')"
+        ))
+
+    # ========== INSTAGRAM CONFIG (per-user) ==========
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS instagram_config (
+            id SERIAL PRIMARY KEY,
+            app_id TEXT DEFAULT '',
+            app_secret TEXT DEFAULT '',
+            access_token TEXT DEFAULT '',
+            page_id TEXT DEFAULT '',
+            instagram_business_account_id TEXT DEFAULT '',
+            ig_username TEXT DEFAULT '',
+            ig_password TEXT DEFAULT '',
+            api_mode TEXT DEFAULT 'instagrapi',
+            llm_provider TEXT DEFAULT 'groq',
+            llm_api_key TEXT DEFAULT '',
+            llm_model TEXT DEFAULT 'llama-3.3-70b-versatile',
+            polling_interval_seconds INTEGER DEFAULT 60,
+            monitor_enabled BOOLEAN DEFAULT false,
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+
+    _create_partitioned_table(conn, "conversations")
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS known_followers (
+            id SERIAL PRIMARY KEY,
+            instagram_user_id TEXT UNIQUE NOT NULL,
+            instagram_username TEXT DEFAULT '',
+            first_seen_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS known_media_likes (
+            id SERIAL PRIMARY KEY,
+            media_id TEXT NOT NULL,
+            instagram_user_id TEXT NOT NULL,
+            instagram_username TEXT DEFAULT '',
+            first_seen_at TIMESTAMPTZ DEFAULT NOW(),
+            UNIQUE(media_id, instagram_user_id)
+        )
+    """))
+
+    _create_partitioned_table(conn, "activity_log")
+
+
+def _config_columns(conn):
+    # Add ig_session column if it doesn't exist
+    conn.execute(text("""
+        DO $$ BEGIN
+            ALTER TABLE instagram_config ADD COLUMN IF NOT EXISTS ig_session TEXT DEFAULT '';
+        EXCEPTION WHEN duplicate_column THEN NULL;
+        END $$;
+    """))
+
+    # Bot control settings migration
+    bot_control_columns = [
+        ("welcome_dm_enabled", "BOOLEAN DEFAULT true"),
+        ("auto_comment_enabled", "BOOLEAN DEFAULT true"),
+        ("max_dms_per_day", "INTEGER DEFAULT 20"),
+        ("max_comments_per_day", "INTEGER DEFAULT 20"),
+        ("delay_between_dms", "INTEGER DEFAULT 45"),
+        ("delay_between_comments", "INTEGER DEFAULT 60"),
+        ("delay_between_media_checks", "INTEGER DEFAULT 5"),
+        ("followers_per_check", "INTEGER DEFAULT 20"),
+        ("media_posts_per_check", "INTEGER DEFAULT 3"),
+        ("delay_randomization_max", "INTEGER DEFAULT 30"),
+        ("dms_sent_today", "INTEGER DEFAULT 0"),
+        ("comments_posted_today", "INTEGER DEFAULT 0"),
+        ("daily_counters_reset_at", "TIMESTAMPTZ DEFAULT NOW()"),
+    ]
+    for col_name, col_def in bot_control_columns:
+        conn.execute(text(f"""
+            DO $$ BEGIN
+                ALTER TABLE instagram_config ADD COLUMN IF NOT EXISTS {col_name} {col_def};
+            EXCEPTION WHEN duplicate_column THEN NULL;
+            END $$;
+        """))
+
+
+def _multi_tenant(conn):
+    # Add user_id to all tables
+    multi_tenant_migrations = [
+        ("instagram_config", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
+        ("conversations", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
+        ("known_followers", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
+        ("known_media_likes", "user_id", "UUID REFERENCES users(id) ON DELETE CASCADE"),
+        ("activity_log", "user_id", "UUID REFERENCES users(id)"),
+    ]
+    for table, col, col_def in multi_tenant_migrations:
+        conn.execute(text(f"""
+            DO $$ BEGIN
+                ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {col} {col_def};
+            EXCEPTION WHEN duplicate_column THEN NULL;
+            END $$;
+        """))
+
+    # Add unique constraint on instagram_config(user_id) if not exists
+    conn.execute(text("""
+        DO $$ BEGIN
+            ALTER TABLE instagram_config ADD CONSTRAINT uq_config_user UNIQUE (user_id);
+        EXCEPTION WHEN duplicate_object THEN NULL;
+        END $$;
+    """))
+
+    # Drop old unique constraint on known_followers(instagram_user_id) and add (user_id, instagram_user_id)
+    conn.execute(text("""
+        DO $$ BEGIN
+            ALTER TABLE known_followers DROP CONSTRAINT IF EXISTS known_followers_instagram_user_id_key;
+        EXCEPTION WHEN undefined_object THEN NULL;
+        END $$;
+    """))
+    conn.execute(text("""
+        DO $$ BEGIN
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_known_followers_user
+            ON known_followers (user_id, instagram_user_id);
+        EXCEPTION WHEN duplicate_table THEN NULL;
+        END $$;
+    """))
+
+    # Unique index on known_media_likes per user
+    conn.execute(text("""
+        DO $$ BEGIN
+            CREATE UNIQUE INDEX IF NOT EXISTS uq_known_media_likes_user
+            ON known_media_likes (user_id, media_id, instagram_user_id);
+        EXCEPTION WHEN duplicate_table THEN NULL;
+        END $$;
+    """))
+
+
+def _assign_orphan_data(conn):
+    """Single-tenant installs: hand existing rows to an admin user."""
+    # If there's existing config data without user_id, create an admin user and assign
+    result = conn.execute(text(
+        "SELECT COUNT(*) FROM instagram_config WHERE user_id IS NULL AND ig_username != ''"
+    ))
+    orphan_count = result.scalar()
+
+    if orphan_count > 0:
+        # Check if admin already exists
+        admin_result = conn.execute(text(
+            "SELECT id FROM users WHERE is_admin = true LIMIT 1"
+        ))
+        admin_row = admin_result.first()
+
+        if admin_row:
+            admin_id = str(admin_row[0])
+        else:
+            # Create admin user with default credentials
+            import bcrypt
+            default_hash = bcrypt.hashpw("admin123".encode(), bcrypt.gensalt()).decode()
+            insert_result = conn.execute(
+                text(
+                    "INSERT INTO users (email, password_hash, name, is_admin) "
+                    "VALUES ('admin@agenteinsta.com', :pw, 'Admin', true) "
+                    "ON CONFLICT (email) DO UPDATE SET is_admin = true "
+                    "RETURNING id"
+                ),
+                {"pw": default_hash},
+            )
+            admin_id = str(insert_result.first()[0])
+            logger.info("Created admin user: admin@agenteinsta.com (change password!)")
+
+        # Migrate LLM config to global_config from existing instagram_config
+        conn.execute(text("""
+            UPDATE global_config SET
+                llm_provider = COALESCE((SELECT llm_provider FROM instagram_config WHERE user_id IS NULL LIMIT 1), llm_provider),
+                llm_api_key = COALESCE((SELECT llm_api_key FROM instagram_config WHERE user_id IS NULL LIMIT 1), llm_api_key),
+                llm_model = COALESCE((SELECT llm_model FROM instagram_config WHERE user_id IS NULL LIMIT 1), llm_model),
+                updated_at = NOW()
+            WHERE id = (SELECT id FROM global_config ORDER BY id LIMIT 1)
+        """))
+
+        # Assign all orphan data to admin
+        for table in ["instagram_config", "conversations", "known_followers", "known_media_likes", "activity_log"]:
+            conn.execute(text(f"UPDATE {table} SET user_id = :uid WHERE user_id IS NULL"), {"uid": admin_id})
+
+        logger.info(f"Migrated existing data to admin user {admin_id}")
+
+
+def _partition_history_tables(conn):
+    # Pre-partitioning installs have plain tables; convert them, then make sure
+    # the current and upcoming months have partitions
+    for table in PARTITIONED_TABLES:
+        _convert_to_partitioned(conn, table)
+        ensure_partitions(conn, table)
+
+
+def _listing_indexes(conn):
+    # Keyset pagination reads (user_id[, event_type]) newest first; id breaks timestamp ties
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_user_created
+        ON conversations (user_id, created_at DESC, id DESC)
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_user_event_created
+        ON conversations (user_id, event_type, created_at DESC, id DESC)
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_activity_log_user_created
+        ON activity_log (user_id, created_at DESC, id DESC)
+    """))
+
+
+def _monitor_worker_tables(conn):
+    # Commands sent from the web process to the monitor worker (see instagram/worker.py)
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS monitor_commands (
+            id SERIAL PRIMARY KEY,
+            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+            command TEXT NOT NULL,
+            status TEXT DEFAULT 'pending',
+            result TEXT DEFAULT '',
+            created_at TIMESTAMPTZ DEFAULT NOW(),
+            processed_at TIMESTAMPTZ
+        )
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_monitor_commands_pending
+        ON monitor_commands (id) WHERE status = 'pending'
+    """))
+
+    # Last known monitor status per account, published by the worker
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS monitor_status (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            running BOOLEAN DEFAULT false,
+            last_poll TEXT,
+            total_polls INTEGER DEFAULT 0,
+            new_followers_detected INTEGER DEFAULT 0,
+            new_likes_detected INTEGER DEFAULT 0,
+            errors INTEGER DEFAULT 0,
+            worker_id TEXT DEFAULT '',
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+
+    # Per-account ownership lease: exactly one instance monitors an account
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS monitor_leases (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            owner_id TEXT NOT NULL,
+            acquired_at TIMESTAMPTZ DEFAULT NOW(),
+            expires_at TIMESTAMPTZ NOT NULL
+        )
+    """))
+
+
+def _webhook_tables(conn):
+    # Processed webhook events, used to deduplicate Meta's at-least-once deliveries
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS webhook_events (
+            id SERIAL PRIMARY KEY,
+            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+            event_key TEXT NOT NULL,
+            event_type TEXT NOT NULL,
+            payload TEXT DEFAULT '',
+            received_at TIMESTAMPTZ DEFAULT NOW(),
+            UNIQUE (user_id, event_key)
+        )
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_instagram_config_ig_account
+        ON instagram_config (instagram_business_account_id)
+    """))
+
+
+def _media_cache(conn):
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS media_cache (
+            user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+            media_id TEXT NOT NULL,
+            caption TEXT DEFAULT '',
+            media_type TEXT DEFAULT '',
+            like_count INTEGER DEFAULT 0,
+            taken_at TEXT DEFAULT '',
+            permalink TEXT DEFAULT '',
+            updated_at TIMESTAMPTZ DEFAULT NOW(),
+            PRIMARY KEY (user_id, media_id)
+        )
+    """))
+
+
+def _user_stats(conn):
+    # Maintained by log_conversation in the same statement as the insert
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS user_stats (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            total_conversations BIGINT DEFAULT 0,
+            total_dms_sent BIGINT DEFAULT 0,
+            total_comments_posted BIGINT DEFAULT 0,
+            total_followers_greeted BIGINT DEFAULT 0,
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+    # Seed the rollup from existing history
+    from services.conversation_service import backfill_user_stats
+    count = backfill_user_stats(conn)
+    logger.info(f"Backfilled user_stats for {count} users")
+
+
+def _quota_ledger(conn):
+    # One row per reservation of DM/comment slots (see services/quota_service.py)
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS quota_ledger (
+            id BIGSERIAL PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            action TEXT NOT NULL,
+            slots INTEGER NOT NULL,
+            created_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_quota_ledger_user_action_created
+        ON quota_ledger (user_id, action, created_at)
+    """))
+    # Carry today's counters over; they age out when the old daily window would have reset
+    for action, column in (("dm", "dms_sent_today"), ("comment", "comments_posted_today")):
+        conn.execute(text(f"""
+            INSERT INTO quota_ledger (user_id, action, slots, created_at)
+            SELECT user_id, '{action}', {column}, COALESCE(daily_counters_reset_at, NOW())
+            FROM instagram_config
+            WHERE user_id IS NOT NULL AND {column} > 0
+              AND COALESCE(daily_counters_reset_at, NOW()) > NOW() - INTERVAL '24 hours'
+        """))
+
+
+# Weighted search document: username > message > media caption. 'simple' keeps
+# usernames and mixed-language messages unstemmed.
+CONVERSATION_SEARCH_VECTOR_SQL = """
+    setweight(to_tsvector('simple', coalesce(instagram_username, '')), 'A')
+    || setweight(to_tsvector('simple', coalesce(agent_message, '')), 'B')
+    || setweight(to_tsvector('simple', coalesce(trigger_media_caption, '')), 'C')
+"""
+
+
+def _conversation_search(conn):
+    conn.execute(text(f"""
+        ALTER TABLE conversations ADD COLUMN IF NOT EXISTS search_vector tsvector
+        GENERATED ALWAYS AS ({CONVERSATION_SEARCH_VECTOR_SQL}) STORED
+    """))
+    # btree_gin lets one GIN index serve the tenant filter and the match together
+    try:
+        with conn.begin_nested():
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS btree_gin"))
+            conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+    except DBAPIError as e:
+        logger.warning(f"btree_gin/pg_trgm unavailable, using a plain search index without username trigrams: {e}")
+        conn.execute(text("CREATE INDEX IF NOT EXISTS idx_conversations_search ON conversations USING gin (search_vector)"))
+        return
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_search
+        ON conversations USING gin (user_id, search_vector)
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_conversations_username_trgm
+        ON conversations USING gin (user_id, lower(instagram_username) gin_trgm_ops)
+    """))
+
+
+def _like_compaction(conn):
+    # Liker rows of media that left the scan window, folded by services/like_compaction_service.py
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS known_media_like_sketches (
+            id BIGSERIAL PRIMARY KEY,
+            user_id UUID NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+            media_id TEXT NOT NULL,
+            liker_count INTEGER NOT NULL,
+            sketch BYTEA NOT NULL,
+            compacted_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_known_media_like_sketches_media
+        ON known_media_like_sketches (user_id, media_id)
+    """))
+    for col, col_def in (
+        ("like_compaction_enabled", "BOOLEAN DEFAULT TRUE"),
+        ("like_compaction_after_days", "INTEGER DEFAULT 14"),
+    ):
+        conn.execute(text(f"ALTER TABLE instagram_config ADD COLUMN IF NOT EXISTS {col} {col_def}"))
+
+
+# Rows per committed batch when backfilling a shadow column
+_BACKFILL_BATCH = 10000
+
+
+def _column_type(conn, table: str, column: str):
+    return conn.execute(text("""
+        SELECT data_type FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = :t AND column_name = :c
+    """), {"t": table, "c": column}).scalar()
+
+
+def _ig_id_sql(column: str) -> str:
+    """TEXT Instagram id -> BIGINT; "<pk>_<owner pk>" media ids keep the pk, anything else is NULL."""
+    return f"CAST(substring(split_part({column}, '_', 1) from '^[0-9]{{1,18}}$') AS BIGINT)"
+
+
+def _fill_shadow(conn, table: str, column: str, shadow: str, unmatched, lo: int, hi: int = None):
+    """Fill ``shadow`` for ids in [lo, hi) (no upper bound without ``hi``) using the id index."""
+    where = "id >= :lo" + (" AND id < :hi" if hi is not None else "")
+    params = {"lo": lo, "hi": hi, "v": unmatched}
+    value = _ig_id_sql(column) if unmatched is None else f"COALESCE({_ig_id_sql(column)}, :v)"
+    conn.execute(text(f"UPDATE {table} SET {shadow} = {value} WHERE {where} AND {shadow} IS NULL"), params)
+    if unmatched is None:
+        conn.execute(text(f"DELETE FROM {table} WHERE {where} AND {shadow} IS NULL"), params)
+
+
+def _bigint_id_column(conn, table: str, column: str, unmatched=None):
+    """Convert a TEXT Instagram id column to BIGINT without rewriting the table under lock.
+
+    A shadow column is backfilled by id range in committed batches while the
+    table stays writable, repeated until no newer rows turn up; the final
+    swap, with writes blocked, only fills the few rows inserted since.
+    Rows whose id is not numeric are deleted (``unmatched=None``) or get
+    ``unmatched``.
+    """
+    if _column_type(conn, table, column) == "bigint":
+        return
+    shadow = f"{column}_bigint"
+    conn.execute(text(f"ALTER TABLE {table} ADD COLUMN IF NOT EXISTS {shadow} BIGINT"))
+    conn.commit()
+    # Ids are serial, so rows written during a pass are all above the last id it covered
+    done = 0
+    while True:
+        lo, hi = conn.execute(text(f"SELECT MIN(id), MAX(id) FROM {table} WHERE id > :done"), {"done": done}).first()
+        conn.commit()
+        if lo is None:
+            break
+        for start in range(lo, hi + 1, _BACKFILL_BATCH):
+            _fill_shadow(conn, table, column, shadow, unmatched, start, start + _BACKFILL_BATCH)
+            conn.commit()
+        logger.info(f"Backfilled {table}.{shadow} (ids {lo}-{hi})")
+        done = hi
+
+    conn.execute(text(f"LOCK TABLE {table} IN SHARE ROW EXCLUSIVE MODE"))
+    _fill_shadow(conn, table, column, shadow, unmatched, done + 1)
+    conn.execute(text(f"ALTER TABLE {table} DROP COLUMN {column}"))
+    conn.execute(text(f"ALTER TABLE {table} RENAME COLUMN {shadow} TO {column}"))
+    conn.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+    conn.commit()
+
+
+def _bigint_instagram_ids(conn):
+    # Unique indexes on the old TEXT columns are dropped with them and rebuilt on the BIGINT ones
+    _bigint_id_column(conn, "known_followers", "instagram_user_id")
+    conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_known_followers_user
+        ON known_followers (user_id, instagram_user_id)
+    """))
+    conn.commit()
+    _bigint_id_column(conn, "known_media_likes", "media_id")
+    _bigint_id_column(conn, "known_media_likes", "instagram_user_id")
+    conn.execute(text("""
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_known_media_likes_user
+        ON known_media_likes (user_id, media_id, instagram_user_id)
+    """))
+    conn.commit()
+    _bigint_id_column(conn, "conversations", "instagram_user_id", unmatched=0)
+    # Small table, converted in place
+    if _column_type(conn, "known_media_like_sketches", "media_id") != "bigint":
+        conn.execute(text(f"DELETE FROM known_media_like_sketches WHERE {_ig_id_sql('media_id')} IS NULL"))
+        conn.execute(text(f"""
+            ALTER TABLE known_media_like_sketches
+            ALTER COLUMN media_id TYPE BIGINT USING {_ig_id_sql('media_id')}
+        """))
+
+
+def _split_credentials(conn):
+    # Secrets and the multi-KB instagrapi session, read only when a client is built
+    moved = ("app_secret", "access_token", "ig_password", "ig_session")
+    conn.execute(text("""
+        CREATE TABLE IF NOT EXISTS instagram_credentials (
+            user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+            app_secret TEXT DEFAULT '',
+            access_token TEXT DEFAULT '',
+            ig_password TEXT DEFAULT '',
+            ig_session TEXT DEFAULT '',
+            updated_at TIMESTAMPTZ DEFAULT NOW()
+        )
+    """))
+    if _column_type(conn, "instagram_config", "ig_session") is None:
+        return
+    columns = ", ".join(moved)
+    values = ", ".join(f"COALESCE({c}, '')" for c in moved)
+    conn.execute(text(f"""
+        INSERT INTO instagram_credentials (user_id, {columns})
+        SELECT user_id, {values} FROM instagram_config WHERE user_id IS NOT NULL
+        ON CONFLICT (user_id) DO NOTHING
+    """))
+    conn.execute(text(
+        "ALTER TABLE instagram_config " + ", ".join(f"DROP COLUMN {c}" for c in moved)
+    ))
+    # Rewrite the rows so the dropped values (and their TOAST) can be vacuumed away
+    conn.execute(text("UPDATE instagram_config SET api_mode = api_mode"))
+
+
+def _rate_limit_buckets(conn):
+    # Shared token buckets for RATE_LIMIT_BACKEND=postgres (services/rate_limit_service.py).
+    # Losing them on a crash only refills them.
+    conn.execute(text("""
+        CREATE UNLOGGED TABLE IF NOT EXISTS rate_limit_buckets (
+            key TEXT PRIMARY KEY,
+            tokens DOUBLE PRECISION NOT NULL,
+            updated_at TIMESTAMPTZ NOT NULL
+        )
+    """))
+
+
+def _webhook_event_status(conn):
+    # Events count as handled only once processed, so failures are retried
+    for col, col_def in (
+        ("status", "TEXT NOT NULL DEFAULT 'done'"),
+        ("attempts", "INTEGER NOT NULL DEFAULT 1"),
+        ("last_error", "TEXT DEFAULT ''"),
+        ("updated_at", "TIMESTAMPTZ DEFAULT NOW()"),
+    ):
+        conn.execute(text(f"ALTER TABLE webhook_events ADD COLUMN IF NOT EXISTS {col} {col_def}"))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS idx_webhook_events_pending
+        ON webhook_events (updated_at) WHERE status <> 'done'
+    """))
+    conn.execute(text("CREATE INDEX IF NOT EXISTS idx_webhook_events_received ON webhook_events (received_at)"))
+
+
+def _auto_reply_dm_flag(conn):
+    # Replies to inbound DMs (Graph API webhooks); off until a tenant opts in
+    conn.execute(text(
+        "ALTER TABLE instagram_config ADD COLUMN IF NOT EXISTS auto_reply_dm_enabled BOOLEAN DEFAULT false"
+    ))
+
+
+# (version, name, step) - append only
+MIGRATIONS = [
+    (1, "base tables", _base_tables),
+    (2, "instagram_config session and bot control columns", _config_columns),
+    (3, "multi-tenant user_id columns", _multi_tenant),
+    (4, "assign pre multi-tenant data to an admin", _assign_orphan_data),
+    (5, "monthly partitions for conversations and activity_log", _partition_history_tables),
+    (6, "listing indexes", _listing_indexes),
+    (7, "monitor worker tables", _monitor_worker_tables),
+    (8, "webhook tables", _webhook_tables),
+    (9, "media cache", _media_cache),
+    (10, "user_stats rollup", _user_stats),
+    (11, "quota reservation ledger", _quota_ledger),
+    (12, "conversation full-text search", _conversation_search),
+    (13, "known_media_likes compaction", _like_compaction),
+    (14, "BIGINT Instagram ids", _bigint_instagram_ids),
+    (15, "instagram_credentials split", _split_credentials),
+    (16, "rate limit buckets", _rate_limit_buckets),
+    (17, "webhook event status", _webhook_event_status),
+    (18, "auto reply DM flag", _auto_reply_dm_flag),
+]
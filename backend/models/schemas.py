@@ -30,6 +30,7 @@ class SettingsUpdate(BaseModel):
     # Bot control
     welcome_dm_enabled: Optional[bool] = None
     auto_comment_enabled: Optional[bool] = None
+    auto_reply_dm_enabled: Optional[bool] = None
     max_dms_per_day: Optional[int] = None
     max_comments_per_day: Optional[int] = None
     delay_between_dms: Optional[int] = None
@@ -38,6 +39,9 @@ class SettingsUpdate(BaseModel):
     followers_per_check: Optional[int] = None
     media_posts_per_check: Optional[int] = None
     delay_randomization_max: Optional[int] = None
+    # Liker history compaction for media outside the scan window
+    like_compaction_enabled: Optional[bool] = None
+    like_compaction_after_days: Optional[int] = None
 
 
 class SettingsResponse(BaseModel):
@@ -55,6 +59,7 @@ class SettingsResponse(BaseModel):
     # Bot control
     welcome_dm_enabled: bool = True
     auto_comment_enabled: bool = True
+    auto_reply_dm_enabled: bool = False
     max_dms_per_day: int = 20
     max_comments_per_day: int = 20
     delay_between_dms: int = 45
@@ -63,6 +68,8 @@ class SettingsResponse(BaseModel):
     followers_per_check: int = 20
     media_posts_per_check: int = 3
     delay_randomization_max: int = 30
+    like_compaction_enabled: bool = True
+    like_compaction_after_days: int = 14
     dms_sent_today: int = 0
     comments_posted_today: int = 0
 
@@ -83,9 +90,11 @@ class ConversationItem(BaseModel):
 
 class ConversationListResponse(BaseModel):
     items: List[ConversationItem]
-    total: int
+    total: Optional[int] = None
+    total_estimated: bool = False
     page: int
     limit: int
+    next_cursor: Optional[str] = None
 
 
 # --- Monitor ---
@@ -0,0 +1,153 @@
+"""Write-behind buffer for ``activity_log``.
+
+``log_activity`` only appends to an in-memory queue; a background thread
+writes queued rows with one multi-row INSERT every
+``activity_log_flush_interval_ms`` or as soon as ``activity_log_batch_size``
+rows are waiting. The queue is bounded: when it is full new rows are dropped
+and counted instead of blocking the monitor.
+"""
+import logging
+import threading
+from collections import deque
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from config import settings
+from database import jobs_engine as engine
+
+logger = logging.getLogger(__name__)
+
+_COLUMNS = ("user_id", "level", "message", "details")
+
+
+def write_activity_rows(rows: List[Dict]):
+    """Insert rows into activity_log with a single multi-row INSERT."""
+    if not rows:
+        return
+    values = []
+    params = {}
+    for i, row in enumerate(rows):
+        values.append("(" + ", ".join(f":{col}_{i}" for col in _COLUMNS) + ")")
+        for col in _COLUMNS:
+            params[f"{col}_{i}"] = row[col]
+    with engine.connect() as conn:
+        conn.execute(
+            text(f"INSERT INTO activity_log ({', '.join(_COLUMNS)}) VALUES {', '.join(values)}"),
+            params,
+        )
+        conn.commit()
+
+
+class ActivityLogBuffer:
+    def __init__(self):
+        self._rows: deque = deque()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        # Counters (see stats()); ``failed`` counts failed flushes, not rows
+        self.enqueued = 0
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def add(self, user_id: str, level: str, message: str, details: str = ""):
+        """Queue one row. Never blocks on the database."""
+        row = {"user_id": user_id, "level": level, "message": message, "details": details}
+        with self._cond:
+            if len(self._rows) >= settings.activity_log_queue_size:
+                self.dropped += 1
+                if self.dropped % 1000 == 1:
+                    logger.warning(f"Activity log buffer full - {self.dropped} rows dropped so far")
+                return
+            self._rows.append(row)
+            self.enqueued += 1
+            if len(self._rows) >= settings.activity_log_batch_size:
+                self._cond.notify()
+        self._ensure_started()
+
+    def _ensure_started(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="activity-log-writer", daemon=True)
+            self._thread.start()
+
+    def _take_batch(self) -> List[Dict]:
+        batch = []
+        while self._rows and len(batch) < settings.activity_log_batch_size:
+            batch.append(self._rows.popleft())
+        return batch
+
+    def _run(self):
+        interval = settings.activity_log_flush_interval_ms / 1000
+        while True:
+            with self._cond:
+                if not self._stopping and len(self._rows) < settings.activity_log_batch_size:
+                    self._cond.wait(timeout=interval)
+                if self._stopping and not self._rows:
+                    return
+                batch = self._take_batch()
+            if not self._flush(batch) and not self._stopping:
+                # Back off while the database is unavailable
+                with self._cond:
+                    self._cond.wait(timeout=interval)
+
+    def _flush(self, batch: List[Dict]) -> bool:
+        if not batch:
+            return True
+        try:
+            write_activity_rows(batch)
+            with self._cond:
+                self.written += len(batch)
+                self.flushes += 1
+            return True
+        except Exception as e:
+            logger.error(f"Activity log flush failed ({len(batch)} rows): {e}")
+            with self._cond:
+                self.failed += 1
+                if self._stopping:
+                    self.dropped += len(batch)
+                    return False
+                # Requeue at the front as far as capacity allows; the rest is lost
+                room = settings.activity_log_queue_size - len(self._rows)
+                for row in reversed(batch[:max(0, room)]):
+                    self._rows.appendleft(row)
+                self.dropped += max(0, len(batch) - room)
+            return False
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        while True:
+            with self._cond:
+                batch = self._take_batch()
+            if not batch or not self._flush(batch):
+                return
+
+    def stop(self, timeout: float = 10.0):
+        """Flush pending rows and stop the writer thread (called on shutdown)."""
+        with self._cond:
+            self._stopping = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "queued": len(self._rows),
+                "enqueued": self.enqueued,
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed": self.failed,
+                "flushes": self.flushes,
+            }
+
+
+# Process-wide buffer shared by every tenant
+activity_log_buffer = ActivityLogBuffer()
@@ -1,5 +1,6 @@
 from sqlalchemy import text
-from database import engine
+from database import engine, get_async_engine
+from services.quota_service import get_quota_usage
 
 
 def mask_secret(value: str) -> str:
@@ -41,37 +42,74 @@ def update_global_config(data: dict):
 
 # ========== PER-USER CONFIG ==========
 
+# The hot settings row, read several times per monitor poll. Secrets and the
+# serialized instagrapi session live in instagram_credentials (get_credentials).
+_CONFIG_COLUMNS = """
+    user_id, app_id, page_id, instagram_business_account_id, ig_username, api_mode,
+    polling_interval_seconds, monitor_enabled, welcome_dm_enabled, auto_comment_enabled,
+    auto_reply_dm_enabled, max_dms_per_day, max_comments_per_day, delay_between_dms,
+    delay_between_comments, delay_between_media_checks, followers_per_check, media_posts_per_check,
+    delay_randomization_max, like_compaction_enabled, like_compaction_after_days
+"""
+
+CREDENTIAL_FIELDS = ("app_secret", "access_token", "ig_password", "ig_session")
+
+_GET_CONFIG_SQL = text(f"SELECT {_CONFIG_COLUMNS} FROM instagram_config WHERE user_id = :uid LIMIT 1")
+
+_GET_CREDENTIALS_SQL = text(
+    f"SELECT {', '.join(CREDENTIAL_FIELDS)} FROM instagram_credentials WHERE user_id = :uid"
+)
+
+
+def _config_row(row) -> dict:
+    if not row:
+        return {}
+    config = dict(row)
+    # asyncpg returns UUID objects where psycopg2 returns strings
+    if config.get("user_id") is not None:
+        config["user_id"] = str(config["user_id"])
+    return config
+
+
+def _credentials_row(row) -> dict:
+    return {field: (row[field] if row else "") or "" for field in CREDENTIAL_FIELDS}
+
+
 def get_config(user_id: str) -> dict:
     with engine.connect() as conn:
-        result = conn.execute(
-            text("SELECT * FROM instagram_config WHERE user_id = :uid LIMIT 1"),
-            {"uid": user_id},
-        )
-        row = result.mappings().first()
-        if not row:
-            return {}
-        return dict(row)
+        result = conn.execute(_GET_CONFIG_SQL, {"uid": user_id})
+        return _config_row(result.mappings().first())
+
+
+def get_credentials(user_id: str) -> dict:
+    """Secrets and session of a tenant; only needed to build an Instagram client."""
+    with engine.connect() as conn:
+        result = conn.execute(_GET_CREDENTIALS_SQL, {"uid": user_id})
+        return _credentials_row(result.mappings().first())
 
 
 def get_config_masked(user_id: str) -> dict:
     config = get_config(user_id)
     if not config:
         return {}
+    credentials = get_credentials(user_id)
+    usage = get_quota_usage(user_id)
     return {
         "app_id": config.get("app_id", ""),
-        "app_secret_masked": mask_secret(config.get("app_secret", "")),
-        "access_token_masked": mask_secret(config.get("access_token", "")),
+        "app_secret_masked": mask_secret(credentials["app_secret"]),
+        "access_token_masked": mask_secret(credentials["access_token"]),
         "page_id": config.get("page_id", ""),
         "instagram_business_account_id": config.get("instagram_business_account_id", ""),
         "ig_username": config.get("ig_username", ""),
-        "ig_password_masked": mask_secret(config.get("ig_password", "")),
-        "ig_session_active": bool(config.get("ig_session", "")),
+        "ig_password_masked": mask_secret(credentials["ig_password"]),
+        "ig_session_active": bool(credentials["ig_session"]),
         "api_mode": config.get("api_mode", "instagrapi"),
         "polling_interval_seconds": config.get("polling_interval_seconds", 60),
         "monitor_enabled": config.get("monitor_enabled", False),
         # Bot control
         "welcome_dm_enabled": config.get("welcome_dm_enabled", True),
         "auto_comment_enabled": config.get("auto_comment_enabled", True),
+        "auto_reply_dm_enabled": config.get("auto_reply_dm_enabled", False),
         "max_dms_per_day": config.get("max_dms_per_day", 20),
         "max_comments_per_day": config.get("max_comments_per_day", 20),
         "delay_between_dms": config.get("delay_between_dms", 45),
@@ -80,48 +118,33 @@ def get_config_masked(user_id: str) -> dict:
         "followers_per_check": config.get("followers_per_check", 20),
         "media_posts_per_check": config.get("media_posts_per_check", 3),
         "delay_randomization_max": config.get("delay_randomization_max", 30),
-        "dms_sent_today": config.get("dms_sent_today", 0),
-        "comments_posted_today": config.get("comments_posted_today", 0),
+        "like_compaction_enabled": config.get("like_compaction_enabled", True),
+        "like_compaction_after_days": config.get("like_compaction_after_days", 14),
+        # Rolling 24h usage from the quota ledger
+        "dms_sent_today": usage["dm"],
+        "comments_posted_today": usage["comment"],
     }
 
 
-VALID_COUNTERS = {"dms_sent_today", "comments_posted_today"}
+# ========== ASYNC VARIANTS (monitor, async routes) ==========
 
+async def get_global_config_async() -> dict:
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(text("SELECT * FROM global_config ORDER BY id LIMIT 1"))
+        row = result.mappings().first()
+        return dict(row) if row else {}
 
-def increment_daily_counter(user_id: str, counter_name: str) -> int:
-    """Atomically increment a daily counter and return the new value."""
-    if counter_name not in VALID_COUNTERS:
-        raise ValueError(f"Invalid counter: {counter_name}")
-    with engine.connect() as conn:
-        result = conn.execute(
-            text(f"""
-                UPDATE instagram_config
-                SET {counter_name} = {counter_name} + 1, updated_at = NOW()
-                WHERE user_id = :uid
-                RETURNING {counter_name}
-            """),
-            {"uid": user_id},
-        )
-        conn.commit()
-        return result.scalar()
 
+async def get_config_async(user_id: str) -> dict:
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(_GET_CONFIG_SQL, {"uid": user_id})
+        return _config_row(result.mappings().first())
 
-def reset_daily_counters_if_needed(user_id: str) -> bool:
-    """Reset daily counters if 24h have passed. Returns True if reset occurred."""
-    with engine.connect() as conn:
-        result = conn.execute(text("""
-            UPDATE instagram_config
-            SET dms_sent_today = 0,
-                comments_posted_today = 0,
-                daily_counters_reset_at = NOW(),
-                updated_at = NOW()
-            WHERE user_id = :uid
-              AND daily_counters_reset_at < NOW() - INTERVAL '24 hours'
-            RETURNING id
-        """), {"uid": user_id})
-        conn.commit()
-        row = result.first()
-        return row is not None
+
+async def get_credentials_async(user_id: str) -> dict:
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(_GET_CREDENTIALS_SQL, {"uid": user_id})
+        return _credentials_row(result.mappings().first())
 
 
 def update_config(user_id: str, data: dict) -> dict:
@@ -130,6 +153,7 @@ def update_config(user_id: str, data: dict) -> dict:
     if not updates:
         return get_config(user_id)
 
+    secrets = {k: updates.pop(k) for k in CREDENTIAL_FIELDS if k in updates}
     set_clauses = []
     params = {"uid": user_id}
     for key, value in updates.items():
@@ -144,6 +168,17 @@ def update_config(user_id: str, data: dict) -> dict:
             text(f"UPDATE instagram_config SET {set_sql} WHERE user_id = :uid"),
             params,
         )
+        if secrets:
+            columns = ", ".join(secrets)
+            conn.execute(
+                text(f"""
+                    INSERT INTO instagram_credentials (user_id, {columns})
+                    VALUES (:uid, {", ".join(f":{k}" for k in secrets)})
+                    ON CONFLICT (user_id) DO UPDATE SET
+                        {", ".join(f"{k} = EXCLUDED.{k}" for k in secrets)}, updated_at = NOW()
+                """),
+                {"uid": user_id, **secrets},
+            )
         conn.commit()
 
     return get_config(user_id)
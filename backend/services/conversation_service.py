@@ -1,10 +1,87 @@
+from datetime import datetime, timezone
 from sqlalchemy import text
-from database import engine
+from config import settings
+from database import engine, get_async_engine, jobs_engine
+from services.activity_log_buffer import activity_log_buffer, write_activity_rows
+from services.live_events import live_events
+from services.pagination import (
+    encode_cursor,
+    encode_rank_cursor,
+    estimate_count,
+    keyset_clause,
+    rank_keyset_clause,
+)
+
+TOTAL_MODES = ("exact", "estimate", "none")
+SEARCH_SORTS = ("rank", "recent")
+
+# Everything but the generated search_vector
+_CONVERSATION_COLUMNS = """
+    id, user_id, instagram_user_id, instagram_username, event_type, trigger_media_id,
+    trigger_media_caption, agent_action, agent_message, session_id, created_at
+"""
+
+# Counted actions; keep in sync with get_stats and backfill_user_stats
+_STATS_COLUMNS_SQL = """
+    COUNT(*),
+    COUNT(*) FILTER (WHERE agent_action = 'sent_dm'),
+    COUNT(*) FILTER (WHERE agent_action = 'posted_comment'),
+    COUNT(*) FILTER (WHERE event_type = 'new_follower')
+"""
+
+# The conversation and its user_stats increment are written by one statement (one transaction)
+_LOG_CONVERSATION_SQL = text(f"""
+    WITH ins AS (
+        INSERT INTO conversations
+        (user_id, instagram_user_id, instagram_username, event_type, trigger_media_id,
+         trigger_media_caption, agent_action, agent_message, session_id)
+        VALUES (:user_id, :uid, :uname, :etype, :mid, :mcap, :action, :msg, :sid)
+        RETURNING id, user_id, agent_action, event_type
+    ), stats AS (
+        INSERT INTO user_stats AS s
+        (user_id, total_conversations, total_dms_sent, total_comments_posted, total_followers_greeted)
+        SELECT user_id, {_STATS_COLUMNS_SQL}
+        FROM ins WHERE user_id IS NOT NULL GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_conversations = s.total_conversations + EXCLUDED.total_conversations,
+            total_dms_sent = s.total_dms_sent + EXCLUDED.total_dms_sent,
+            total_comments_posted = s.total_comments_posted + EXCLUDED.total_comments_posted,
+            total_followers_greeted = s.total_followers_greeted + EXCLUDED.total_followers_greeted,
+            updated_at = NOW()
+    )
+    SELECT id FROM ins
+""")
+
+
+def _conversation_params(
+    user_id, instagram_user_id, instagram_username, event_type, agent_action, agent_message,
+    trigger_media_id, trigger_media_caption, session_id,
+) -> dict:
+    return {
+        "user_id": user_id,
+        "uid": instagram_user_id,
+        "uname": instagram_username,
+        "etype": event_type,
+        "mid": trigger_media_id,
+        "mcap": trigger_media_caption,
+        "action": agent_action,
+        "msg": agent_message,
+        "sid": session_id,
+    }
+
+
+def _serialize_conversation(row: dict) -> dict:
+    # Instagram ids are BIGINT but can exceed JS number precision, so the API keeps them strings
+    if row.get("instagram_user_id") is not None:
+        row["instagram_user_id"] = str(row["instagram_user_id"])
+    if row.get("created_at"):
+        row["created_at"] = str(row["created_at"])
+    return row
 
 
 def log_conversation(
     user_id: str,
-    instagram_user_id: str,
+    instagram_user_id: int,
     instagram_username: str,
     event_type: str,
     agent_action: str,
@@ -13,128 +90,296 @@ def log_conversation(
     trigger_media_caption: str = "",
     session_id: str = "",
 ) -> int:
+    params = _conversation_params(
+        user_id, instagram_user_id, instagram_username, event_type, agent_action, agent_message,
+        trigger_media_id, trigger_media_caption, session_id,
+    )
     with engine.connect() as conn:
-        result = conn.execute(
-            text("""
-                INSERT INTO conversations
-                (user_id, instagram_user_id, instagram_username, event_type, trigger_media_id,
-                 trigger_media_caption, agent_action, agent_message, session_id)
-                VALUES (:user_id, :uid, :uname, :etype, :mid, :mcap, :action, :msg, :sid)
-                RETURNING id
-            """),
-            {
-                "user_id": user_id,
-                "uid": instagram_user_id,
-                "uname": instagram_username,
-                "etype": event_type,
-                "mid": trigger_media_id,
-                "mcap": trigger_media_caption,
-                "action": agent_action,
-                "msg": agent_message,
-                "sid": session_id,
-            },
-        )
+        result = conn.execute(_LOG_CONVERSATION_SQL, params)
         conn.commit()
         return result.scalar()
 
 
-def get_conversations(user_id: str, page: int = 1, limit: int = 20, event_type: str = None) -> dict:
-    offset = (page - 1) * limit
+async def log_conversation_async(
+    user_id: str,
+    instagram_user_id: int,
+    instagram_username: str,
+    event_type: str,
+    agent_action: str,
+    agent_message: str,
+    trigger_media_id: str = "",
+    trigger_media_caption: str = "",
+    session_id: str = "",
+) -> int:
+    params = _conversation_params(
+        user_id, instagram_user_id, instagram_username, event_type, agent_action, agent_message,
+        trigger_media_id, trigger_media_caption, session_id,
+    )
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(_LOG_CONVERSATION_SQL, params)
+        await conn.commit()
+        return result.scalar()
+
+
+def get_conversations(
+    user_id: str,
+    page: int = 1,
+    limit: int = 20,
+    event_type: str = None,
+    cursor: str = None,
+    total_mode: str = None,
+) -> dict:
+    """List conversations newest first.
+
+    With ``cursor`` (the previous response's ``next_cursor``) the page is read
+    by keyset and ``page`` is ignored; otherwise ``page`` uses OFFSET. The total
+    is exact, a planner estimate, or omitted - by default estimated in cursor
+    mode and exact in page mode.
+    """
+    if total_mode is None:
+        total_mode = "estimate" if cursor else "exact"
+    if total_mode not in TOTAL_MODES:
+        raise ValueError(f"Invalid total mode: {total_mode}")
 
     with engine.connect() as conn:
         where_clause = "WHERE user_id = :user_id"
-        params = {"user_id": user_id, "limit": limit, "offset": offset}
+        params = {"user_id": user_id}
 
         if event_type:
             where_clause += " AND event_type = :event_type"
             params["event_type"] = event_type
 
-        count_result = conn.execute(
-            text(f"SELECT COUNT(*) FROM conversations {where_clause}"),
-            params,
-        )
-        total = count_result.scalar()
+        total = None
+        if total_mode == "exact":
+            total = conn.execute(text(f"SELECT COUNT(*) FROM conversations {where_clause}"), params).scalar()
+        elif total_mode == "estimate":
+            total = estimate_count(conn, f"FROM conversations {where_clause}", params)
 
+        page_params = {**params, "limit": limit + 1, "offset": 0 if cursor else (page - 1) * limit}
         result = conn.execute(
             text(f"""
-                SELECT * FROM conversations {where_clause}
-                ORDER BY created_at DESC
+                SELECT {_CONVERSATION_COLUMNS} FROM conversations {where_clause}{keyset_clause(cursor, page_params)}
+                ORDER BY created_at DESC, id DESC
                 LIMIT :limit OFFSET :offset
             """),
-            params,
+            page_params,
         )
         rows = [dict(r) for r in result.mappings().all()]
 
-        # Convert datetime to string
+        # One extra row tells whether another page exists
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+
         for row in rows:
-            if row.get("created_at"):
-                row["created_at"] = str(row["created_at"])
+            _serialize_conversation(row)
 
-        return {"items": rows, "total": total, "page": page, "limit": limit}
+        return {
+            "items": rows,
+            "total": total,
+            "total_estimated": total_mode == "estimate",
+            "page": page,
+            "limit": limit,
+            "next_cursor": next_cursor,
+        }
 
 
 def get_conversation_by_id(user_id: str, conv_id: int) -> dict:
     with engine.connect() as conn:
         result = conn.execute(
-            text("SELECT * FROM conversations WHERE id = :id AND user_id = :user_id"),
+            text(f"SELECT {_CONVERSATION_COLUMNS} FROM conversations WHERE id = :id AND user_id = :user_id"),
             {"id": conv_id, "user_id": user_id},
         )
         row = result.mappings().first()
         if not row:
             return None
-        data = dict(row)
-        if data.get("created_at"):
-            data["created_at"] = str(data["created_at"])
-        return data
+        return _serialize_conversation(dict(row))
+
+
+def search_conversations(
+    user_id: str,
+    q: str = None,
+    username: str = None,
+    event_type: str = None,
+    sort: str = "rank",
+    limit: int = 20,
+    cursor: str = None,
+) -> dict:
+    """Full-text search over message, username and caption, plus username prefix match.
+
+    ``q`` uses web search syntax ("quoted phrase", -excluded, or). Results are
+    ordered by relevance (``sort="rank"``, needs ``q``) or newest first, and
+    paged by keyset with the previous response's ``next_cursor``.
+    """
+    if sort not in SEARCH_SORTS:
+        raise ValueError(f"Invalid sort: {sort}")
+    if not q and not username:
+        raise ValueError("Provide q and/or username")
+    if not q:
+        sort = "recent"
+
+    params = {"user_id": user_id, "limit": limit + 1}
+    where_clause = "WHERE user_id = :user_id"
+    rank_sql = "NULL::NUMERIC"
+    if q:
+        where_clause += " AND search_vector @@ websearch_to_tsquery('simple', :q)"
+        rank_sql = "ROUND(CAST(ts_rank(search_vector, websearch_to_tsquery('simple', :q)) AS NUMERIC), 6)"
+        params["q"] = q
+    if username:
+        # Served by the trigram index; escape LIKE wildcards in the prefix
+        escaped = username.lower().lstrip("@").replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        where_clause += " AND lower(instagram_username) LIKE :username_prefix"
+        params["username_prefix"] = escaped + "%"
+    if event_type:
+        where_clause += " AND event_type = :event_type"
+        params["event_type"] = event_type
+
+    if sort == "rank":
+        sql = f"""
+            SELECT * FROM (
+                SELECT {_CONVERSATION_COLUMNS}, {rank_sql} AS rank FROM conversations {where_clause}
+            ) ranked
+            WHERE TRUE{rank_keyset_clause(cursor, params)}
+            ORDER BY rank DESC, created_at DESC, id DESC
+            LIMIT :limit
+        """
+    else:
+        sql = f"""
+            SELECT {_CONVERSATION_COLUMNS}, {rank_sql} AS rank FROM conversations
+            {where_clause}{keyset_clause(cursor, params)}
+            ORDER BY created_at DESC, id DESC
+            LIMIT :limit
+        """
+
+    with engine.connect() as conn:
+        rows = [dict(r) for r in conn.execute(text(sql), params).mappings().all()]
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        if sort == "rank":
+            next_cursor = encode_rank_cursor(last["rank"], last["created_at"], last["id"])
+        else:
+            next_cursor = encode_cursor(last["created_at"], last["id"])
+
+    for row in rows:
+        _serialize_conversation(row)
+        row["rank"] = float(row["rank"]) if row["rank"] is not None else None
+
+    return {"items": rows, "sort": sort, "limit": limit, "next_cursor": next_cursor}
 
 
 def get_stats(user_id: str) -> dict:
     with engine.connect() as conn:
-        total = conn.execute(
-            text("SELECT COUNT(*) FROM conversations WHERE user_id = :uid"),
-            {"uid": user_id},
-        ).scalar()
-        dms = conn.execute(
-            text("SELECT COUNT(*) FROM conversations WHERE user_id = :uid AND agent_action = 'sent_dm'"),
-            {"uid": user_id},
-        ).scalar()
-        comments = conn.execute(
-            text("SELECT COUNT(*) FROM conversations WHERE user_id = :uid AND agent_action = 'posted_comment'"),
-            {"uid": user_id},
-        ).scalar()
-        followers = conn.execute(
-            text("SELECT COUNT(*) FROM conversations WHERE user_id = :uid AND event_type = 'new_follower'"),
+        row = conn.execute(
+            text("""
+                SELECT total_conversations, total_dms_sent, total_comments_posted, total_followers_greeted
+                FROM user_stats WHERE user_id = :uid
+            """),
             {"uid": user_id},
-        ).scalar()
+        ).mappings().first()
 
-        return {
-            "total_conversations": total,
-            "total_dms_sent": dms,
-            "total_comments_posted": comments,
-            "total_followers_greeted": followers,
-        }
+    stats = dict(row) if row else {}
+    return {
+        "total_conversations": stats.get("total_conversations", 0),
+        "total_dms_sent": stats.get("total_dms_sent", 0),
+        "total_comments_posted": stats.get("total_comments_posted", 0),
+        "total_followers_greeted": stats.get("total_followers_greeted", 0),
+    }
+
+
+def backfill_user_stats(conn=None) -> int:
+    """Recompute user_stats from the conversations history. Returns the number of users.
+
+    Counters are overwritten with the recount, so once retention has dropped
+    conversation partitions the lifetime totals would shrink to the retained
+    history; the admin route refuses to run while retention is enabled.
+    Runs in ``conn``'s transaction when given (migrations), else in its own.
+    """
+    if conn is None:
+        with jobs_engine.connect() as conn:
+            count = backfill_user_stats(conn)
+            conn.commit()
+            return count
+
+    # Blocks concurrent log_conversation increments until the recount commits
+    conn.execute(text("LOCK TABLE user_stats IN SHARE ROW EXCLUSIVE MODE"))
+    result = conn.execute(text(f"""
+        INSERT INTO user_stats
+        (user_id, total_conversations, total_dms_sent, total_comments_posted, total_followers_greeted)
+        SELECT user_id, {_STATS_COLUMNS_SQL}
+        FROM conversations
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE SET
+            total_conversations = EXCLUDED.total_conversations,
+            total_dms_sent = EXCLUDED.total_dms_sent,
+            total_comments_posted = EXCLUDED.total_comments_posted,
+            total_followers_greeted = EXCLUDED.total_followers_greeted,
+            updated_at = NOW()
+    """))
+    return result.rowcount
+
+
+def _publish_activity(user_id: str, level: str, message: str, details: str):
+    live_events.publish(user_id, "activity", {
+        "level": level,
+        "message": message,
+        "details": details,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    })
 
 
 def log_activity(user_id: str, level: str, message: str, details: str = ""):
-    with engine.connect() as conn:
-        conn.execute(
+    """Record an activity row. Buffered (write-behind) unless activity_log_buffered is off."""
+    _publish_activity(user_id, level, message, details)
+    if settings.activity_log_buffered:
+        activity_log_buffer.add(user_id, level, message, details)
+        return
+    write_activity_rows([{"user_id": user_id, "level": level, "message": message, "details": details}])
+
+
+async def log_activity_async(user_id: str, level: str, message: str, details: str = ""):
+    _publish_activity(user_id, level, message, details)
+    if settings.activity_log_buffered:
+        activity_log_buffer.add(user_id, level, message, details)
+        return
+    async with get_async_engine().connect() as conn:
+        await conn.execute(
             text("""
                 INSERT INTO activity_log (user_id, level, message, details)
                 VALUES (:user_id, :level, :message, :details)
             """),
             {"user_id": user_id, "level": level, "message": message, "details": details},
         )
-        conn.commit()
+        await conn.commit()
 
 
-def get_activity_log(user_id: str, limit: int = 50) -> list:
+def get_activity_page(user_id: str, limit: int = 50, cursor: str = None) -> dict:
+    """Activity log newest first, read by keyset. Returns items and next_cursor."""
+    params = {"uid": user_id, "limit": limit + 1}
     with engine.connect() as conn:
         result = conn.execute(
-            text("SELECT * FROM activity_log WHERE user_id = :uid ORDER BY created_at DESC LIMIT :limit"),
-            {"uid": user_id, "limit": limit},
+            text(f"""
+                SELECT * FROM activity_log
+                WHERE user_id = :uid{keyset_clause(cursor, params)}
+                ORDER BY created_at DESC, id DESC
+                LIMIT :limit
+            """),
+            params,
         )
         rows = [dict(r) for r in result.mappings().all()]
-        for row in rows:
-            if row.get("created_at"):
-                row["created_at"] = str(row["created_at"])
-        return rows
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    for row in rows:
+        if row.get("created_at"):
+            row["created_at"] = str(row["created_at"])
+    return {"items": rows, "next_cursor": next_cursor}
+
+
+def get_activity_log(user_id: str, limit: int = 50, cursor: str = None) -> list:
+    return get_activity_page(user_id, limit, cursor)["items"]
@@ -0,0 +1,59 @@
+"""Known followers / media likers seen by the monitor (async, asyncpg engine).
+
+Instagram user and media ids are BIGINT pks and are passed as ints.
+"""
+from typing import Set
+from sqlalchemy import text
+from database import get_async_engine
+from services.like_compaction_service import KnownLikers, LikerSketch
+
+
+async def get_known_followers(user_id: str) -> Set[int]:
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("SELECT instagram_user_id FROM known_followers WHERE user_id = :uid"),
+            {"uid": user_id},
+        )
+        return {row[0] for row in result.fetchall()}
+
+
+async def add_known_follower(user_id: str, instagram_user_id: int, instagram_username: str):
+    async with get_async_engine().connect() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO known_followers (user_id, instagram_user_id, instagram_username)
+                VALUES (:owner, :uid, :uname)
+                ON CONFLICT DO NOTHING
+            """),
+            {"owner": user_id, "uid": instagram_user_id, "uname": instagram_username},
+        )
+        await conn.commit()
+
+
+async def get_known_likers(user_id: str, media_id: int) -> Set[int]:
+    """Likers already seen on a media, including those folded into sketches by compaction."""
+    params = {"uid": user_id, "mid": media_id}
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
+            text("SELECT instagram_user_id FROM known_media_likes WHERE user_id = :uid AND media_id = :mid"),
+            params,
+        )
+        ids = [row[0] for row in result.fetchall()]
+        sketches = await conn.execute(
+            text("SELECT sketch FROM known_media_like_sketches WHERE user_id = :uid AND media_id = :mid"),
+            params,
+        )
+        return KnownLikers(ids, [LikerSketch.from_bytes(row[0]) for row in sketches.fetchall()])
+
+
+async def add_known_like(user_id: str, media_id: int, instagram_user_id: int, instagram_username: str):
+    async with get_async_engine().connect() as conn:
+        await conn.execute(
+            text("""
+                INSERT INTO known_media_likes (user_id, media_id, instagram_user_id, instagram_username)
+                VALUES (:owner, :mid, :uid, :uname)
+                ON CONFLICT DO NOTHING
+            """),
+            {"owner": user_id, "mid": media_id, "uid": instagram_user_id, "uname": instagram_username},
+        )
+        await conn.commit()
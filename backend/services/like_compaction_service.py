@@ -0,0 +1,184 @@
+"""Compaction of ``known_media_likes`` for media that left the monitor's scan window.
+
+The monitor only looks at a tenant's newest ``media_posts_per_check`` posts,
+but used to keep one row per liker of every post forever. Once a post has
+had no new likers for ``like_compaction_after_days`` and is no longer being
+scanned (its ``media_cache`` row went stale), its liker rows are folded into
+a ``known_media_like_sketches`` row: the liker count plus a Bloom filter of
+the liker ids. ``get_known_likers`` still consults the sketch, so a post
+that comes back into the window is not commented on twice; a false positive
+only skips one comment.
+"""
+import asyncio
+import hashlib
+import logging
+import math
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import text
+from config import settings
+from database import jobs_engine as engine
+
+logger = logging.getLogger(__name__)
+
+# pg_try_advisory_xact_lock key so only one replica compacts a tenant at a time
+_COMPACTION_LOCK_KEY = 7_311_046
+
+_compaction_task: Optional[asyncio.Task] = None
+
+
+class LikerSketch:
+    """Bloom filter over liker ids, about 1% false positives at 10 bits per liker."""
+
+    BITS_PER_ITEM = 10
+    HASHES = 7
+
+    def __init__(self, bits: bytearray, hashes: int = HASHES):
+        self.bits = bits
+        self.hashes = hashes
+        self.size = len(bits) * 8
+
+    @classmethod
+    def build(cls, ids: Iterable[int], count: int) -> "LikerSketch":
+        sketch = cls(bytearray(max(8, math.ceil(count * cls.BITS_PER_ITEM / 8))))
+        for item in ids:
+            sketch.add(item)
+        return sketch
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "LikerSketch":
+        return cls(bytearray(data[1:]), data[0])
+
+    def to_bytes(self) -> bytes:
+        return bytes([self.hashes]) + bytes(self.bits)
+
+    def _positions(self, item: int):
+        # Hashed as decimal text, so sketches built before ids were BIGINT still match
+        digest = hashlib.blake2b(str(item).encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little") | 1
+        return ((h1 + i * h2) % self.size for i in range(self.hashes))
+
+    def add(self, item: int):
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+
+class KnownLikers(set):
+    """Exact liker ids of a media plus the sketches of its compacted likers."""
+
+    def __init__(self, ids: Iterable[int] = (), sketches: Iterable[LikerSketch] = ()):
+        super().__init__(ids)
+        self.sketches = list(sketches)
+
+    def __contains__(self, item) -> bool:
+        return set.__contains__(self, item) or any(item in sketch for sketch in self.sketches)
+
+
+_ELIGIBLE_MEDIA_SQL = text("""
+    SELECT k.media_id FROM known_media_likes k
+    WHERE k.user_id = :uid
+      AND NOT EXISTS (
+          SELECT 1 FROM media_cache m
+          WHERE m.user_id = k.user_id AND m.media_id = CAST(k.media_id AS TEXT)
+            AND m.updated_at > NOW() - make_interval(days => :days)
+      )
+    GROUP BY k.media_id
+    HAVING MAX(k.first_seen_at) < NOW() - make_interval(days => :days)
+    LIMIT :limit
+""")
+
+
+def compact_tenant(user_id: str, after_days: int) -> Dict[str, int]:
+    """Fold the liker rows of the tenant's aged-out media into sketches."""
+    report = {"media": 0, "rows": 0, "bytes_reclaimed": 0}
+    with engine.connect() as conn:
+        if not conn.execute(
+            text("SELECT pg_try_advisory_xact_lock(:key, hashtext(:uid))"),
+            {"key": _COMPACTION_LOCK_KEY, "uid": str(user_id)},
+        ).scalar():
+            return report
+        media_ids = [row[0] for row in conn.execute(
+            _ELIGIBLE_MEDIA_SQL,
+            {"uid": user_id, "days": after_days, "limit": settings.like_compaction_batch_media},
+        ).fetchall()]
+        for media_id in media_ids:
+            gone = conn.execute(
+                text("""
+                    DELETE FROM known_media_likes WHERE user_id = :uid AND media_id = :mid
+                    RETURNING instagram_user_id, pg_column_size(known_media_likes.*)
+                """),
+                {"uid": user_id, "mid": media_id},
+            ).fetchall()
+            if not gone:
+                continue
+            sketch = LikerSketch.build((row[0] for row in gone), len(gone)).to_bytes()
+            conn.execute(
+                text("""
+                    INSERT INTO known_media_like_sketches (user_id, media_id, liker_count, sketch)
+                    VALUES (:uid, :mid, :count, :sketch)
+                """),
+                {"uid": user_id, "mid": media_id, "count": len(gone), "sketch": sketch},
+            )
+            report["media"] += 1
+            report["rows"] += len(gone)
+            report["bytes_reclaimed"] += sum(row[1] for row in gone) - len(sketch)
+        conn.commit()
+    return report
+
+
+def run_like_compaction() -> Dict[str, int]:
+    """Compact every tenant that has compaction enabled. Returns totals."""
+    with engine.connect() as conn:
+        tenants = conn.execute(text("""
+            SELECT user_id, like_compaction_after_days FROM instagram_config
+            WHERE user_id IS NOT NULL AND like_compaction_enabled
+        """)).fetchall()
+    totals = {"tenants": 0, "media": 0, "rows": 0, "bytes_reclaimed": 0}
+    for user_id, after_days in tenants:
+        try:
+            report = compact_tenant(str(user_id), after_days or 14)
+        except Exception as e:
+            logger.error(f"[{user_id}] Like compaction failed: {e}")
+            continue
+        if report["media"]:
+            totals["tenants"] += 1
+            for key in ("media", "rows", "bytes_reclaimed"):
+                totals[key] += report[key]
+            logger.info(
+                f"[{user_id}] Compacted likes of {report['media']} media "
+                f"({report['rows']} rows, ~{report['bytes_reclaimed']} bytes)"
+            )
+    return totals
+
+
+async def _compaction_loop():
+    while True:
+        await asyncio.sleep(settings.like_compaction_interval_seconds)
+        try:
+            await asyncio.to_thread(run_like_compaction)
+        except Exception as e:
+            logger.error(f"Like compaction error: {e}")
+
+
+def start_compaction_loop():
+    """Run like compaction periodically (called on startup; 0 interval disables it)."""
+    global _compaction_task
+    if settings.like_compaction_interval_seconds <= 0:
+        return
+    if _compaction_task is None or _compaction_task.done():
+        _compaction_task = asyncio.create_task(_compaction_loop())
+
+
+async def stop_compaction_loop():
+    global _compaction_task
+    if _compaction_task is None:
+        return
+    _compaction_task.cancel()
+    try:
+        await _compaction_task
+    except asyncio.CancelledError:
+        pass
+    _compaction_task = None
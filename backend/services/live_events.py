@@ -0,0 +1,221 @@
+"""In-process fan-out of live monitor events to streaming clients.
+
+``publish`` is called from ``log_activity`` and the monitors (any thread) and
+hands each event to the bounded queue of every stream the tenant has open.
+A queue that is full drops the event and counts it, so a slow client never
+holds up the publisher; the stream then tells the client it lagged.
+
+Monitors may run in another process (``MONITOR_MODE=worker``) or on another
+replica, so events are also relayed through Postgres NOTIFY on
+``live_events`` and re-dispatched by every listening process. A single
+inline process has no one to relay to and skips it (see ``relay_enabled``).
+"""
+import asyncio
+import itertools
+import json
+import logging
+import threading
+from collections import deque
+from typing import Dict, Optional, Set
+
+from sqlalchemy import text
+from config import settings
+from database import get_async_engine, jobs_engine
+from services.monitor_lease_service import INSTANCE_ID
+
+logger = logging.getLogger(__name__)
+
+LIVE_EVENTS_CHANNEL = "live_events"
+# NOTIFY payloads are limited to 8000 bytes
+_MAX_RELAYED_DETAILS = 2000
+_LISTEN_RETRY_SECONDS = 5
+
+
+def format_sse(event_type: str, data: dict, event_id: Optional[int] = None) -> str:
+    """Encode one server-sent event."""
+    head = f"id: {event_id}\n" if event_id is not None else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def relay_enabled() -> bool:
+    """Relay through NOTIFY when configured, else only when monitors run in a worker process."""
+    if settings.live_events_relay is not None:
+        return settings.live_events_relay
+    return settings.monitor_mode == "worker"
+
+
+class Subscription:
+    """One open stream: a bounded queue owned by the stream's event loop."""
+
+    def __init__(self, user_id: str, loop: asyncio.AbstractEventLoop):
+        self.user_id = user_id
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=settings.live_events_queue_size)
+        self.dropped = 0
+
+    def _offer(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class LiveEventHub:
+    def __init__(self):
+        self._subscribers: Dict[str, Set[Subscription]] = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count(1)
+        # Serialized events waiting to be NOTIFYed to other processes
+        self._outbox: deque = deque(maxlen=settings.live_events_queue_size * 10)
+        self._relay_task: Optional[asyncio.Task] = None
+        self._listen_task: Optional[asyncio.Task] = None
+        self._listen_conn = None
+
+    # ---------- subscribers ----------
+
+    def subscribe(self, user_id: str) -> Optional[Subscription]:
+        """Open a stream for ``user_id``. Returns None over the per-tenant stream cap."""
+        sub = Subscription(user_id, asyncio.get_running_loop())
+        with self._lock:
+            subs = self._subscribers.setdefault(user_id, set())
+            if len(subs) >= settings.live_events_max_streams_per_user:
+                return None
+            subs.add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._subscribers.get(sub.user_id)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.user_id]
+
+    def publish(self, user_id: str, event_type: str, data: dict):
+        """Send an event to the tenant's streams here and, if relaying, in other processes."""
+        if not user_id:
+            return
+        self._dispatch(user_id, event_type, data)
+        if self._relay_task is not None:
+            if event_type == "activity" and len(data.get("details") or "") > _MAX_RELAYED_DETAILS:
+                data = {**data, "details": data["details"][:_MAX_RELAYED_DETAILS]}
+            self._outbox.append(json.dumps(
+                {"origin": INSTANCE_ID, "user_id": str(user_id), "type": event_type, "data": data},
+                default=str,
+            ))
+
+    def _dispatch(self, user_id: str, event_type: str, data: dict):
+        with self._lock:
+            subs = list(self._subscribers.get(str(user_id), ()))
+        if not subs:
+            return
+        event = {"id": next(self._seq), "type": event_type, "data": data}
+        for sub in subs:
+            try:
+                sub.loop.call_soon_threadsafe(sub._offer, event)
+            except RuntimeError:
+                # The stream's loop is closed; it will unsubscribe on its way out
+                pass
+
+    def stats(self) -> Dict:
+        with self._lock:
+            subs = [s for group in self._subscribers.values() for s in group]
+        return {
+            "streams": len(subs),
+            "tenants": len({s.user_id for s in subs}),
+            "dropped": sum(s.dropped for s in subs),
+            "relay_pending": len(self._outbox),
+        }
+
+    # ---------- cross-process relay ----------
+
+    async def _relay_loop(self):
+        while True:
+            await asyncio.sleep(settings.live_events_relay_interval_ms / 1000)
+            if not self._outbox:
+                continue
+            payloads = []
+            while self._outbox:
+                payloads.append(self._outbox.popleft())
+            try:
+                async with get_async_engine().connect() as conn:
+                    await conn.execute(
+                        text("SELECT pg_notify(:channel, p) FROM unnest(CAST(:payloads AS TEXT[])) AS p"),
+                        {"channel": LIVE_EVENTS_CHANNEL, "payloads": payloads},
+                    )
+                    await conn.commit()
+            except Exception as e:
+                logger.warning(f"Live event relay failed ({len(payloads)} events dropped): {e}")
+
+    def _open_listener(self):
+        raw = jobs_engine.raw_connection()
+        raw.detach()
+        conn = raw.driver_connection
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {LIVE_EVENTS_CHANNEL}")
+        return conn
+
+    def _on_notify(self):
+        try:
+            self._listen_conn.poll()
+        except Exception as e:
+            logger.warning(f"Live event listener lost its connection: {e}")
+            self._close_listener()
+            self._listen_task = asyncio.get_running_loop().create_task(self._listen())
+            return
+        notifies = list(self._listen_conn.notifies)
+        self._listen_conn.notifies.clear()
+        for notify in notifies:
+            try:
+                message = json.loads(notify.payload)
+            except ValueError:
+                continue
+            if message.get("origin") != INSTANCE_ID:
+                self._dispatch(message["user_id"], message["type"], message["data"])
+
+    async def _listen(self):
+        """Open the LISTEN connection, retrying until the database is reachable."""
+        while True:
+            try:
+                self._listen_conn = await asyncio.to_thread(self._open_listener)
+                asyncio.get_running_loop().add_reader(self._listen_conn.fileno(), self._on_notify)
+                return
+            except Exception as e:
+                logger.warning(f"Live event listener unavailable, retrying: {e}")
+                await asyncio.sleep(_LISTEN_RETRY_SECONDS)
+
+    def _close_listener(self):
+        if self._listen_conn is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_reader(self._listen_conn.fileno())
+            self._listen_conn.close()
+        except Exception:
+            pass
+        self._listen_conn = None
+
+    def start(self, listen: bool = True):
+        """Start relaying (and optionally receiving) events through NOTIFY (called on startup)."""
+        if not relay_enabled():
+            return
+        if self._relay_task is None or self._relay_task.done():
+            self._relay_task = asyncio.create_task(self._relay_loop())
+        if listen and (self._listen_task is None or self._listen_task.done()):
+            self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        for task in (self._relay_task, self._listen_task):
+            if task:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._relay_task = None
+        self._listen_task = None
+        self._close_listener()
+
+
+# Process-wide hub shared by every tenant
+live_events = LiveEventHub()
@@ -0,0 +1,94 @@
+import threading
+import time
+from collections import OrderedDict
+from sqlalchemy import text
+from database import engine
+from config import settings
+
+MEDIA_FIELDS = ("caption", "media_type", "like_count", "taken_at", "permalink")
+
+# In-memory layer in front of the media_cache table:
+# (user_id, media_id) -> (cached_at, media dict), least recently used first
+_memory: "OrderedDict[tuple, tuple]" = OrderedDict()
+_memory_lock = threading.Lock()
+
+
+def _remember(user_id: str, media: dict):
+    with _memory_lock:
+        key = (user_id, media["media_id"])
+        _memory[key] = (time.monotonic(), media)
+        _memory.move_to_end(key)
+        while len(_memory) > settings.media_cache_max_items:
+            _memory.popitem(last=False)
+
+
+def _recall(user_id: str, media_id: str) -> dict:
+    with _memory_lock:
+        entry = _memory.get((user_id, media_id))
+        if not entry:
+            return None
+        cached_at, media = entry
+        if time.monotonic() - cached_at > settings.media_cache_ttl_seconds:
+            del _memory[(user_id, media_id)]
+            return None
+        _memory.move_to_end((user_id, media_id))
+        return media
+
+
+def _normalize(media: dict) -> dict:
+    return {
+        "media_id": str(media["media_id"]),
+        "caption": media.get("caption") or "",
+        "media_type": str(media.get("media_type") or ""),
+        "like_count": media.get("like_count") or 0,
+        "taken_at": str(media.get("taken_at") or ""),
+        "permalink": media.get("permalink") or "",
+    }
+
+
+def upsert_media(user_id: str, medias: list):
+    """Refresh cached metadata from freshly fetched media (one multi-row statement)."""
+    if not medias:
+        return
+    rows = [_normalize(m) for m in medias]
+    with engine.connect() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO media_cache (user_id, media_id, caption, media_type, like_count, taken_at, permalink, updated_at)
+                VALUES (:uid, :media_id, :caption, :media_type, :like_count, :taken_at, :permalink, NOW())
+                ON CONFLICT (user_id, media_id) DO UPDATE SET
+                    caption = EXCLUDED.caption,
+                    media_type = EXCLUDED.media_type,
+                    like_count = EXCLUDED.like_count,
+                    taken_at = EXCLUDED.taken_at,
+                    permalink = COALESCE(NULLIF(EXCLUDED.permalink, ''), media_cache.permalink),
+                    updated_at = NOW()
+            """),
+            [{"uid": user_id, **row} for row in rows],
+        )
+        conn.commit()
+    for row in rows:
+        _remember(user_id, row)
+
+
+def get_cached_media(user_id: str, media_id: str) -> dict:
+    """Cached metadata for a media, from memory or the DB. None if never seen or stale."""
+    media = _recall(user_id, media_id)
+    if media:
+        return media
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(f"""
+                SELECT media_id, caption, media_type, like_count, taken_at, permalink
+                FROM media_cache
+                WHERE user_id = :uid AND media_id = :mid
+                  AND updated_at > NOW() - INTERVAL '{int(settings.media_cache_ttl_seconds)} seconds'
+            """),
+            {"uid": user_id, "mid": media_id},
+        )
+        row = result.mappings().first()
+    if not row:
+        return None
+    media = dict(row)
+    _remember(user_id, media)
+    return media
@@ -0,0 +1,184 @@
+import json
+from sqlalchemy import text
+from database import engine, jobs_engine
+
+MONITOR_COMMAND_CHANNEL = "monitor_commands"
+VALID_COMMANDS = {"start", "stop"}
+
+# Commands older than this are ignored by the worker (the web request gave up long ago)
+COMMAND_MAX_AGE_SECONDS = 300
+
+
+def enqueue_command(user_id: str, command: str) -> int:
+    """Queue a monitor command for the worker and NOTIFY it. Returns the command id."""
+    if command not in VALID_COMMANDS:
+        raise ValueError(f"Invalid monitor command: {command}")
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                INSERT INTO monitor_commands (user_id, command)
+                VALUES (:uid, :command)
+                RETURNING id
+            """),
+            {"uid": user_id, "command": command},
+        )
+        command_id = result.scalar()
+        # Delivered to listeners when the transaction commits
+        conn.execute(
+            text("SELECT pg_notify(:channel, :payload)"),
+            {"channel": MONITOR_COMMAND_CHANNEL, "payload": str(command_id)},
+        )
+        conn.commit()
+        return command_id
+
+
+def get_command_result(command_id: int) -> dict:
+    """Return the worker's result for a command, or None while it is still pending."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("SELECT status, result FROM monitor_commands WHERE id = :id"),
+            {"id": command_id},
+        )
+        row = result.first()
+    if not row or row[0] in ("pending", "processing"):
+        return None
+    try:
+        return json.loads(row[1]) if row[1] else {"status": row[0]}
+    except json.JSONDecodeError:
+        return {"status": row[0], "message": row[1]}
+
+
+def claim_pending_commands(limit: int = 50) -> list:
+    """Atomically claim pending commands in submission order."""
+    with jobs_engine.connect() as conn:
+        result = conn.execute(
+            text(f"""
+                UPDATE monitor_commands SET status = 'processing'
+                WHERE id IN (
+                    SELECT id FROM monitor_commands
+                    WHERE status = 'pending'
+                      AND created_at > NOW() - INTERVAL '{COMMAND_MAX_AGE_SECONDS} seconds'
+                    ORDER BY id
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, user_id, command
+            """),
+            {"limit": limit},
+        )
+        rows = [dict(r) for r in result.mappings().all()]
+        conn.commit()
+    for row in rows:
+        row["user_id"] = str(row["user_id"])
+    return sorted(rows, key=lambda r: r["id"])
+
+
+def complete_command(command_id: int, result: dict, status: str = "done"):
+    with jobs_engine.connect() as conn:
+        conn.execute(
+            text("""
+                UPDATE monitor_commands
+                SET status = :status, result = :result, processed_at = NOW()
+                WHERE id = :id
+            """),
+            {"id": command_id, "status": status, "result": json.dumps(result)},
+        )
+        conn.commit()
+
+
+def purge_old_commands(days: int = 1) -> int:
+    """Delete processed and expired commands older than ``days``."""
+    with jobs_engine.connect() as conn:
+        result = conn.execute(
+            text("DELETE FROM monitor_commands WHERE created_at < NOW() - make_interval(days => :days)"),
+            {"days": days},
+        )
+        conn.commit()
+        return result.rowcount
+
+
+# ========== MONITOR STATUS ==========
+
+STATUS_FIELDS = ("running", "last_poll", "total_polls", "new_followers_detected", "new_likes_detected", "errors")
+
+
+def empty_monitor_status() -> dict:
+    """Status reported for an account that has never been monitored."""
+    return {
+        "running": False,
+        "last_poll": None,
+        "total_polls": 0,
+        "new_followers_detected": 0,
+        "new_likes_detected": 0,
+        "errors": 0,
+    }
+
+
+def save_monitor_statuses(statuses: list, worker_id: str = ""):
+    """Upsert the status of monitors owned by one instance."""
+    if not statuses:
+        return
+    params = [
+        {
+            "uid": s["user_id"],
+            "worker_id": worker_id,
+            **{field: s.get(field) for field in STATUS_FIELDS},
+        }
+        for s in statuses
+    ]
+    with jobs_engine.connect() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO monitor_status
+                (user_id, running, last_poll, total_polls, new_followers_detected,
+                 new_likes_detected, errors, worker_id, updated_at)
+                VALUES (:uid, :running, :last_poll, :total_polls, :new_followers_detected,
+                        :new_likes_detected, :errors, :worker_id, NOW())
+                ON CONFLICT (user_id) DO UPDATE SET
+                    running = EXCLUDED.running,
+                    last_poll = EXCLUDED.last_poll,
+                    total_polls = EXCLUDED.total_polls,
+                    new_followers_detected = EXCLUDED.new_followers_detected,
+                    new_likes_detected = EXCLUDED.new_likes_detected,
+                    errors = EXCLUDED.errors,
+                    worker_id = EXCLUDED.worker_id,
+                    updated_at = NOW()
+            """),
+            params,
+        )
+        conn.commit()
+
+
+def _status_query(where_clause: str, stale_after_seconds: int) -> str:
+    # A status row whose owner stopped publishing is reported as not running
+    return f"""
+        SELECT user_id,
+               running AND updated_at > NOW() - INTERVAL '{int(stale_after_seconds)} seconds' AS running,
+               last_poll, total_polls, new_followers_detected, new_likes_detected, errors
+        FROM monitor_status {where_clause}
+    """
+
+
+def get_monitor_status(user_id: str, stale_after_seconds: int) -> dict:
+    with engine.connect() as conn:
+        result = conn.execute(
+            text(_status_query("WHERE user_id = :uid", stale_after_seconds)),
+            {"uid": user_id},
+        )
+        row = result.mappings().first()
+    if not row:
+        return None
+    status = dict(row)
+    del status["user_id"]
+    return status
+
+
+def list_monitor_statuses(stale_after_seconds: int) -> list:
+    with engine.connect() as conn:
+        result = conn.execute(text(_status_query("", stale_after_seconds)))
+        rows = []
+        for r in result.mappings().all():
+            status = dict(r)
+            status["user_id"] = str(status["user_id"])
+            rows.append(status)
+        return rows
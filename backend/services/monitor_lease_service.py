@@ -0,0 +1,117 @@
+import os
+import socket
+import uuid
+from sqlalchemy import text
+from database import jobs_engine as engine
+
+# Identity of this process as a lease holder
+INSTANCE_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def acquire_lease(user_id: str, owner_id: str, ttl_seconds: int) -> bool:
+    """Take the monitor lease for an account if it is free, expired or already ours."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                INSERT INTO monitor_leases (user_id, owner_id, acquired_at, expires_at)
+                VALUES (:uid, :owner, NOW(), NOW() + make_interval(secs => :ttl))
+                ON CONFLICT (user_id) DO UPDATE SET
+                    owner_id = EXCLUDED.owner_id,
+                    acquired_at = CASE WHEN monitor_leases.owner_id = EXCLUDED.owner_id
+                                       THEN monitor_leases.acquired_at ELSE NOW() END,
+                    expires_at = EXCLUDED.expires_at
+                WHERE monitor_leases.owner_id = EXCLUDED.owner_id
+                   OR monitor_leases.expires_at < NOW()
+                RETURNING user_id
+            """),
+            {"uid": user_id, "owner": owner_id, "ttl": ttl_seconds},
+        )
+        conn.commit()
+        return result.first() is not None
+
+
+def renew_leases(owner_id: str, ttl_seconds: int, running: list) -> set:
+    """Extend our unexpired leases of the ``running`` accounts that are still enabled.
+
+    Returns the user_ids still owned; anything missing was taken over,
+    disabled or expired and must be stopped locally. Leases of accounts not
+    running here, or already expired, are left to expire so that
+    ``get_orphaned_accounts`` hands them to another instance.
+    """
+    if not running:
+        return set()
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                UPDATE monitor_leases l
+                SET expires_at = NOW() + make_interval(secs => :ttl)
+                FROM instagram_config ic
+                WHERE l.owner_id = :owner
+                  AND l.user_id = ANY(CAST(:running AS UUID[]))
+                  AND l.expires_at > NOW()
+                  AND ic.user_id = l.user_id
+                  AND ic.monitor_enabled = true
+                RETURNING l.user_id
+            """),
+            {"owner": owner_id, "ttl": ttl_seconds, "running": list(running)},
+        )
+        conn.commit()
+        return {str(row[0]) for row in result.fetchall()}
+
+
+def release_lease(user_id: str, owner_id: str):
+    with engine.connect() as conn:
+        conn.execute(
+            text("DELETE FROM monitor_leases WHERE user_id = :uid AND owner_id = :owner"),
+            {"uid": user_id, "owner": owner_id},
+        )
+        conn.commit()
+
+
+def expire_leases(owner_id: str):
+    """Expire all our leases at once so other instances adopt them right away (graceful shutdown)."""
+    with engine.connect() as conn:
+        conn.execute(
+            text("UPDATE monitor_leases SET expires_at = NOW() WHERE owner_id = :owner"),
+            {"owner": owner_id},
+        )
+        conn.commit()
+
+
+def get_orphaned_accounts(limit: int = 10) -> list:
+    """Enabled accounts whose previous lease holder stopped heartbeating."""
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                SELECT l.user_id FROM monitor_leases l
+                JOIN instagram_config ic ON ic.user_id = l.user_id
+                WHERE l.expires_at < NOW() AND ic.monitor_enabled = true
+                ORDER BY l.expires_at
+                LIMIT :limit
+            """),
+            {"limit": limit},
+        )
+        return [str(row[0]) for row in result.fetchall()]
+
+
+def get_resumable_accounts() -> list:
+    """Enabled accounts of active users that no instance currently holds."""
+    with engine.connect() as conn:
+        result = conn.execute(text("""
+            SELECT ic.user_id FROM instagram_config ic
+            JOIN users u ON u.id = ic.user_id AND u.is_active = true
+            LEFT JOIN monitor_leases l ON l.user_id = ic.user_id AND l.expires_at > NOW()
+            WHERE ic.monitor_enabled = true AND l.user_id IS NULL
+            ORDER BY ic.updated_at
+        """))
+        return [str(row[0]) for row in result.fetchall()]
+
+
+def set_monitor_enabled(user_id: str, enabled: bool):
+    """Record the desired monitor state; lease holders follow it."""
+    with engine.connect() as conn:
+        conn.execute(
+            text("UPDATE instagram_config SET monitor_enabled = :enabled, updated_at = NOW() WHERE user_id = :uid"),
+            {"uid": user_id, "enabled": enabled},
+        )
+        conn.commit()
@@ -0,0 +1,79 @@
+"""Keyset pagination helpers for tables ordered by ``(created_at DESC, id DESC)``.
+
+Ranked search results are ordered by ``(rank DESC, created_at DESC, id DESC)``
+and use the ``rank_`` variants; the rank must be an exact NUMERIC so it
+compares equal when recomputed for the next page.
+"""
+import base64
+import json
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+
+
+def _encode(data: dict) -> str:
+    raw = json.dumps(data, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode(cursor: str) -> dict:
+    padded = cursor + "=" * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def encode_cursor(created_at, row_id: int) -> str:
+    """Opaque cursor pointing just after the given row."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return _encode({"t": created_at, "id": row_id})
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        data = _decode(cursor)
+        return datetime.fromisoformat(data["t"]), int(data["id"])
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def encode_rank_cursor(rank: Decimal, created_at, row_id: int) -> str:
+    """Cursor for ranked results, pointing just after the given row."""
+    if isinstance(created_at, datetime):
+        created_at = created_at.isoformat()
+    return _encode({"r": str(rank), "t": created_at, "id": row_id})
+
+
+def decode_rank_cursor(cursor: str) -> Tuple[Decimal, datetime, int]:
+    """Inverse of encode_rank_cursor. Raises ValueError on a malformed cursor."""
+    try:
+        data = _decode(cursor)
+        return Decimal(data["r"]), datetime.fromisoformat(data["t"]), int(data["id"])
+    except (KeyError, TypeError, ValueError, InvalidOperation) as e:
+        raise ValueError("Invalid cursor") from e
+
+
+def keyset_clause(cursor: Optional[str], params: dict) -> str:
+    """SQL condition (prefixed with AND) selecting rows after ``cursor``; fills ``params``."""
+    if not cursor:
+        return ""
+    params["cursor_ts"], params["cursor_id"] = decode_cursor(cursor)
+    return " AND (created_at, id) < (:cursor_ts, :cursor_id)"
+
+
+def rank_keyset_clause(cursor: Optional[str], params: dict) -> str:
+    """Like keyset_clause for ``(rank, created_at, id)`` ordering."""
+    if not cursor:
+        return ""
+    params["cursor_rank"], params["cursor_ts"], params["cursor_id"] = decode_rank_cursor(cursor)
+    return " AND (rank, created_at, id) < (:cursor_rank, :cursor_ts, :cursor_id)"
+
+
+def estimate_count(conn, from_where_sql: str, params: dict) -> int:
+    """Planner row estimate for ``SELECT 1 <from_where_sql>`` - no scan, index statistics only."""
+    plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) SELECT 1 {from_where_sql}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
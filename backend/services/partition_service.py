@@ -0,0 +1,196 @@
+"""Monthly range partitions for conversations and activity_log.
+
+Partitions are named ``<table>_pYYYYMM`` and cover one calendar month (UTC)
+of ``created_at``; a ``<table>_default`` partition catches anything outside
+them. Maintenance creates upcoming months ahead of time and drops whole
+partitions once they are past the table's retention instead of DELETEing
+rows.
+"""
+import asyncio
+import logging
+import re
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import text
+from config import settings
+from database import jobs_engine as engine
+from services.webhook_service import prune_webhook_events
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLES = ("conversations", "activity_log")
+
+# pg_try_advisory_xact_lock key so only one replica runs maintenance at a time
+_MAINTENANCE_LOCK_KEY = 7_311_039
+
+_maintenance_task: Optional[asyncio.Task] = None
+
+
+def retention_days(table: str) -> int:
+    """Configured retention for a partitioned table (0 keeps everything)."""
+    return {
+        "conversations": settings.conversations_retention_days,
+        "activity_log": settings.activity_log_retention_days,
+    }[table]
+
+
+def _month_start(d: date) -> date:
+    return date(d.year, d.month, 1)
+
+
+def _next_month(d: date) -> date:
+    return date(d.year + d.month // 12, d.month % 12 + 1, 1)
+
+
+def _utc(d: date) -> datetime:
+    return datetime(d.year, d.month, d.day, tzinfo=timezone.utc)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y%m}"
+
+
+def _stored_columns(conn, table: str) -> List[str]:
+    """Columns of ``table`` that are written, not generated."""
+    result = conn.execute(text("""
+        SELECT column_name FROM information_schema.columns
+        WHERE table_schema = current_schema() AND table_name = :table AND is_generated = 'NEVER'
+        ORDER BY ordinal_position
+    """), {"table": table})
+    return [row[0] for row in result.fetchall()]
+
+
+def ensure_partition(conn, table: str, month: date) -> bool:
+    """Create the partition for ``month`` if missing. Returns True if it was created.
+
+    Rows that already landed in the default partition for that month are moved
+    into the new partition (a plain CREATE ... PARTITION OF would fail).
+    """
+    name = partition_name(table, month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+    start, end = _utc(month), _utc(_next_month(month))
+    bounds = f"FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    has_default_rows = conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE created_at >= :start AND created_at < :end)"),
+        {"start": start, "end": end},
+    ).scalar()
+    if not has_default_rows:
+        conn.execute(text(f"CREATE TABLE {name} PARTITION OF {table} FOR VALUES {bounds}"))
+        return True
+
+    conn.execute(text(
+        f"CREATE TABLE {name} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS INCLUDING GENERATED)"
+    ))
+    # Generated columns (conversations.search_vector) cannot be inserted into
+    columns = ", ".join(_stored_columns(conn, table))
+    conn.execute(text(f"""
+        WITH moved AS (
+            DELETE FROM {table}_default WHERE created_at >= :start AND created_at < :end RETURNING {columns}
+        )
+        INSERT INTO {name} ({columns}) SELECT {columns} FROM moved
+    """), {"start": start, "end": end})
+    conn.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {name} FOR VALUES {bounds}"))
+    logger.info(f"Created partition {name} (moved rows out of {table}_default)")
+    return True
+
+
+def ensure_partitions(conn, table: str, since: Optional[date] = None) -> List[str]:
+    """Create monthly partitions from ``since`` (default: this month) up to ``partition_months_ahead``."""
+    today = datetime.now(timezone.utc).date()
+    month = _month_start(since or today)
+    last = _month_start(today)
+    for _ in range(settings.partition_months_ahead):
+        last = _next_month(last)
+    created = []
+    while month <= last:
+        if ensure_partition(conn, table, month):
+            created.append(partition_name(table, month))
+        month = _next_month(month)
+    return created
+
+
+def _list_partitions(conn, table: str) -> Dict[str, date]:
+    """Monthly partitions of ``table`` with the month they cover."""
+    result = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:table)
+    """), {"table": table})
+    pattern = re.compile(rf"^{table}_p(\d{{4}})(\d{{2}})$")
+    partitions = {}
+    for (relname,) in result.fetchall():
+        match = pattern.match(relname)
+        if match:
+            partitions[relname] = date(int(match.group(1)), int(match.group(2)), 1)
+    return partitions
+
+
+def drop_expired_partitions(conn, table: str) -> List[str]:
+    """Drop partitions entirely older than the table's retention. Returns dropped names."""
+    days = retention_days(table)
+    if days <= 0:
+        return []
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    dropped = []
+    for name, month in sorted(_list_partitions(conn, table).items(), key=lambda p: p[1]):
+        if _utc(_next_month(month)) <= cutoff:
+            conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    # Stray rows in the default partition are few; prune them by row
+    conn.execute(text(f"DELETE FROM {table}_default WHERE created_at < :cutoff"), {"cutoff": cutoff})
+    return dropped
+
+
+def run_partition_maintenance() -> Dict[str, Dict[str, List[str]]]:
+    """Create upcoming partitions and drop expired ones for every partitioned table."""
+    report = {}
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": _MAINTENANCE_LOCK_KEY}).scalar():
+            logger.info("Partition maintenance already running elsewhere - skipped")
+            return report
+        # Dropping a partition briefly locks the parent; do not queue behind long readers
+        conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+        for table in PARTITIONED_TABLES:
+            report[table] = {
+                "created": ensure_partitions(conn, table),
+                "dropped": drop_expired_partitions(conn, table),
+            }
+        conn.commit()
+    for table, changes in report.items():
+        if changes["created"] or changes["dropped"]:
+            logger.info(f"Partitions for {table}: created {changes['created']}, dropped {changes['dropped']}")
+    return report
+
+
+async def _maintenance_loop():
+    while True:
+        try:
+            await asyncio.to_thread(run_partition_maintenance)
+        except Exception as e:
+            logger.error(f"Partition maintenance error: {e}")
+        try:
+            await asyncio.to_thread(prune_webhook_events, settings.webhook_events_retention_days)
+        except Exception as e:
+            logger.error(f"Webhook event pruning error: {e}")
+        await asyncio.sleep(settings.partition_maintenance_interval_seconds)
+
+
+def start_maintenance_loop():
+    """Run partition maintenance now and then periodically (called on startup)."""
+    global _maintenance_task
+    if _maintenance_task is None or _maintenance_task.done():
+        _maintenance_task = asyncio.create_task(_maintenance_loop())
+
+
+async def stop_maintenance_loop():
+    global _maintenance_task
+    if _maintenance_task is None:
+        return
+    _maintenance_task.cancel()
+    try:
+        await _maintenance_task
+    except asyncio.CancelledError:
+        pass
+    _maintenance_task = None
@@ -0,0 +1,112 @@
+"""Rolling 24h quotas for DMs and comments, backed by a reservation ledger.
+
+Each reservation is one ``quota_ledger`` row holding the number of slots it
+took. The monitor reserves every slot a batch may need in one statement,
+spends them in memory and returns the unused ones at the end, so an action
+costs no extra queries and concurrent monitors/webhooks cannot overshoot the
+limit. Slots reserved by a process that dies are not returned; they simply
+age out of the 24h window.
+"""
+from typing import Dict
+
+from sqlalchemy import text
+from database import engine, get_async_engine
+
+# action -> instagram_config column holding its daily limit
+QUOTA_ACTIONS = {
+    "dm": "max_dms_per_day",
+    "comment": "max_comments_per_day",
+}
+
+# Serialize reservations per (tenant, action) so the window sum stays exact
+_LOCK_SQL = text("SELECT pg_advisory_xact_lock(hashtext(CAST(:uid AS TEXT) || ':' || CAST(:action AS TEXT)))")
+
+_RESERVE_SQL = text("""
+    WITH expired AS (
+        DELETE FROM quota_ledger
+        WHERE user_id = :uid AND action = :action AND created_at <= NOW() - INTERVAL '24 hours'
+    ), used AS (
+        SELECT COALESCE(SUM(slots), 0) AS n FROM quota_ledger
+        WHERE user_id = :uid AND action = :action AND created_at > NOW() - INTERVAL '24 hours'
+    ), granted AS (
+        SELECT LEAST(:wanted, GREATEST(:limit - n, 0)) AS slots FROM used
+    )
+    INSERT INTO quota_ledger (user_id, action, slots)
+    SELECT CAST(:uid AS UUID), :action, slots FROM granted WHERE slots > 0
+    RETURNING id, slots
+""")
+
+_RELEASE_SQL = text("UPDATE quota_ledger SET slots = slots - :unused WHERE id = :id")
+
+_USAGE_SQL = text("""
+    SELECT action, COALESCE(SUM(slots), 0) AS used FROM quota_ledger
+    WHERE user_id = :uid AND created_at > NOW() - INTERVAL '24 hours'
+    GROUP BY action
+""")
+
+
+def quota_limit(config: dict, action: str) -> int:
+    """Daily limit for ``action`` from a tenant's instagram_config row."""
+    return int(config.get(QUOTA_ACTIONS[action]) or 20)
+
+
+class QuotaReservation:
+    """Slots granted to one batch. Spend with ``consume()``, then ``release_async()``."""
+
+    def __init__(self, user_id: str, action: str, ledger_id, granted: int):
+        self.user_id = user_id
+        self.action = action
+        self.ledger_id = ledger_id
+        self.granted = granted
+        self.used = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.granted - self.used
+
+    def consume(self) -> bool:
+        """Take one slot. Returns False once the reservation is exhausted."""
+        if self.remaining <= 0:
+            return False
+        self.used += 1
+        return True
+
+    def refund(self):
+        """Give back the last consumed slot (the action it was taken for failed)."""
+        if self.used > 0:
+            self.used -= 1
+
+    async def release_async(self):
+        """Return unused slots to the ledger. Safe to call more than once."""
+        unused = self.remaining
+        if unused <= 0 or self.ledger_id is None:
+            return
+        async with get_async_engine().connect() as conn:
+            await conn.execute(_RELEASE_SQL, {"id": self.ledger_id, "unused": unused})
+            await conn.commit()
+        self.granted = self.used
+
+
+async def reserve_async(user_id: str, action: str, wanted: int, limit: int) -> QuotaReservation:
+    """Atomically reserve up to ``wanted`` slots of ``action`` within ``limit`` per rolling 24h."""
+    if action not in QUOTA_ACTIONS:
+        raise ValueError(f"Invalid quota action: {action}")
+    if wanted <= 0:
+        return QuotaReservation(user_id, action, None, 0)
+    params = {"uid": user_id, "action": action, "wanted": wanted, "limit": limit}
+    async with get_async_engine().connect() as conn:
+        await conn.execute(_LOCK_SQL, params)
+        row = (await conn.execute(_RESERVE_SQL, params)).first()
+        await conn.commit()
+    if row is None:
+        return QuotaReservation(user_id, action, None, 0)
+    return QuotaReservation(user_id, action, row[0], row[1])
+
+
+def get_quota_usage(user_id: str) -> Dict[str, int]:
+    """Slots used (or still reserved) per action over the last 24h."""
+    with engine.connect() as conn:
+        rows = conn.execute(_USAGE_SQL, {"uid": user_id}).fetchall()
+    usage = {action: 0 for action in QUOTA_ACTIONS}
+    usage.update({row[0]: int(row[1]) for row in rows})
+    return usage
@@ -0,0 +1,168 @@
+"""Per-tenant rate and concurrency limits for the expensive API routes.
+
+Each limited route has a token bucket per tenant (``per_minute`` requests,
+refilled continuously, bursting up to a minute's worth) and a cap on the
+tenant's requests in flight. Buckets live in memory, or in the UNLOGGED
+``rate_limit_buckets`` table with ``RATE_LIMIT_BACKEND=postgres`` so every
+replica draws from the same bucket; in-flight caps are always per process.
+"""
+import logging
+import math
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from sqlalchemy import text
+from config import settings
+from database import get_async_engine
+
+logger = logging.getLogger(__name__)
+
+# Idle buckets are swept once the in-memory table grows past this
+_MAX_MEMORY_BUCKETS = 10000
+
+
+class RoutePolicy(NamedTuple):
+    name: str
+    per_minute: int
+    max_concurrent: int
+
+
+def _route_policies() -> Dict[Tuple[str, str], RoutePolicy]:
+    return {
+        ("POST", "/api/agent/chat"): RoutePolicy(
+            "agent_chat", settings.rate_limit_agent_chat_per_minute, settings.rate_limit_agent_chat_concurrent,
+        ),
+        ("POST", "/api/settings/test-connection"): RoutePolicy(
+            "test_connection", settings.rate_limit_test_connection_per_minute,
+            settings.rate_limit_test_connection_concurrent,
+        ),
+        ("POST", "/api/monitor/start"): RoutePolicy(
+            "monitor_start", settings.rate_limit_monitor_start_per_minute, settings.rate_limit_monitor_start_concurrent,
+        ),
+    }
+
+
+# Refill, spend one token if there is one, and report the balance - in one statement.
+# No row comes back when the bucket is empty.
+_TAKE_SQL = text("""
+    INSERT INTO rate_limit_buckets AS b (key, tokens, updated_at)
+    VALUES (:key, CAST(:capacity AS DOUBLE PRECISION) - 1, clock_timestamp())
+    ON CONFLICT (key) DO UPDATE SET
+        tokens = LEAST(
+            CAST(:capacity AS DOUBLE PRECISION),
+            b.tokens + CAST(EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) AS DOUBLE PRECISION)
+                * CAST(:rate AS DOUBLE PRECISION)
+        ) - 1,
+        updated_at = clock_timestamp()
+    WHERE LEAST(
+        CAST(:capacity AS DOUBLE PRECISION),
+        b.tokens + CAST(EXTRACT(EPOCH FROM clock_timestamp() - b.updated_at) AS DOUBLE PRECISION)
+            * CAST(:rate AS DOUBLE PRECISION)
+    ) >= 1
+    RETURNING tokens
+""")
+
+_BALANCE_SQL = text("""
+    SELECT LEAST(
+        CAST(:capacity AS DOUBLE PRECISION),
+        tokens + CAST(EXTRACT(EPOCH FROM clock_timestamp() - updated_at) AS DOUBLE PRECISION)
+            * CAST(:rate AS DOUBLE PRECISION)
+    )
+    FROM rate_limit_buckets WHERE key = :key
+""")
+
+
+class RateLimiter:
+    """Token buckets plus in-flight counters. Used from the event loop only."""
+
+    def __init__(self):
+        self.policies = _route_policies()
+        # key -> [tokens, monotonic time of last refill]
+        self._buckets: Dict[str, list] = {}
+        # key -> requests in flight
+        self._in_flight: Dict[str, int] = {}
+        self._rejected = {"rate": 0, "concurrency": 0}
+
+    def policy_for(self, method: str, path: str) -> Optional[RoutePolicy]:
+        return self.policies.get((method, path.rstrip("/")))
+
+    def _take_memory(self, key: str, capacity: float, rate: float) -> float:
+        """Spend a token; returns 0 on success, else seconds until one is available."""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= _MAX_MEMORY_BUCKETS:
+                self._sweep(now)
+            bucket = self._buckets[key] = [capacity, now]
+        tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+        bucket[1] = now
+        if tokens >= 1:
+            bucket[0] = tokens - 1
+            return 0.0
+        bucket[0] = tokens
+        return (1 - tokens) / rate
+
+    def _sweep(self, now: float):
+        # Buckets untouched for over a minute have refilled completely
+        for key in [k for k, (_, at) in self._buckets.items() if now - at > 60]:
+            del self._buckets[key]
+
+    async def _take_postgres(self, key: str, capacity: float, rate: float) -> float:
+        params = {"key": key, "capacity": capacity, "rate": rate}
+        async with get_async_engine().connect() as conn:
+            taken = (await conn.execute(_TAKE_SQL, params)).first()
+            balance = None if taken else (await conn.execute(_BALANCE_SQL, params)).scalar()
+            await conn.commit()
+        if taken:
+            return 0.0
+        return (1 - float(balance or 0)) / rate
+
+    async def _take(self, key: str, policy: RoutePolicy) -> float:
+        capacity, rate = float(policy.per_minute), policy.per_minute / 60
+        if settings.rate_limit_backend == "postgres":
+            try:
+                return await self._take_postgres(key, capacity, rate)
+            except Exception as e:
+                logger.warning(f"Rate limit table unavailable, using local buckets: {e}")
+        return self._take_memory(key, capacity, rate)
+
+    async def acquire(self, tenant: str, policy: RoutePolicy) -> Tuple[Optional[str], int]:
+        """Admit one request of ``tenant`` on a limited route.
+
+        Returns ``(slot, 0)`` when admitted (pass ``slot`` to ``release``), or
+        ``(None, retry_after_seconds)`` when rejected.
+        """
+        key = f"{policy.name}:{tenant}"
+        if policy.max_concurrent > 0 and self._in_flight.get(key, 0) >= policy.max_concurrent:
+            self._rejected["concurrency"] += 1
+            return None, 1
+        # Counted before the (possibly remote) bucket check so concurrent requests see it
+        self._in_flight[key] = self._in_flight.get(key, 0) + 1
+        if policy.per_minute > 0:
+            try:
+                wait = await self._take(key, policy)
+            except BaseException:
+                self.release(key)
+                raise
+            if wait > 0:
+                self.release(key)
+                self._rejected["rate"] += 1
+                return None, max(1, math.ceil(wait))
+        return key, 0
+
+    def release(self, slot: str):
+        remaining = self._in_flight.get(slot, 0) - 1
+        if remaining > 0:
+            self._in_flight[slot] = remaining
+        else:
+            self._in_flight.pop(slot, None)
+
+    def stats(self) -> dict:
+        return {
+            "backend": settings.rate_limit_backend,
+            "in_flight": sum(self._in_flight.values()),
+            "rejected": dict(self._rejected),
+        }
+
+
+rate_limiter = RateLimiter()
@@ -1,16 +1,30 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
 from sqlalchemy import text
-from database import engine
-from auth import hash_password, verify_password
+from database import engine, get_async_engine
+from config import settings
+from auth import hash_password_async, password_needs_rehash, verify_password_async
 
+logger = logging.getLogger(__name__)
 
-def create_user(email: str, password: str, name: str = "") -> dict:
-    pw_hash = hash_password(password)
-    with engine.connect() as conn:
+# Principals checked by /api/auth/me and the admin routes: user_id -> (cached_at,
+# user or None), least recently used first. Local to the process; changes to a
+# user row are seen after principal_cache_ttl_seconds.
+_principals: "OrderedDict[str, tuple]" = OrderedDict()
+_principals_lock = threading.Lock()
+
+
+async def create_user_async(email: str, password: str, name: str = "") -> dict:
+    """Create a user (the first one becomes admin); bcrypt runs in the password process pool."""
+    pw_hash = await hash_password_async(password)
+    async with get_async_engine().connect() as conn:
         # Check if this is the first user (make admin)
-        count_result = conn.execute(text("SELECT COUNT(*) FROM users"))
+        count_result = await conn.execute(text("SELECT COUNT(*) FROM users"))
         is_first = count_result.scalar() == 0
 
-        result = conn.execute(
+        result = await conn.execute(
             text("""
                 INSERT INTO users (email, password_hash, name, is_admin)
                 VALUES (:email, :pw, :name, :is_admin)
@@ -18,16 +32,10 @@ def create_user(email: str, password: str, name: str = "") -> dict:
             """),
             {"email": email.lower().strip(), "pw": pw_hash, "name": name, "is_admin": is_first},
         )
-        row = result.mappings().first()
-        conn.commit()
-
-        user = dict(row)
-        user["id"] = str(user["id"])
-        user["created_at"] = str(user["created_at"])
+        user = dict(result.mappings().first())
 
         # Create default instagram_config for this user
-        conn2 = engine.connect()
-        conn2.execute(
+        await conn.execute(
             text("""
                 INSERT INTO instagram_config (user_id, api_mode)
                 VALUES (:uid, 'instagrapi')
@@ -35,15 +43,21 @@ def create_user(email: str, password: str, name: str = "") -> dict:
             """),
             {"uid": user["id"]},
         )
-        conn2.commit()
-        conn2.close()
+        await conn.commit()
+
+    user["id"] = str(user["id"])
+    user["created_at"] = str(user["created_at"])
+    return user
 
-        return user
 
+async def authenticate_async(email: str, password: str) -> dict:
+    """Check a login; bcrypt runs in the password process pool.
 
-def authenticate(email: str, password: str) -> dict:
-    with engine.connect() as conn:
-        result = conn.execute(
+    Hashes made with a different cost than ``bcrypt_rounds`` are replaced on
+    a successful login.
+    """
+    async with get_async_engine().connect() as conn:
+        result = await conn.execute(
             text("SELECT id, email, password_hash, name, is_admin, is_active, created_at FROM users WHERE email = :email"),
             {"email": email.lower().strip()},
         )
@@ -53,12 +67,24 @@ def authenticate(email: str, password: str) -> dict:
         return None
 
     user = dict(row)
-    if not verify_password(password, user["password_hash"]):
+    if not await verify_password_async(password, user["password_hash"]):
         return None
 
     if not user.get("is_active", True):
         return None
 
+    if password_needs_rehash(user["password_hash"]):
+        try:
+            new_hash = await hash_password_async(password)
+            async with get_async_engine().connect() as conn:
+                await conn.execute(
+                    text("UPDATE users SET password_hash = :pw WHERE id = :uid AND password_hash = :old"),
+                    {"pw": new_hash, "uid": user["id"], "old": user["password_hash"]},
+                )
+                await conn.commit()
+        except Exception as e:
+            logger.warning(f"[{user['id']}] Password rehash failed: {e}")
+
     user["id"] = str(user["id"])
     user["created_at"] = str(user["created_at"])
     del user["password_hash"]
@@ -82,17 +108,34 @@ def get_user(user_id: str) -> dict:
     return user
 
 
+def get_principal(user_id: str) -> dict:
+    """``get_user`` behind a short per-process TTL cache (None for unknown users)."""
+    with _principals_lock:
+        entry = _principals.get(user_id)
+        if entry and time.monotonic() - entry[0] <= settings.principal_cache_ttl_seconds:
+            _principals.move_to_end(user_id)
+            return entry[1]
+    user = get_user(user_id)
+    with _principals_lock:
+        _principals[user_id] = (time.monotonic(), user)
+        _principals.move_to_end(user_id)
+        while len(_principals) > settings.principal_cache_max_items:
+            _principals.popitem(last=False)
+    return user
+
+
 def list_users() -> list:
     with engine.connect() as conn:
         result = conn.execute(text("""
             SELECT
                 u.id, u.email, u.name, u.is_admin, u.is_active, u.created_at,
                 COALESCE(ic.ig_username, '') as ig_username,
-                (SELECT COUNT(*) FROM conversations c WHERE c.user_id = u.id) as total_conversations,
-                (SELECT COUNT(*) FROM conversations c WHERE c.user_id = u.id AND c.agent_action = 'sent_dm') as total_dms,
-                (SELECT COUNT(*) FROM conversations c WHERE c.user_id = u.id AND c.agent_action = 'posted_comment') as total_comments
+                COALESCE(us.total_conversations, 0) as total_conversations,
+                COALESCE(us.total_dms_sent, 0) as total_dms,
+                COALESCE(us.total_comments_posted, 0) as total_comments
             FROM users u
             LEFT JOIN instagram_config ic ON ic.user_id = u.id
+            LEFT JOIN user_stats us ON us.user_id = u.id
             ORDER BY u.created_at DESC
         """))
         rows = []
@@ -0,0 +1,143 @@
+import json
+from sqlalchemy import text
+from config import settings
+from database import engine, jobs_engine
+
+
+def find_accounts_by_ig_id(ig_account_ids: list) -> list:
+    """Tenants whose Instagram business account id is in ``ig_account_ids``."""
+    if not ig_account_ids:
+        return []
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                SELECT ic.user_id, ic.instagram_business_account_id, COALESCE(cr.app_secret, '') AS app_secret
+                FROM instagram_config ic
+                LEFT JOIN instagram_credentials cr ON cr.user_id = ic.user_id
+                WHERE ic.instagram_business_account_id = ANY(:ids)
+            """),
+            {"ids": list(ig_account_ids)},
+        )
+        rows = []
+        for r in result.mappings().all():
+            row = dict(r)
+            row["user_id"] = str(row["user_id"])
+            rows.append(row)
+        return rows
+
+
+# An event left in 'processing' this long belonged to a consumer that died; it is retried
+_STALE_PROCESSING_SECONDS = 600
+
+# Rows the retry sweep may take: pending (never claimed, e.g. queued across a restart),
+# failed, or stale in 'processing' - with attempts left
+_RETRYABLE_SQL = """
+    webhook_events.attempts < :max_attempts AND (
+        webhook_events.status IN ('pending', 'failed')
+        OR (webhook_events.status = 'processing'
+            AND webhook_events.updated_at < NOW() - make_interval(secs => :stale))
+    )
+"""
+
+
+def store_webhook_events(events: list) -> list:
+    """Persist ``(user_id, event)`` pairs as pending in one statement.
+
+    Returns the ``(user_id, event_key)`` pairs that were new; events already
+    stored (redeliveries) are left as they are.
+    """
+    if not events:
+        return []
+    with engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                INSERT INTO webhook_events (user_id, event_key, event_type, payload, status, attempts, updated_at)
+                SELECT uid, key, etype, payload, 'pending', 0, NOW()
+                FROM unnest(
+                    CAST(:uids AS UUID[]), CAST(:keys AS TEXT[]), CAST(:etypes AS TEXT[]), CAST(:payloads AS TEXT[])
+                ) AS e (uid, key, etype, payload)
+                ON CONFLICT (user_id, event_key) DO NOTHING
+                RETURNING user_id, event_key
+            """),
+            {
+                "uids": [user_id for user_id, _ in events],
+                "keys": [event["key"] for _, event in events],
+                "etypes": [event["type"] for _, event in events],
+                "payloads": [json.dumps(event) for _, event in events],
+            },
+        )
+        rows = result.fetchall()
+        conn.commit()
+    return [(str(user_id), key) for user_id, key in rows]
+
+
+def claim_webhook_event(user_id: str, event_key: str) -> dict:
+    """Take a pending event for processing. Returns the event, or None if someone else took it."""
+    with jobs_engine.connect() as conn:
+        row = conn.execute(
+            text("""
+                UPDATE webhook_events SET status = 'processing', attempts = attempts + 1, updated_at = NOW()
+                WHERE user_id = :uid AND event_key = :key AND status = 'pending'
+                RETURNING payload
+            """),
+            {"uid": user_id, "key": event_key},
+        ).first()
+        conn.commit()
+    return json.loads(row[0]) if row else None
+
+
+def finish_webhook_event(user_id: str, event_key: str, error: str = None):
+    """Mark a claimed event done, or failed so it is retried."""
+    with jobs_engine.connect() as conn:
+        conn.execute(
+            text("""
+                UPDATE webhook_events
+                SET status = :status, last_error = :error, updated_at = NOW()
+                WHERE user_id = :uid AND event_key = :key
+            """),
+            {"uid": user_id, "key": event_key, "status": "failed" if error else "done", "error": error or ""},
+        )
+        conn.commit()
+
+
+def claim_retryable_webhook_events(limit: int = 50) -> list:
+    """Take pending, failed (after a backoff) and stale events. Returns (user_id, event) pairs."""
+    with jobs_engine.connect() as conn:
+        result = conn.execute(
+            text(f"""
+                UPDATE webhook_events SET status = 'processing', attempts = attempts + 1, updated_at = NOW()
+                WHERE id IN (
+                    SELECT id FROM webhook_events
+                    WHERE status <> 'done' AND {_RETRYABLE_SQL}
+                      AND updated_at < NOW() - make_interval(secs => :backoff * attempts * attempts)
+                    ORDER BY updated_at
+                    LIMIT :limit
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING user_id, payload
+            """),
+            {
+                "max_attempts": settings.webhook_max_attempts, "stale": _STALE_PROCESSING_SECONDS,
+                "backoff": settings.webhook_retry_interval_seconds, "limit": limit,
+            },
+        )
+        rows = result.fetchall()
+        conn.commit()
+    return [(str(user_id), json.loads(payload)) for user_id, payload in rows]
+
+
+def prune_webhook_events(days: int) -> int:
+    """Delete events received and last touched more than ``days`` ago (0 keeps everything)."""
+    if days <= 0:
+        return 0
+    with jobs_engine.connect() as conn:
+        result = conn.execute(
+            text("""
+                DELETE FROM webhook_events
+                WHERE received_at < NOW() - make_interval(days => :days)
+                  AND updated_at < NOW() - make_interval(days => :days)
+            """),
+            {"days": days},
+        )
+        conn.commit()
+        return result.rowcount
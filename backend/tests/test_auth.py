@@ -0,0 +1,44 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import api.routes.admin as admin_routes
+import services.user_service as user_service
+from auth import create_token, get_current_user
+
+
+def _request(token):
+    return Request({"type": "http", "headers": [(b"authorization", f"Bearer {token}".encode())]})
+
+
+def test_current_user_comes_from_the_token_without_a_query(monkeypatch):
+    def no_db(*args):
+        raise AssertionError("queried the users table")
+
+    monkeypatch.setattr(user_service, "get_user", no_db)
+    user = get_current_user(_request(create_token("u1", is_admin=True)))
+    assert user == {"user_id": "u1", "is_admin": True}
+
+
+def test_admin_routes_check_the_cached_user_row(monkeypatch):
+    rows = {"u1": {"id": "u1", "email": "a@x", "name": "", "is_admin": True, "is_active": True}}
+    lookups = []
+
+    def get_user(user_id):
+        lookups.append(user_id)
+        return rows.get(user_id)
+
+    monkeypatch.setattr(user_service, "get_user", get_user)
+    monkeypatch.setattr(user_service, "_principals", user_service.OrderedDict())
+    token_user = {"user_id": "u1", "is_admin": True}
+
+    assert admin_routes.require_admin(token_user) is token_user
+    assert admin_routes.require_admin(token_user) is token_user
+    assert lookups == ["u1"]
+
+    # Demoted after the token was issued: rejected once the cached row expires
+    rows["u1"] = {**rows["u1"], "is_admin": False}
+    monkeypatch.setattr(user_service.settings, "principal_cache_ttl_seconds", -1)
+    with pytest.raises(HTTPException) as exc:
+        admin_routes.require_admin(token_user)
+    assert exc.value.status_code == 403
@@ -0,0 +1,63 @@
+import asyncio
+import time
+
+import instagram.graph_api as graph_api
+from instagram.graph_api import GraphBatcher
+
+
+def _patch_transport(monkeypatch, latency=0.05):
+    sent = []
+
+    async def send_single(token, op):
+        sent.append([op["path"]])
+        await asyncio.sleep(latency)
+        return {"id": op["path"]}
+
+    async def send_batch(token, ops):
+        sent.append([op["path"] for op in ops])
+        await asyncio.sleep(latency)
+        return [{"id": op["path"]} for op in ops]
+
+    monkeypatch.setattr(graph_api, "_send_single", send_single)
+    monkeypatch.setattr(graph_api, "_send_batch", send_batch)
+    monkeypatch.setattr(graph_api.settings, "graph_api_batch_window_ms", 200)
+    return sent
+
+
+def _op(path):
+    return {"method": "GET", "path": path, "params": {}}
+
+
+def test_serial_calls_are_sent_without_waiting_for_the_window(monkeypatch):
+    sent = _patch_transport(monkeypatch, latency=0)
+    batcher = GraphBatcher("token")
+
+    async def scenario():
+        started = time.monotonic()
+        for path in ("a", "b", "c"):
+            assert (await batcher.submit(_op(path)))["id"] == path
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) < 0.1
+    assert sent == [["a"], ["b"], ["c"]]
+
+
+def test_calls_arriving_while_one_is_in_flight_are_batched(monkeypatch):
+    sent = _patch_transport(monkeypatch)
+    batcher = GraphBatcher("token")
+
+    async def scenario():
+        return await asyncio.gather(*(batcher.submit(_op(path)) for path in ("a", "b", "c")))
+
+    results = asyncio.run(scenario())
+    assert [r["id"] for r in results] == ["a", "b", "c"]
+    assert sent == [["a"], ["b", "c"]]
+
+
+def test_idle_batchers_are_evicted(monkeypatch):
+    monkeypatch.setattr(graph_api, "_batchers", {})
+    old = graph_api.get_batcher("old-token")
+    old.last_used -= graph_api._BATCHER_IDLE_SECONDS + 1
+    monkeypatch.setattr(graph_api, "_batchers_swept_at", 0.0)
+    graph_api.get_batcher("new-token")
+    assert set(graph_api._batchers) == {"new-token"}
@@ -0,0 +1,27 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.routes.admin as admin_routes
+import api.routes.health as health_routes
+
+
+def _app():
+    app = FastAPI()
+    app.include_router(health_routes.router, prefix="/api")
+    app.include_router(admin_routes.router, prefix="/api/admin")
+    return app
+
+
+def test_health_exposes_only_liveness(monkeypatch):
+    monkeypatch.setattr(health_routes.monitor_manager, "count_running", lambda: 2)
+    resp = TestClient(_app()).get("/api/health")
+    assert resp.json() == {"status": "ok", "active_monitors": 2}
+
+
+def test_runtime_stats_need_an_admin():
+    app = _app()
+    assert TestClient(app).get("/api/admin/runtime-stats").status_code == 401
+
+    app.dependency_overrides[admin_routes.require_admin] = lambda: {"user_id": "admin", "is_admin": True}
+    stats = TestClient(app).get("/api/admin/runtime-stats").json()
+    assert set(stats) == {"activity_log", "live_events", "rate_limits"}
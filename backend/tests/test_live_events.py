@@ -0,0 +1,15 @@
+import pytest
+
+import services.live_events as live_events_module
+
+
+@pytest.mark.parametrize("relay, mode, expected", [
+    (None, "inline", False),
+    (None, "worker", True),
+    (True, "inline", True),
+    (False, "worker", False),
+])
+def test_relay_follows_the_deployment(monkeypatch, relay, mode, expected):
+    monkeypatch.setattr(live_events_module.settings, "live_events_relay", relay)
+    monkeypatch.setattr(live_events_module.settings, "monitor_mode", mode)
+    assert live_events_module.relay_enabled() is expected
@@ -0,0 +1,144 @@
+"""Lease handover between two MonitorManagers, against an in-memory lease table."""
+import asyncio
+
+import pytest
+
+import instagram.monitor as monitor_module
+from instagram.monitor import MonitorManager
+
+TTL = 30
+
+
+class LeaseTable:
+    """Mimics the monitor_leases queries of services/monitor_lease_service.py."""
+
+    def __init__(self):
+        self.now = 1000.0
+        self.leases = {}  # user_id -> [owner_id, expires_at]
+        self.enabled = set()
+        self.down = False
+
+    def _check(self):
+        if self.down:
+            raise ConnectionError("database unavailable")
+
+    def acquire_lease(self, user_id, owner_id, ttl_seconds):
+        self._check()
+        lease = self.leases.get(user_id)
+        if lease and lease[0] != owner_id and lease[1] >= self.now:
+            return False
+        self.leases[user_id] = [owner_id, self.now + ttl_seconds]
+        return True
+
+    def renew_leases(self, owner_id, ttl_seconds, running):
+        self._check()
+        owned = set()
+        for user_id in running:
+            lease = self.leases.get(user_id)
+            if lease and lease[0] == owner_id and lease[1] > self.now and user_id in self.enabled:
+                lease[1] = self.now + ttl_seconds
+                owned.add(user_id)
+        return owned
+
+    def release_lease(self, user_id, owner_id):
+        self._check()
+        if self.leases.get(user_id, [None])[0] == owner_id:
+            del self.leases[user_id]
+
+    def get_orphaned_accounts(self, limit=10):
+        self._check()
+        return [u for u, (_, expires_at) in self.leases.items() if expires_at < self.now and u in self.enabled][:limit]
+
+    def set_monitor_enabled(self, user_id, enabled):
+        self._check()
+        (self.enabled.add if enabled else self.enabled.discard)(user_id)
+
+
+class StubMonitor:
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.is_running = False
+
+    async def start(self):
+        self.is_running = True
+        return {"status": "started"}
+
+    async def stop(self):
+        self.is_running = False
+        return {"status": "stopped"}
+
+    def get_status(self):
+        return {"running": self.is_running}
+
+
+@pytest.fixture
+def table(monkeypatch):
+    table = LeaseTable()
+    for name in ("acquire_lease", "renew_leases", "release_lease", "get_orphaned_accounts", "set_monitor_enabled"):
+        monkeypatch.setattr(monitor_module, name, getattr(table, name))
+    monkeypatch.setattr(monitor_module, "InstagramMonitor", StubMonitor)
+    monkeypatch.setattr(monitor_module, "save_monitor_statuses", lambda statuses, owner: None)
+    monkeypatch.setattr(monitor_module.settings, "monitor_lease_seconds", TTL)
+    monkeypatch.setattr(MonitorManager, "start_lease_loop", lambda self: None)
+    return table
+
+
+def _running(manager, user_id):
+    monitor = manager._monitors.get(user_id)
+    return bool(monitor and monitor.is_running)
+
+
+def test_stopped_monitor_lease_is_not_renewed_and_moves_elsewhere(table):
+    a, b = MonitorManager("a"), MonitorManager("b")
+
+    async def scenario():
+        assert (await a.start("u1"))["status"] == "started"
+
+        # Renewal keeps failing past the lease: a stops its monitor
+        table.down = True
+        a._last_renewal -= TTL + 1
+        await a._lease_tick()
+        assert not _running(a, "u1")
+
+        # Database is back: the lease is left to expire and b adopts the orphan
+        table.down = False
+        table.now += TTL + 1
+        await b._lease_tick()
+        assert _running(b, "u1") and table.leases["u1"][0] == "b"
+
+        # a's next renewal leaves b's lease alone, and a cannot start the account
+        await a._lease_tick()
+        assert table.leases["u1"][0] == "b" and not _running(a, "u1")
+        assert (await a.start("u1"))["status"] == "already_running"
+
+    asyncio.run(scenario())
+
+
+def test_expired_lease_is_not_renewed_after_an_outage(table):
+    a, b = MonitorManager("a"), MonitorManager("b")
+
+    async def scenario():
+        await a.start("u1")
+        # The lease expired while the database was unreachable
+        table.now += TTL + 1
+        await a._lease_tick()
+        assert not _running(a, "u1")
+        assert "u1" not in table.leases
+
+        assert (await b.start("u1"))["status"] == "started"
+
+    asyncio.run(scenario())
+
+
+def test_running_monitor_keeps_its_lease(table):
+    a, b = MonitorManager("a"), MonitorManager("b")
+
+    async def scenario():
+        await a.start("u1")
+        table.now += TTL / 2
+        await a._lease_tick()
+        table.now += TTL / 2 + 1
+        assert _running(a, "u1")
+        assert (await b.start("u1"))["status"] == "already_running"
+
+    asyncio.run(scenario())
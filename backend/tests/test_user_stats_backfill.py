@@ -0,0 +1,30 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import api.routes.admin as admin_routes
+import services.conversation_service as conversation_service
+
+
+def _client(monkeypatch, retention_days):
+    calls = []
+    monkeypatch.setattr(admin_routes.settings, "conversations_retention_days", retention_days)
+    monkeypatch.setattr(conversation_service, "backfill_user_stats", lambda: calls.append(1) or 3)
+    app = FastAPI()
+    app.include_router(admin_routes.router, prefix="/api/admin")
+    app.dependency_overrides[admin_routes.require_admin] = lambda: {"id": "admin", "is_admin": True}
+    return TestClient(app), calls
+
+
+def test_backfill_is_refused_while_retention_drops_history(monkeypatch):
+    client, calls = _client(monkeypatch, retention_days=365)
+    resp = client.post("/api/admin/user-stats/backfill")
+    assert resp.status_code == 409
+    assert calls == []
+
+
+def test_backfill_runs_when_history_is_kept(monkeypatch):
+    client, calls = _client(monkeypatch, retention_days=0)
+    resp = client.post("/api/admin/user-stats/backfill")
+    assert resp.status_code == 200
+    assert resp.json() == {"status": "ok", "users": 3}
+    assert calls == [1]
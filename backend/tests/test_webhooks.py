@@ -0,0 +1,326 @@
+import asyncio
+import hashlib
+import hmac
+import json
+import os
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import agent.instagram_agent as instagram_agent
+import api.routes.webhooks as webhook_routes
+import instagram.actions as actions
+import instagram.graph_api as graph_api
+import instagram.webhooks as webhooks
+from instagram.webhooks import parse_events, verify_signature
+
+FIXTURES = os.path.join(os.path.dirname(__file__), "fixtures", "webhooks")
+OWN_ACCOUNT = "17841400000000001"
+TENANT = "00000000-0000-0000-0000-000000000001"
+
+
+def _load(name):
+    with open(os.path.join(FIXTURES, f"{name}.json"), "rb") as f:
+        return f.read()
+
+
+def _sign(body, secret):
+    return "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+class EventTable:
+    """In-memory stand-in for webhook_events with the store/claim/finish semantics."""
+
+    def __init__(self, max_attempts=5):
+        self.rows = {}
+        self.max_attempts = max_attempts
+
+    def store(self, events):
+        new = []
+        for user_id, event in events:
+            if (user_id, event["key"]) not in self.rows:
+                self.rows[(user_id, event["key"])] = {"status": "pending", "attempts": 0, "event": event}
+                new.append((user_id, event["key"]))
+        return new
+
+    def claim(self, user_id, key):
+        row = self.rows[(user_id, key)]
+        if row["status"] != "pending":
+            return None
+        row.update(status="processing", attempts=row["attempts"] + 1)
+        return row["event"]
+
+    def finish(self, user_id, key, error=None):
+        self.rows[(user_id, key)]["status"] = "failed" if error else "done"
+
+    def claim_retryable(self, limit=50):
+        claimed = []
+        for (user_id, key), row in self.rows.items():
+            if row["status"] in ("pending", "failed") and row["attempts"] < self.max_attempts:
+                row.update(status="processing", attempts=row["attempts"] + 1)
+                claimed.append((user_id, row["event"]))
+        return claimed[:limit]
+
+
+def _patch_processing(monkeypatch, handler=None):
+    table = EventTable()
+    monkeypatch.setattr(webhooks, "find_accounts_by_ig_id", lambda ids: [
+        {"user_id": TENANT, "instagram_business_account_id": OWN_ACCOUNT, "app_secret": ""}
+    ])
+    monkeypatch.setattr(webhooks, "store_webhook_events", table.store)
+    monkeypatch.setattr(webhooks, "claim_webhook_event", table.claim)
+    monkeypatch.setattr(webhooks, "finish_webhook_event", table.finish)
+    monkeypatch.setattr(webhooks, "claim_retryable_webhook_events", table.claim_retryable)
+    if handler:
+        monkeypatch.setattr(webhooks, "_handle_event", handler)
+
+    async def log_activity(*args, **kwargs):
+        pass
+
+    monkeypatch.setattr(webhooks, "log_activity_async", log_activity)
+    return table
+
+
+def test_verify_signature():
+    body = _load("comments")
+    assert verify_signature(body, _sign(body, "secret"), "secret")
+    assert not verify_signature(body, _sign(body, "other"), "secret")
+    assert not verify_signature(body + b" ", _sign(body, "secret"), "secret")
+    assert not verify_signature(body, _sign(body, "secret")[len("sha256="):], "secret")
+    assert not verify_signature(body, _sign(body, ""), "")
+
+
+def test_parse_comments_skips_our_own_replies():
+    events = parse_events(json.loads(_load("comments")))
+    assert [e["key"] for e in events] == ["comment:18000000000000101"]
+    event = events[0]
+    assert event["ig_account_id"] == OWN_ACCOUNT
+    assert event["instagram_user_id"] == 17841400000000777
+    assert event["username"] == "jane.doe"
+    assert event["media_id"] == "18000000000000900"
+
+
+def test_parse_mentions():
+    events = parse_events(json.loads(_load("mentions")))
+    assert events == [{
+        "type": "mention",
+        "key": "mention:18000000000000201",
+        "ig_account_id": OWN_ACCOUNT,
+        "media_id": "18000000000000950",
+        "comment_id": "18000000000000201",
+    }]
+
+
+def test_parse_messages_skips_echoes():
+    events = parse_events(json.loads(_load("messages")))
+    assert [e["key"] for e in events] == ["message:aWdfZAG1faXRlbToxOklHTWVzc2FnZAUlEOjE3ODQx"]
+    assert events[0]["instagram_user_id"] == 5500000000000777
+    assert events[0]["text"] == "Hi! Do you ship abroad?"
+
+
+def test_redelivered_payload_is_handled_once(monkeypatch):
+    handled = []
+
+    async def handler(user_id, event):
+        handled.append(event["key"])
+
+    table = _patch_processing(monkeypatch, handler)
+    payload = json.loads(_load("messages"))
+
+    async def scenario():
+        await webhooks.process_payload(payload)
+        await webhooks.process_payload(payload)
+
+    asyncio.run(scenario())
+    assert handled == ["message:aWdfZAG1faXRlbToxOklHTWVzc2FnZAUlEOjE3ODQx"]
+    assert [row["status"] for row in table.rows.values()] == ["done"]
+
+
+def test_failed_event_is_retried_until_handled(monkeypatch):
+    calls = []
+
+    async def handler(user_id, event):
+        calls.append(event["key"])
+        if len(calls) == 1:
+            raise RuntimeError("Graph API unavailable")
+
+    table = _patch_processing(monkeypatch, handler)
+    payload = json.loads(_load("comments"))
+    key = (TENANT, "comment:18000000000000101")
+
+    async def scenario():
+        await webhooks.process_payload(payload)
+        assert table.rows[key]["status"] == "failed"
+        for user_id, event in table.claim_retryable():
+            await webhooks._run_event(user_id, event)
+
+    asyncio.run(scenario())
+    assert calls == ["comment:18000000000000101"] * 2
+    assert (table.rows[key]["status"], table.rows[key]["attempts"]) == ("done", 2)
+
+    # A redelivery after success is still a duplicate
+    asyncio.run(webhooks.process_payload(payload))
+    assert len(calls) == 2
+
+
+def test_stored_event_survives_a_lost_queue(monkeypatch):
+    handled = []
+
+    async def handler(user_id, event):
+        handled.append(event["key"])
+
+    table = _patch_processing(monkeypatch, handler)
+    # Acknowledged to Meta, then the process restarts before a consumer runs
+    stored = webhooks.store_payload(json.loads(_load("mentions")))
+    assert [table.rows[k]["status"] for k in stored] == ["pending"]
+
+    async def sweep():
+        for user_id, event in table.claim_retryable():
+            await webhooks._run_event(user_id, event)
+
+    asyncio.run(sweep())
+    assert handled == ["mention:18000000000000201"]
+    assert table.rows[stored[0]]["status"] == "done"
+
+
+class StubQuota:
+    def __init__(self):
+        self.refunded = 0
+
+    def consume(self):
+        return True
+
+    def refund(self):
+        self.refunded += 1
+
+    async def release_async(self):
+        pass
+
+
+class StubGraphAPI:
+    result = {"id": "reply"}
+
+    def __init__(self, *args):
+        self.sent = []
+
+    async def reply_to_comment(self, comment_id, message):
+        self.sent.append(comment_id)
+        return StubGraphAPI.result
+
+    async def send_message(self, recipient_id, message):
+        self.sent.append(recipient_id)
+        return StubGraphAPI.result
+
+    async def get_media(self, media_id):
+        return {"id": media_id, "caption": "Summer drop", "media_type": "IMAGE", "like_count": 3}
+
+
+def _patch_graph_tenant(monkeypatch, **config):
+    quota, conversations, captions, cached = StubQuota(), [], [], []
+
+    async def get_config(user_id):
+        return {"api_mode": "graph_api", "auto_comment_enabled": True, **config}
+
+    async def get_credentials(user_id):
+        return {"access_token": "token"}
+
+    async def reserve(*args):
+        return quota
+
+    async def log_conversation(**kwargs):
+        conversations.append(kwargs)
+
+    monkeypatch.setattr(webhooks, "get_config_async", get_config)
+    monkeypatch.setattr(webhooks, "get_credentials_async", get_credentials)
+    monkeypatch.setattr(webhooks, "reserve_async", reserve)
+    monkeypatch.setattr(webhooks, "log_conversation_async", log_conversation)
+    async def graph_client(user_id, config):
+        return StubGraphAPI()
+
+    monkeypatch.setattr(actions, "get_config_async", get_config)
+    monkeypatch.setattr(actions, "_get_graph_api_client", graph_client)
+    monkeypatch.setattr(actions, "get_cached_media", lambda user_id, media_id: None)
+    monkeypatch.setattr(actions, "upsert_media", lambda user_id, rows: cached.extend(rows))
+    monkeypatch.setattr(
+        instagram_agent, "generate_comment_reply", lambda username, text, caption: captions.append(caption) or "Thanks!"
+    )
+    monkeypatch.setattr(instagram_agent, "generate_message_reply", lambda username, text: "Hello!")
+    monkeypatch.setattr(graph_api, "InstagramGraphAPI", StubGraphAPI)
+    return quota, conversations, captions, cached
+
+
+def test_graph_error_leaves_event_failed_and_unlogged(monkeypatch):
+    table = _patch_processing(monkeypatch)
+    quota, conversations, _, _ = _patch_graph_tenant(monkeypatch)
+    payload = json.loads(_load("comments"))
+    key = (TENANT, "comment:18000000000000101")
+
+    monkeypatch.setattr(StubGraphAPI, "result", {"error": "Graph API usage too high"})
+    asyncio.run(webhooks.process_payload(payload))
+    assert table.rows[key]["status"] == "failed"
+    assert conversations == []
+    assert quota.refunded == 1
+
+    monkeypatch.setattr(StubGraphAPI, "result", {"id": "reply"})
+
+    async def retry():
+        for user_id, event in table.claim_retryable():
+            await webhooks._run_event(user_id, event)
+
+    asyncio.run(retry())
+    assert table.rows[key]["status"] == "done"
+    assert [c["agent_action"] for c in conversations] == ["posted_comment"]
+
+
+def test_comment_reply_fetches_an_uncached_caption(monkeypatch):
+    _patch_processing(monkeypatch)
+    _, _, captions, cached = _patch_graph_tenant(monkeypatch)
+    asyncio.run(webhooks.process_payload(json.loads(_load("comments"))))
+    assert captions == ["Summer drop"]
+    assert [m["media_id"] for m in cached] == ["18000000000000900"]
+
+
+def test_dm_replies_need_their_own_flag(monkeypatch):
+    table = _patch_processing(monkeypatch)
+    payload = json.loads(_load("messages"))
+
+    # The welcome DM flag (new followers) does not turn on replies to every DM
+    _, conversations, _, _ = _patch_graph_tenant(monkeypatch, welcome_dm_enabled=True)
+    asyncio.run(webhooks.process_payload(payload))
+    assert conversations == []
+
+    table.rows.clear()
+    _, conversations, _, _ = _patch_graph_tenant(monkeypatch, auto_reply_dm_enabled=True)
+    asyncio.run(webhooks.process_payload(payload))
+    assert [c["agent_action"] for c in conversations] == ["sent_dm"]
+
+
+def test_route_replays_signed_fixture(monkeypatch):
+    queued = []
+    table = _patch_processing(monkeypatch)
+    monkeypatch.setattr(webhooks.settings, "instagram_app_secret", "app-secret")
+    monkeypatch.setattr(webhook_routes, "enqueue", lambda user_id, key: queued.append((user_id, key)))
+    app = FastAPI()
+    app.include_router(webhook_routes.router, prefix="/api/webhooks")
+    client = TestClient(app)
+    body = _load("mentions")
+
+    resp = client.post("/api/webhooks/instagram", content=body,
+                       headers={"X-Hub-Signature-256": _sign(body, "app-secret")})
+    assert resp.status_code == 200
+    assert queued == [(TENANT, "mention:18000000000000201")]
+    assert table.rows[queued[0]]["status"] == "pending"
+
+    resp = client.post("/api/webhooks/instagram", content=body,
+                       headers={"X-Hub-Signature-256": _sign(body, "wrong")})
+    assert resp.status_code == 401
+    assert len(queued) == 1
+
+    # Not stored, so not acknowledged: Meta redelivers it
+    def store_down(events):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(webhooks, "store_webhook_events", store_down)
+    resp = client.post("/api/webhooks/instagram", content=body,
+                       headers={"X-Hub-Signature-256": _sign(body, "app-secret")})
+    assert resp.status_code == 503
@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import { Header } from "@/components/layout/header";
-import { api } from "@/lib/api";
+import { api, openMonitorStream } from "@/lib/api";
 import type { MonitorStatus, ActivityLogItem } from "@/types";
 import { Play, Square, RefreshCw, Activity, Loader2 } from "lucide-react";
 
@@ -11,11 +11,15 @@ export default function MonitorPage() {
   const [activities, setActivities] = useState<ActivityLogItem[]>([]);
   const [actionLoading, setActionLoading] = useState(false);
 
-  useEffect(() => {
-    loadData();
-    const interval = setInterval(loadData, 5000);
-    return () => clearInterval(interval);
-  }, []);
+  useEffect(
+    () =>
+      openMonitorStream({
+        onStatus: setStatus,
+        onActivity: (item) => setActivities((prev) => [item, ...prev].slice(0, 50)),
+        onResync: loadData,
+      }),
+    []
+  );
 
   async function loadData() {
     try {
@@ -129,7 +133,7 @@ export default function MonitorPage() {
               Log de Atividade
             </h3>
             <span className="text-xs text-[var(--muted-foreground)]">
-              Auto-refresh a cada 5s
+              Ao vivo
             </span>
           </div>
 
@@ -2,7 +2,7 @@
 
 import { useEffect, useState } from "react";
 import { Header } from "@/components/layout/header";
-import { api } from "@/lib/api";
+import { api, openMonitorStream } from "@/lib/api";
 import type { DashboardStats, MonitorStatus, ActivityLogItem } from "@/types";
 import { MessageCircle, Heart, UserPlus, Activity, AlertCircle } from "lucide-react";
 
@@ -13,9 +13,17 @@ export default function DashboardPage() {
   const [error, setError] = useState("");
 
   useEffect(() => {
-    loadData();
-    const interval = setInterval(loadData, 10000);
-    return () => clearInterval(interval);
+    const close = openMonitorStream({
+      onStatus: setMonitor,
+      onActivity: (item) => setActivities((prev) => [item, ...prev].slice(0, 10)),
+      onResync: loadData,
+    });
+    // Conversation totals are not streamed
+    const interval = setInterval(() => api.getConversationStats().then(setStats).catch(() => {}), 60000);
+    return () => {
+      close();
+      clearInterval(interval);
+    };
   }, []);
 
   async function loadData() {
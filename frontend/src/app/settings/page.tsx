@@ -19,6 +19,7 @@ export default function SettingsPage() {
     // Bot control
     welcome_dm_enabled: true,
     auto_comment_enabled: true,
+    auto_reply_dm_enabled: false,
     max_dms_per_day: 20,
     max_comments_per_day: 20,
     delay_between_dms: 45,
@@ -50,6 +51,7 @@ export default function SettingsPage() {
           // Bot control
           welcome_dm_enabled: settings.welcome_dm_enabled ?? true,
           auto_comment_enabled: settings.auto_comment_enabled ?? true,
+          auto_reply_dm_enabled: settings.auto_reply_dm_enabled ?? false,
           max_dms_per_day: settings.max_dms_per_day ?? 20,
           max_comments_per_day: settings.max_comments_per_day ?? 20,
           delay_between_dms: settings.delay_between_dms ?? 45,
@@ -298,6 +300,12 @@ export default function SettingsPage() {
               enabled={form.auto_comment_enabled}
               onChange={(v) => updateForm("auto_comment_enabled", v)}
             />
+            <ToggleField
+              label="Resposta Automatica a DMs"
+              description="Responde as mensagens diretas recebidas (modo Graph API)"
+              enabled={form.auto_reply_dm_enabled}
+              onChange={(v) => updateForm("auto_reply_dm_enabled", v)}
+            />
           </div>
         </Section>
 
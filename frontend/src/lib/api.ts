@@ -1,3 +1,5 @@
+import type { ActivityLogItem, MonitorStatus } from "@/types";
+
 const API_URL = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
 
 function getToken(): string | null {
@@ -64,6 +66,15 @@ export const api = {
     return fetchApi(`/api/conversations?${params}`);
   },
 
+  searchConversations: (query: { q?: string; username?: string; cursor?: string; limit?: number }) => {
+    const params = new URLSearchParams();
+    if (query.q) params.set("q", query.q);
+    if (query.username) params.set("username", query.username);
+    if (query.cursor) params.set("cursor", query.cursor);
+    params.set("limit", String(query.limit ?? 20));
+    return fetchApi(`/api/conversations/search?${params}`);
+  },
+
   getConversationStats: () => fetchApi("/api/conversations/stats"),
 
   getConversation: (id: number) => fetchApi(`/api/conversations/${id}`),
@@ -120,3 +131,26 @@ export const api = {
       body: JSON.stringify(data),
     }),
 };
+
+export interface MonitorStreamHandlers {
+  onStatus: (status: MonitorStatus) => void;
+  onActivity: (item: ActivityLogItem) => void;
+  // Called on (re)connect and after dropped events: reload from the REST endpoints
+  onResync: () => void;
+}
+
+// Live monitor status and activity over server-sent events. Returns a function that closes the stream.
+export function openMonitorStream(handlers: MonitorStreamHandlers): () => void {
+  const token = getToken() ?? "";
+  const source = new EventSource(`${API_URL}/api/monitor/stream?token=${encodeURIComponent(token)}`);
+  source.addEventListener("status", (e) => {
+    handlers.onStatus(JSON.parse((e as MessageEvent).data));
+  });
+  source.addEventListener("activity", (e) => {
+    const msg = e as MessageEvent;
+    handlers.onActivity({ id: `live-${msg.lastEventId}`, ...JSON.parse(msg.data) });
+  });
+  source.addEventListener("lagged", () => handlers.onResync());
+  source.onopen = () => handlers.onResync();
+  return () => source.close();
+}
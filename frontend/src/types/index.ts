@@ -31,6 +31,7 @@ export interface Settings {
   // Bot control
   welcome_dm_enabled: boolean;
   auto_comment_enabled: boolean;
+  auto_reply_dm_enabled: boolean;
   max_dms_per_day: number;
   max_comments_per_day: number;
   delay_between_dms: number;
@@ -80,7 +81,8 @@ export interface DashboardStats {
 }
 
 export interface ActivityLogItem {
-  id: number;
+  // Streamed entries are not written yet and carry a "live-<n>" id
+  id: number | string;
   level: string;
   message: string;
   details: string;